@@ -15,6 +15,7 @@ from WebStreamer import StreamBot
 from WebStreamer.server import web_server
 from WebStreamer.bot.clients import initialize_clients
 from WebStreamer.utils import TokenParser
+from WebStreamer.utils.rate_limiter import rate_limiter
 
 logging.basicConfig(
     level=logging.INFO,
@@ -131,12 +132,17 @@ async def start_services():
     try:
         # Connect to database first
         print("-------------------- Connecting to Database --------------------")
-        from WebStreamer.database import db_manager
+        from WebStreamer.database import db_manager, counters, access_log_writer, global_stats, maintenance
         db_success = await db_manager.connect()
         if not db_success:
             print("❌ Database connection failed! Please check DATABASE_URL")
             return
         print("✅ Database connected successfully")
+        counters.start()
+        access_log_writer.start()
+        global_stats.start()
+        rate_limiter.start()
+        maintenance.start()
         print("------------------------------ DONE ------------------------------")
         print()
         
@@ -159,6 +165,8 @@ async def start_services():
         print("---------------------- Initializing Clients ----------------------")
         await initialize_clients()
         print("------------------------------ DONE ------------------------------")
+        print("------------------ Starting Link Revocation Sync ------------------")
+        asyncio.create_task(utils.revocation_list.run())
         if Var.ON_HEROKU:
             print("------------------ Starting Keep Alive Service ------------------")
             print()
@@ -184,11 +192,19 @@ async def start_services():
         await cleanup()
 
 async def cleanup():
-    # Disconnect database
-    from WebStreamer.database import db_manager
-    await db_manager.disconnect()
-    
+    # Stop serving first so in-flight streams finish counting, then flush counters
+    # and disconnect the database
+    from WebStreamer.database import db_manager, counters, access_log_writer, maintenance
+    from WebStreamer.server.live_stats import live_stats
+    # Open event streams would otherwise hold up the server shutdown
+    live_stats.stop()
     await server.cleanup()
+    
+    maintenance.stop()
+    await counters.stop()
+    await access_log_writer.stop()
+    await db_manager.disconnect()
+    rate_limiter.stop()
     await StreamBot.stop()
 
 if __name__ == "__main__":
@@ -17,10 +17,8 @@ async def start(_, m: Message):
     
     # Auto-register user in database
     try:
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             await User.create_or_get(conn, user_id, username, first_name, last_name)
-            if db_manager.is_sqlite:
-                await conn.commit()
     except Exception as e:
         logging.error(f"Error registering user: {e}")
     
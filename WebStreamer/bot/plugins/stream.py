@@ -5,8 +5,9 @@ from pyrogram import filters
 from WebStreamer.vars import Var
 from WebStreamer.bot import StreamBot
 from pyrogram.types import Message
-from WebStreamer.database import db_manager
-from WebStreamer.database.models import User, File, GeneratedLink, RateLimitTracker
+from WebStreamer.database.ingest import ingest_upload, ingest_timer
+from WebStreamer.utils.signed_links import build_signed_url
+from WebStreamer.utils.rate_limiter import rate_limiter
 
 # Media filter - documents, videos, and audio
 media_filter = (
@@ -40,6 +41,12 @@ def get_media_info(message):
     return None
 
 
+def expires_in(expiry_timestamp: int) -> str:
+    """Remaining link lifetime (links may be reused, so it isn't always 7 days)"""
+    hours = max(0, expiry_timestamp - int(time.time())) // 3600
+    return f"{hours // 24} days" if hours >= 48 else f"{hours} hours"
+
+
 def register_channel_handler(client):
     """Register channel media handler for additional bot clients"""
     @client.on_message(filters.channel & media_filter, group=5)
@@ -86,58 +93,38 @@ async def private_media_handler(bot, m: Message):
         
         logging.info(f"Processing file from user {user_id}: {file_name} (unique_id: {unique_file_id})")
         
-        # Connect to database
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Create or get user
-            await User.create_or_get(conn, user_id, username, first_name, last_name)
-            
-            # Check rate limits
-            can_generate_5min = await RateLimitTracker.check_limit(
-                conn, user_id, '5min', Var.RATE_LIMIT_PER_5MIN
-            )
-            can_generate_hour = await RateLimitTracker.check_limit(
-                conn, user_id, 'hour', Var.RATE_LIMIT_PER_HOUR
-            )
-            can_generate_day = await RateLimitTracker.check_limit(
-                conn, user_id, 'day', Var.RATE_LIMIT_PER_DAY
-            )
-            
-            if not (can_generate_5min and can_generate_hour and can_generate_day):
-                await m.reply_text(
-                    "⚠️ **Rate Limit Exceeded**\n\n"
-                    "You've reached your link generation limit:\n"
-                    f"• Per 5 minutes: {Var.RATE_LIMIT_PER_5MIN} links\n"
-                    f"• Per hour: {Var.RATE_LIMIT_PER_HOUR} links\n"
-                    f"• Per day: {Var.RATE_LIMIT_PER_DAY} links\n\n"
-                    "Please try again later! ⏰",
-                    reply_to_message_id=m.id
-                )
-                return
-            
-            # Create or get file (automatically handles deduplication via unique_file_id)
-            file_data = await File.create_or_get(
-                conn, unique_file_id, file_name, file_size, mime_type, 
-                user_id, bot_index=0, bot_file_id=bot_file_id
+        # Check and count against all rate limit windows at once
+        with ingest_timer.step('rate_limit'):
+            allowed = await rate_limiter.consume(user_id)
+        if not allowed:
+            await m.reply_text(
+                "⚠️ **Rate Limit Exceeded**\n\n"
+                "You've reached your link generation limit:\n"
+                f"• Per 5 minutes: {Var.RATE_LIMIT_PER_5MIN} links\n"
+                f"• Per hour: {Var.RATE_LIMIT_PER_HOUR} links\n"
+                f"• Per day: {Var.RATE_LIMIT_PER_DAY} links\n\n"
+                "Please try again later! ⏰",
+                reply_to_message_id=m.id
             )
-            
-            # Generate link with expiry and integrity
-            link_data = await GeneratedLink.create_link(
-                conn, unique_file_id, user_id, expiry_hours=168, secret_key=Var.SECRET_KEY
+            return
+        
+        # Upsert user and file and create the link in one round trip
+        try:
+            link_data = await ingest_upload(
+                unique_file_id, file_name, file_size, mime_type, 0, bot_file_id,
+                user_id, username, first_name, last_name, secret_key=Var.SECRET_KEY
             )
-            
-            expiry_timestamp = link_data['expiry_timestamp']
-            integrity_hash = link_data['integrity_hash']
-            
-            # Increment rate limit counters
-            await RateLimitTracker.increment_count(conn, user_id, '5min')
-            await RateLimitTracker.increment_count(conn, user_id, 'hour')
-            await RateLimitTracker.increment_count(conn, user_id, 'day')
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
-        
-        # Build link URL
-        link_url = f"{Var.URL}f/{unique_file_id}/{expiry_timestamp}/{integrity_hash}"
+        except Exception:
+            # No link was generated, so it must not count against the quota
+            await rate_limiter.refund(user_id)
+            raise
+        expiry_timestamp = link_data['expiry_timestamp']
+        
+        # Build self-contained signed link URL (streams without DB lookups)
+        link_url = build_signed_url(
+            unique_file_id, link_data['id'], 0, bot_file_id, file_size,
+            mime_type, file_name, expiry_timestamp, uploader_id=user_id
+        )
         
         # Format file size
         def format_size(bytes_size):
@@ -148,16 +135,17 @@ async def private_media_handler(bot, m: Message):
             return f"{bytes_size:.2f} TB"
         
         # REPLY to original message (not send new)
-        await m.reply_text(
-            f"✅ **File Link Generated!**\n\n"
-            f"📄 **Name:** `{file_name}`\n"
-            f"📦 **Size:** `{format_size(file_size)}`\n"
-            f"🔗 **Link:** `{link_url}`\n\n"
-            f"⏰ **Expires in:** 7 days\n\n"
-            f"_Click the link to stream or download your file_",
-            disable_web_page_preview=True,
-            reply_to_message_id=m.id
-        )
+        with ingest_timer.step('reply'):
+            await m.reply_text(
+                f"✅ **File Link Generated!**\n\n"
+                f"📄 **Name:** `{file_name}`\n"
+                f"📦 **Size:** `{format_size(file_size)}`\n"
+                f"🔗 **Link:** `{link_url}`\n\n"
+                f"⏰ **Expires in:** {expires_in(expiry_timestamp)}\n\n"
+                f"_Click the link to stream or download your file_",
+                disable_web_page_preview=True,
+                reply_to_message_id=m.id
+            )
         
         logging.info(f"✅ Link generated for {file_name}: {link_url}")
         
@@ -200,29 +188,18 @@ async def channel_media_handler(bot, m: Message):
         
         logging.info(f"Processing file from channel {channel_id}: {file_name} (unique_id: {unique_file_id})")
         
-        # Connect to database
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Use channel ID as uploader (already exists as user from bot fixes)
-            # Create or get file
-            file_data = await File.create_or_get(
-                conn, unique_file_id, file_name, file_size, mime_type, 
-                channel_id, bot_index=0, bot_file_id=bot_file_id,
-                channel_id=channel_id, message_id=message_id
-            )
-            
-            # Generate link with expiry and integrity
-            link_data = await GeneratedLink.create_link(
-                conn, unique_file_id, channel_id, expiry_hours=168, secret_key=Var.SECRET_KEY
-            )
-            
-            expiry_timestamp = link_data['expiry_timestamp']
-            integrity_hash = link_data['integrity_hash']
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
+        # Use channel ID as uploader; file and link are stored in one round trip
+        link_data = await ingest_upload(
+            unique_file_id, file_name, file_size, mime_type, 0, bot_file_id,
+            channel_id, channel_id=channel_id, message_id=message_id, secret_key=Var.SECRET_KEY
+        )
+        expiry_timestamp = link_data['expiry_timestamp']
         
-        # Build link URL
-        link_url = f"{Var.URL}f/{unique_file_id}/{expiry_timestamp}/{integrity_hash}"
+        # Build self-contained signed link URL (streams without DB lookups)
+        link_url = build_signed_url(
+            unique_file_id, link_data['id'], 0, bot_file_id, file_size,
+            mime_type, file_name, expiry_timestamp, uploader_id=channel_id
+        )
         
         # Format file size
         def format_size(bytes_size):
@@ -238,7 +215,7 @@ async def channel_media_handler(bot, m: Message):
             f"📄 **Name:** `{file_name}`\n"
             f"📦 **Size:** `{format_size(file_size)}`\n"
             f"🔗 **Link:** `{link_url}`\n\n"
-            f"⏰ **Expires in:** 7 days",
+            f"⏰ **Expires in:** {expires_in(expiry_timestamp)}",
             disable_web_page_preview=True,
             reply_to_message_id=m.id
         )
@@ -99,7 +99,7 @@ async def private_media_handler(_, m: Message):
         file_hash = File.calculate_file_hash(file_unique_id, file_size)
         
         # Connect to database
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             # Create or get user
             await User.create_or_get(conn, user_id, username, first_name, last_name)
             
@@ -153,10 +153,6 @@ async def private_media_handler(_, m: Message):
                 await RateLimitTracker.increment_count(conn, user_id, 'hour')
                 await RateLimitTracker.increment_count(conn, user_id, 'day')
                 
-                # Commit if SQLite
-                if db_manager.is_sqlite:
-                    await conn.commit()
-                
                 stream_link = f"{Var.URL}f/{unique_file_id}"
                 
                 rm = InlineKeyboardMarkup(
@@ -201,10 +197,6 @@ async def private_media_handler(_, m: Message):
                 await RateLimitTracker.increment_count(conn, user_id, 'hour')
                 await RateLimitTracker.increment_count(conn, user_id, 'day')
                 
-                # Commit if SQLite
-                if db_manager.is_sqlite:
-                    await conn.commit()
-                
                 stream_link = f"{Var.URL}f/{unique_file_id}"
                 
                 rm = InlineKeyboardMarkup(
@@ -278,17 +270,11 @@ async def channel_media_handler(client, m: Message):
         file_is_new = False
         
         # Connect to database and save file metadata
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             # Check if file exists
-            if not db_manager.is_sqlite:
-                existing_file = await conn.fetchrow(
-                    'SELECT * FROM files WHERE file_hash = $1', file_hash
-                )
-            else:
-                cursor = await conn.execute(
-                    'SELECT * FROM files WHERE file_hash = ?', (file_hash,)
-                )
-                existing_file = await cursor.fetchone()
+            existing_file = await conn.fetchrow(
+                'SELECT * FROM files WHERE file_hash = $1', file_hash
+            )
             
             file_is_new = (existing_file is None)
             
@@ -299,17 +285,10 @@ async def channel_media_handler(client, m: Message):
             file_id = file_data['id']
             
             # Check if this bot already has a mapping for this file
-            if not db_manager.is_sqlite:
-                existing_mapping = await conn.fetchrow(
-                    'SELECT * FROM file_bot_mapping WHERE file_id = $1 AND bot_index = $2',
-                    file_id, bot_index
-                )
-            else:
-                cursor = await conn.execute(
-                    'SELECT * FROM file_bot_mapping WHERE file_id = ? AND bot_index = ?',
-                    (file_id, bot_index)
-                )
-                existing_mapping = await cursor.fetchone()
+            existing_mapping = await conn.fetchrow(
+                'SELECT * FROM file_bot_mapping WHERE file_id = $1 AND bot_index = $2',
+                file_id, bot_index
+            )
             
             if not existing_mapping:
                 # Add bot mapping with media_type
@@ -319,10 +298,6 @@ async def channel_media_handler(client, m: Message):
                 
                 logging.info(f"Tracked file in channel {channel_id}: {file_name} (bot_{bot_index}, type={media_type})")
             
-            # Commit if SQLite
-            if db_manager.is_sqlite:
-                await conn.commit()
-            
             # If COPY_FILES_TO_CHANNEL is enabled and file is new, send to BIN_CHANNEL
             if Var.COPY_FILES_TO_CHANNEL and file_is_new:
                 # Get all bots that have this file
@@ -331,9 +306,9 @@ async def channel_media_handler(client, m: Message):
                 if all_bot_mappings:
                     # Randomly select one bot to send the file
                     selected_mapping = random.choice(all_bot_mappings)
-                    selected_bot_index = selected_mapping['bot_index'] if isinstance(selected_mapping, dict) else selected_mapping[2]
-                    selected_file_id = selected_mapping['telegram_file_id'] if isinstance(selected_mapping, dict) else selected_mapping[3]
-                    selected_media_type = selected_mapping['media_type'] if isinstance(selected_mapping, dict) else selected_mapping[6]
+                    selected_bot_index = selected_mapping['bot_index']
+                    selected_file_id = selected_mapping['telegram_file_id']
+                    selected_media_type = selected_mapping['media_type']
                     
                     # Get the bot client
                     send_bot = multi_clients.get(selected_bot_index, StreamBot)
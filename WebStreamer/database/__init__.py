@@ -1,10 +1,18 @@
 # Database module
 from .connection import db_manager, get_db
+from .counters import counters
+from .access_logs import access_log_writer
+from .stats import global_stats
+from .maintenance import maintenance
 from .models import User, File, GeneratedLink, LinkAccessLog, OTPToken, RateLimitTracker
 
 __all__ = [
     'db_manager',
     'get_db',
+    'counters',
+    'access_log_writer',
+    'global_stats',
+    'maintenance',
     'User',
     'File',
     'GeneratedLink',
@@ -0,0 +1,171 @@
+# Batched asynchronous writer for link_access_logs and its hourly rollups
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+from .connection import db_manager
+from .models import LinkAccessLog
+from .partitions import access_log_partitions
+from .queries import ACCESS_ROLLUP_ADD
+from ..vars import Var
+
+ACCESS_LOG_COLUMNS = ['link_id', 'accessed_at', 'ip_address', 'user_agent', 'access_type']
+
+
+class AccessLogWriter:
+    """
+    Bounded queue of access log records drained by a background task that
+    bulk-inserts them (COPY on PostgreSQL, one transaction per batch on SQLite)
+    into the day's partition. Under pressure records are sampled, and dropped
+    once the queue is full. Every access, sampled or not, is counted into the
+    hourly rollups that the analytics endpoints read.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, sample_rate: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = max(1, sample_rate)
+        self.high_water = int(max_queue * 0.75)
+        self._task = None
+        self._seen = 0
+        # (hour, link_id, unique_file_id, access_type) -> hits not yet flushed
+        self.rollups: Dict[tuple, int] = {}
+        # Metrics
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_batch_size = 0
+        self.last_queue_latency_ms = 0.0
+        self.last_flush_ms = 0.0
+
+    def log(self, link_id: int, ip_address: str, user_agent: str, access_type: str = 'view',
+            unique_file_id: str = None):
+        """Queue an access record; never blocks the request"""
+        if not link_id:
+            return
+        now = datetime.now()
+        key = (now.replace(minute=0, second=0, microsecond=0), link_id, unique_file_id, access_type)
+        self.rollups[key] = self.rollups.get(key, 0) + 1
+        self._seen += 1
+        if self.queue.qsize() >= self.high_water and self._seen % self.sample_rate:
+            self.sampled_out += 1
+            return
+        try:
+            self.queue.put_nowait((time.monotonic(), link_id, now, ip_address, user_agent, access_type))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _next_batch(self) -> Tuple[List[tuple], bool]:
+        """Up to batch_size records, and whether the stop sentinel was reached"""
+        item = await self.queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def write(self, batch: List[tuple]):
+        started = time.monotonic()
+        tables: Dict[str, List[tuple]] = {}
+        for _, link_id, accessed_at, ip_address, user_agent, access_type in batch:
+            tables.setdefault(access_log_partitions.table_for(accessed_at.date()), []).append(
+                (link_id, accessed_at, LinkAccessLog.anonymize_ip(ip_address),
+                 LinkAccessLog.truncate_user_agent(user_agent), access_type)
+            )
+        try:
+            await access_log_partitions.ensure({item[2].date() for item in batch})
+        except Exception as e:
+            logging.error(f"Error creating access log partitions: {e}")
+        try:
+            for table, records in tables.items():
+                await db_manager.copy_records(table, ACCESS_LOG_COLUMNS, records)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logging.error(f"Error writing {len(batch)} access logs: {e}")
+        await self.flush_rollups()
+        finished = time.monotonic()
+        self.last_batch_size = len(batch)
+        self.last_queue_latency_ms = (started - sum(item[0] for item in batch) / len(batch)) * 1000
+        self.last_flush_ms = (finished - started) * 1000
+        logging.debug(
+            f"Access logs: wrote {len(batch)} in {self.last_flush_ms:.1f}ms "
+            f"(queue latency {self.last_queue_latency_ms:.1f}ms, dropped {self.dropped})"
+        )
+
+    async def flush_rollups(self):
+        """Add the hits counted since the last flush to link_access_hourly"""
+        if not self.rollups:
+            return
+        rollups, self.rollups = self.rollups, {}
+        try:
+            await db_manager.executemany(ACCESS_ROLLUP_ADD, [(*key, hits) for key, hits in rollups.items()])
+        except Exception as e:
+            # Keep the hits for the next flush
+            for key, hits in rollups.items():
+                self.rollups[key] = self.rollups.get(key, 0) + hits
+            logging.error(f"Error writing {len(rollups)} access rollups: {e}")
+
+    async def run(self):
+        """Background loop that drains the queue in batches until the stop sentinel"""
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self.write(batch)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the writer and flush everything still queued"""
+        if self._task:
+            # Cancelling would lose the batch being collected or written; the
+            # sentinel lets the loop finish it and exit
+            await self.queue.put(None)
+            try:
+                await self._task
+            except Exception as e:
+                logging.error(f"Access log writer failed: {e}")
+            self._task = None
+        while not self.queue.empty():
+            batch = []
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+            await self.write(batch)
+        await self.flush_rollups()
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self.queue.qsize(),
+            "pending_rollups": len(self.rollups),
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_batch_size": self.last_batch_size,
+            "last_queue_latency_ms": round(self.last_queue_latency_ms, 2),
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+access_log_writer = AccessLogWriter(
+    Var.ACCESS_LOG_QUEUE_SIZE,
+    Var.ACCESS_LOG_BATCH_SIZE,
+    Var.ACCESS_LOG_FLUSH_INTERVAL,
+    Var.ACCESS_LOG_SAMPLE_RATE
+)
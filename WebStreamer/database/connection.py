@@ -1,126 +1,380 @@
 # Database connection manager
+import asyncio
 import asyncpg
-import aiosqlite
 import logging
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .sqlite_engine import SQLiteEngine, SQLiteConnection
+from .queries import Query, REPLICA_LAG
+from .records import PgRecord
 from ..vars import Var
 
+
+QueryLike = Union[str, Query]
+
+# Errors that mean the replica itself is unusable; the read is retried on the primary
+# (SerializationError covers queries cancelled by recovery conflicts on a standby)
+REPLICA_ERRORS = (OSError, asyncio.TimeoutError, asyncpg.PostgresConnectionError,
+                  asyncpg.InterfaceError, asyncpg.SerializationError)
+
+
 class DatabaseManager:
+    # Distinct statements tracked for latency metrics
+    MAX_TRACKED_STATEMENTS = 500
+
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
-        self.sqlite_conn = None
+        self.sqlite: Optional[SQLiteEngine] = None
         self.database_url = Var.DATABASE_URL
         self.is_sqlite = self.database_url.startswith('sqlite')
-    
+        # Pool and statement metrics
+        self.acquisitions = 0
+        self.acquire_wait_total_ms = 0.0
+        self.acquire_wait_max_ms = 0.0
+        self.statement_stats: Dict[str, list] = {}
+        # Optional read replica (PostgreSQL only)
+        self.replica_url = '' if self.is_sqlite else Var.DATABASE_REPLICA_URL
+        self.replica_pool: Optional[asyncpg.Pool] = None
+        self.replica_lag: Optional[float] = None
+        self.replica_checked_at = 0.0
+        self.replica_reads = 0
+        self.replica_fallbacks = 0
+        self._replica_check: Optional[asyncio.Task] = None
+
     async def connect(self):
         """Create database connection pool"""
         try:
             if self.is_sqlite:
-                # SQLite connection for local testing
+                # SQLite engine for small single-node deployments
                 db_path = self.database_url.replace('sqlite:///', '')
-                self.sqlite_conn = await aiosqlite.connect(db_path)
-                logging.info(f"✅ SQLite database connected: {db_path}")
+                self.sqlite = SQLiteEngine(
+                    db_path,
+                    readers=Var.SQLITE_READERS,
+                    synchronous=Var.SQLITE_SYNCHRONOUS,
+                    batch_size=Var.SQLITE_WRITE_BATCH
+                )
+                await self.sqlite.connect()
+                logging.info(f"✅ SQLite database connected: {db_path} ({Var.SQLITE_READERS} readers, WAL)")
             else:
-                # PostgreSQL connection for production
+                # PostgreSQL connection for production. The pool grows up to
+                # max_size under load and closes connections idle for longer
+                # than DB_POOL_MAX_IDLE seconds, shrinking back to min_size.
                 self.pool = await asyncpg.create_pool(
                     self.database_url,
-                    min_size=1,
-                    max_size=3,
+                    min_size=Var.DB_POOL_MIN_SIZE,
+                    max_size=Var.DB_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=Var.DB_POOL_MAX_IDLE,
+                    statement_cache_size=Var.DB_STATEMENT_CACHE_SIZE,
+                    record_class=PgRecord,
                     command_timeout=60
                 )
-                logging.info("✅ PostgreSQL database connected successfully")
+                logging.info(
+                    f"✅ PostgreSQL database connected successfully "
+                    f"(pool {Var.DB_POOL_MIN_SIZE}-{Var.DB_POOL_MAX_SIZE})"
+                )
+                if self.replica_url:
+                    self.replica_checked_at = time.monotonic()
+                    await self._check_replica(startup=True)
             return True
         except Exception as e:
             logging.error(f"❌ Database connection failed: {e}")
             return False
-    
+
     async def disconnect(self):
         """Close database connection pool"""
-        if self.is_sqlite and self.sqlite_conn:
-            await self.sqlite_conn.close()
+        if self.is_sqlite and self.sqlite:
+            await self.sqlite.close()
             logging.info("SQLite database disconnected")
         elif self.pool:
+            if self._replica_check:
+                self._replica_check.cancel()
+            if self.replica_pool:
+                await self.replica_pool.close()
+                self.replica_pool = None
+                self.replica_lag = None
             await self.pool.close()
             logging.info("PostgreSQL database disconnected")
-    
-    async def execute(self, query: str, *args):
-        """Execute a query"""
+
+    async def _check_replica(self, startup: bool = False):
+        """Measure replication lag, opening the replica pool first if needed"""
+        was_usable = self.replica_usable
+        try:
+            if self.replica_pool is None:
+                self.replica_pool = await asyncpg.create_pool(
+                    self.replica_url,
+                    min_size=1,
+                    max_size=Var.DB_REPLICA_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=Var.DB_POOL_MAX_IDLE,
+                    statement_cache_size=Var.DB_STATEMENT_CACHE_SIZE,
+                    record_class=PgRecord,
+                    command_timeout=60,
+                    timeout=5
+                )
+                logging.info(f"✅ Read replica connected (pool 1-{Var.DB_REPLICA_POOL_MAX_SIZE})")
+            async with self.replica_pool.acquire(timeout=5) as conn:
+                self.replica_lag = await conn.fetchval(REPLICA_LAG.postgres, timeout=5)
+        except Exception as e:
+            self.replica_lag = None
+            if was_usable or startup:
+                logging.warning(f"⚠️ Read replica unavailable, reading from the primary: {e}")
+            return
+        if was_usable and not self.replica_usable:
+            logging.warning(f"⚠️ Read replica is {self.replica_lag:.1f}s behind, reading from the primary")
+        elif self.replica_usable and not was_usable:
+            logging.info(f"✅ Serving reads from the replica ({self.replica_lag:.1f}s behind)")
+
+    @property
+    def replica_usable(self) -> bool:
+        """Replica reachable and within the staleness budget at the last check"""
+        return (self.replica_pool is not None and self.replica_lag is not None
+                and self.replica_lag <= Var.DB_REPLICA_MAX_LAG)
+
+    def _use_replica(self) -> bool:
+        """Whether a read may go to the replica; re-checks its lag in the background"""
+        if not self.replica_url:
+            return False
+        now = time.monotonic()
+        if now - self.replica_checked_at >= Var.DB_REPLICA_CHECK_INTERVAL and (
+                self._replica_check is None or self._replica_check.done()):
+            self.replica_checked_at = now
+            self._replica_check = asyncio.ensure_future(self._check_replica())
+        if self.replica_usable:
+            return True
+        self.replica_fallbacks += 1
+        return False
+
+    def _replica_failed(self, error: Exception):
+        """Stop reading from the replica until the next lag check succeeds"""
+        if self.replica_lag is not None:
+            logging.warning(f"⚠️ Read replica failed, reading from the primary: {error}")
+        self.replica_lag = None
+        self.replica_fallbacks += 1
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Acquire a connection for several statements. PostgreSQL hands out a
+        pooled connection (recording how long we waited for it), SQLite an
+        asyncpg-like facade over the engine.
+        """
         if self.is_sqlite:
-            # SQLite uses ? placeholders instead of $1, $2
-            query = self._convert_query_placeholders(query)
-            async with self.sqlite_conn.execute(query, args) as cursor:
-                await self.sqlite_conn.commit()
-                return cursor.rowcount
+            yield SQLiteConnection(self.sqlite)
+            return
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            waited = (time.perf_counter() - started) * 1000
+            self.acquisitions += 1
+            self.acquire_wait_total_ms += waited
+            self.acquire_wait_max_ms = max(self.acquire_wait_max_ms, waited)
+            yield conn
+
+    @asynccontextmanager
+    async def acquire_read(self):
+        """
+        Acquire a connection for read-only work that tolerates DB_REPLICA_MAX_LAG
+        seconds of staleness: the replica when it is healthy, otherwise the primary.
+        """
+        conn = None
+        if self._use_replica():
+            try:
+                conn = await self.replica_pool.acquire(timeout=5)
+            except REPLICA_ERRORS as e:
+                self._replica_failed(e)
+        if conn is None:
+            async with self.acquire() as conn:
+                yield conn
+            return
+        self.replica_reads += 1
+        try:
+            yield conn
+        finally:
+            await self.replica_pool.release(conn)
+
+    async def _read(self, method: str, sql: str, args):
+        """Run a read on the replica, retrying on the primary if the replica fails"""
+        if self._use_replica():
+            try:
+                async with self.replica_pool.acquire(timeout=5) as conn:
+                    result = await getattr(conn, method)(sql, *args)
+                self.replica_reads += 1
+                return result
+            except REPLICA_ERRORS as e:
+                self._replica_failed(e)
+        async with self.acquire() as conn:
+            return await getattr(conn, method)(sql, *args)
+
+    def _compile(self, query: QueryLike) -> Tuple[str, str]:
+        """SQL text for the active dialect plus the label used for metrics"""
+        if isinstance(query, Query):
+            return query.text(self.is_sqlite), query.name
+        # Ad-hoc SQL is written in PostgreSQL dialect; SQLite converts it (cached)
+        return query, query
+
+    def _record(self, label: str, started: float):
+        """Record latency for one statement execution"""
+        elapsed = (time.perf_counter() - started) * 1000
+        stats = self.statement_stats.get(label)
+        if stats is None:
+            if len(self.statement_stats) >= self.MAX_TRACKED_STATEMENTS:
+                return
+            stats = self.statement_stats[label] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    async def execute(self, query: QueryLike, *args) -> Any:
+        """Execute a statement"""
+        started = time.perf_counter()
+        sql, label = self._compile(query)
+        if self.is_sqlite:
+            result = await self.sqlite.execute(sql, *args)
         else:
-            # Convert ? to $1, $2, etc. for PostgreSQL
-            query = self._convert_to_postgres_placeholders(query)
-            async with self.pool.acquire() as conn:
-                return await conn.execute(query, *args)
-    
-    async def fetch(self, query: str, *args):
-        """Fetch multiple rows"""
+            async with self.acquire() as conn:
+                result = await conn.execute(sql, *args)
+        self._record(label, started)
+        return result
+
+    async def executemany(self, query: QueryLike, args_list) -> None:
+        """Execute a statement once per argument tuple in a single batch"""
+        started = time.perf_counter()
+        sql, label = self._compile(query)
+        if self.is_sqlite:
+            await self.sqlite.executemany(sql, args_list)
+        else:
+            async with self.acquire() as conn:
+                await conn.executemany(sql, args_list)
+        self._record(label, started)
+
+    async def copy_records(self, table: str, columns: list, records: list) -> None:
+        """Bulk insert records (COPY on PostgreSQL, one transaction on SQLite)"""
+        started = time.perf_counter()
         if self.is_sqlite:
-            query = self._convert_query_placeholders(query)
-            async with self.sqlite_conn.execute(query, args) as cursor:
-                rows = await cursor.fetchall()
-                # Convert to dict-like objects
-                columns = [desc[0] for desc in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
+            placeholders = ', '.join('?' for _ in columns)
+            await self.sqlite.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', records
+            )
         else:
-            # Convert ? to $1, $2, etc. for PostgreSQL
-            query = self._convert_to_postgres_placeholders(query)
-            async with self.pool.acquire() as conn:
-                return await conn.fetch(query, *args)
-    
-    async def fetchrow(self, query: str, *args):
+            async with self.acquire() as conn:
+                await conn.copy_records_to_table(table, records=records, columns=columns)
+        self._record(f'COPY {table}', started)
+
+    async def fetch(self, query: QueryLike, *args, replica: bool = False) -> List:
+        """Fetch multiple rows (replica=True reads from the replica when it is healthy)"""
+        started = time.perf_counter()
+        sql, label = self._compile(query)
+        if self.is_sqlite:
+            result = await self.sqlite.fetch(sql, *args)
+        elif replica:
+            result = await self._read('fetch', sql, args)
+        else:
+            async with self.acquire() as conn:
+                result = await conn.fetch(sql, *args)
+        self._record(label, started)
+        return result
+
+    async def fetchrow(self, query: QueryLike, *args, replica: bool = False) -> Optional[Any]:
         """Fetch single row"""
+        started = time.perf_counter()
+        sql, label = self._compile(query)
         if self.is_sqlite:
-            query = self._convert_query_placeholders(query)
-            async with self.sqlite_conn.execute(query, args) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    columns = [desc[0] for desc in cursor.description]
-                    return dict(zip(columns, row))
-                return None
+            result = await self.sqlite.fetchrow(sql, *args)
+        elif replica:
+            result = await self._read('fetchrow', sql, args)
         else:
-            # Convert ? to $1, $2, etc. for PostgreSQL
-            query = self._convert_to_postgres_placeholders(query)
-            async with self.pool.acquire() as conn:
-                return await conn.fetchrow(query, *args)
-    
-    async def fetchval(self, query: str, *args):
+            async with self.acquire() as conn:
+                result = await conn.fetchrow(sql, *args)
+        self._record(label, started)
+        return result
+
+    async def fetchval(self, query: QueryLike, *args, replica: bool = False) -> Any:
         """Fetch single value"""
+        started = time.perf_counter()
+        sql, label = self._compile(query)
         if self.is_sqlite:
-            query = self._convert_query_placeholders(query)
-            async with self.sqlite_conn.execute(query, args) as cursor:
-                row = await cursor.fetchone()
-                return row[0] if row else None
+            result = await self.sqlite.fetchval(sql, *args)
+        elif replica:
+            result = await self._read('fetchval', sql, args)
         else:
-            # Convert ? to $1, $2, etc. for PostgreSQL
-            query = self._convert_to_postgres_placeholders(query)
-            async with self.pool.acquire() as conn:
-                return await conn.fetchval(query, *args)
-    
-    def _convert_query_placeholders(self, query: str) -> str:
-        """Convert PostgreSQL $1, $2 placeholders to SQLite ? placeholders"""
-        import re
-        # Replace $1, $2, etc. with ?
-        return re.sub(r'\$\d+', '?', query)
-    
-    def _convert_to_postgres_placeholders(self, query: str) -> str:
-        """Convert ? placeholders to PostgreSQL $1, $2, $3, etc."""
-        counter = 0
-        def replacer(match):
-            nonlocal counter
-            counter += 1
-            return f'${counter}'
-        import re
-        return re.sub(r'\?', replacer, query)
-    
+            async with self.acquire() as conn:
+                result = await conn.fetchval(sql, *args)
+        self._record(label, started)
+        return result
+
+    async def stream(self, query: QueryLike, *args, batch_size: int = 1000, replica: bool = False):
+        """
+        Yield a large result in batches of at most batch_size rows, so memory
+        stays flat whatever its size. PostgreSQL reads through a server-side
+        cursor inside one read-only snapshot; SQLite fetches incrementally
+        from a reader. The connection is held until the generator finishes,
+        so callers that may stop early must aclose() it.
+        """
+        sql, _ = self._compile(query)
+        if self.is_sqlite:
+            async for rows in self.sqlite.stream(sql, args, batch_size):
+                yield rows
+            return
+        async with (self.acquire_read() if replica else self.acquire()) as conn:
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                cursor = await conn.cursor(sql, *args)
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def metrics(self) -> Dict:
+        """Pool usage, acquire wait times and per-statement latency"""
+        pool = {}
+        if self.pool:
+            pool = {
+                "size": self.pool.get_size(),
+                "idle": self.pool.get_idle_size(),
+                "min_size": self.pool.get_min_size(),
+                "max_size": self.pool.get_max_size(),
+            }
+        statements = sorted(
+            (
+                {
+                    "query": " ".join(query.split())[:200],
+                    "calls": calls,
+                    "avg_ms": round(total / calls, 3),
+                    "max_ms": round(longest, 3),
+                    "total_ms": round(total, 3),
+                }
+                for query, (calls, total, longest) in self.statement_stats.items()
+            ),
+            key=lambda stat: stat["total_ms"],
+            reverse=True
+        )
+        return {
+            "backend": "sqlite" if self.is_sqlite else "postgresql",
+            "pool": pool,
+            "sqlite": self.sqlite.metrics() if self.sqlite else {},
+            "acquisitions": self.acquisitions,
+            "acquire_wait_avg_ms": round(self.acquire_wait_total_ms / self.acquisitions, 3) if self.acquisitions else 0,
+            "acquire_wait_max_ms": round(self.acquire_wait_max_ms, 3),
+            "replica": self._replica_metrics(),
+            "statements": statements,
+        }
+
+    def _replica_metrics(self) -> Dict:
+        if not self.replica_url:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "usable": self.replica_usable,
+            "lag_s": round(self.replica_lag, 3) if self.replica_lag is not None else None,
+            "max_lag_s": Var.DB_REPLICA_MAX_LAG,
+            "pool_size": self.replica_pool.get_size() if self.replica_pool else 0,
+            "reads": self.replica_reads,
+            "fallbacks": self.replica_fallbacks,
+        }
+
     async def get_connection(self):
         """Get raw connection for migrations"""
         if self.is_sqlite:
-            return self.sqlite_conn
+            return SQLiteConnection(self.sqlite)
         else:
             return await self.pool.acquire()
 
@@ -0,0 +1,116 @@
+# Write-behind counters for views, downloads, link access and bytes served
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Tuple
+from .connection import db_manager
+from .queries import (FILE_VIEWS_ADD, FILE_DOWNLOADS_ADD, LINK_ACCESS_ADD, FILE_BANDWIDTH_ADD,
+                      LINK_BANDWIDTH_ADD, BOT_BANDWIDTH_ADD, USER_BANDWIDTH_ADD)
+from ..vars import Var
+
+# One batched statement per counter
+COUNTER_QUERIES = {
+    'file_views': FILE_VIEWS_ADD,
+    'file_downloads': FILE_DOWNLOADS_ADD,
+    'link_access': LINK_ACCESS_ADD,
+    'file_bandwidth': FILE_BANDWIDTH_ADD,
+    'link_bandwidth': LINK_BANDWIDTH_ADD,
+    'bot_bandwidth': BOT_BANDWIDTH_ADD,
+    'user_bandwidth': USER_BANDWIDTH_ADD,
+}
+
+
+class CounterAggregator:
+    """
+    Accumulates counter increments per row in memory and applies them in
+    batches every few seconds (and at shutdown), so hot rows are updated
+    once per flush instead of once per request.
+    """
+
+    def __init__(self, flush_interval: int):
+        self.flush_interval = flush_interval
+        self.pending: Dict[Tuple[str, object], int] = defaultdict(int)
+        # Everything counted by this process, flushed or not
+        self.totals: Dict[str, int] = defaultdict(int)
+        self.flushing: Dict[Tuple[str, object], int] = {}
+        # Held while deltas move from memory to the database, so readers that
+        # combine the two (global stats reconciliation) see each delta once
+        self.lock = asyncio.Lock()
+        self._task = None
+        self._stopping = None
+
+    def incr(self, counter: str, key, amount: int = 1):
+        if key is None:
+            return
+        self.pending[(counter, key)] += amount
+        self.totals[counter] += amount
+
+    def pending_total(self, counter: str) -> int:
+        """Sum of deltas not yet written for one counter"""
+        return sum(
+            amount
+            for deltas in (self.pending, self.flushing)
+            for (name, _), amount in deltas.items()
+            if name == counter
+        )
+
+    def add_view(self, unique_file_id: str, link_id: int = None):
+        self.incr('file_views', unique_file_id)
+        self.incr('link_access', link_id)
+
+    def add_download(self, unique_file_id: str):
+        self.incr('file_downloads', unique_file_id)
+
+    def add_bytes(self, amount: int, unique_file_id: str, link_id: int = None,
+                  bot_index: int = None, uploader_id: int = None):
+        self.incr('file_bandwidth', unique_file_id, amount)
+        self.incr('link_bandwidth', link_id, amount)
+        self.incr('bot_bandwidth', bot_index, amount)
+        self.incr('user_bandwidth', uploader_id, amount)
+
+    async def flush(self):
+        """Write all pending deltas to the database"""
+        async with self.lock:
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, defaultdict(int)
+            self.flushing = pending
+
+            batches = defaultdict(list)
+            # Sorted keys keep row lock order consistent between nodes
+            for (counter, key), amount in sorted(pending.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                batches[counter].append((amount, key))
+
+            for counter, rows in batches.items():
+                try:
+                    await db_manager.executemany(COUNTER_QUERIES[counter], rows)
+                except Exception as e:
+                    logging.error(f"Error flushing {counter} counters: {e}")
+                    # Keep the deltas for the next flush instead of losing them
+                    for amount, key in rows:
+                        self.pending[(counter, key)] += amount
+            self.flushing = {}
+
+    async def run(self):
+        """Background loop that flushes counters periodically until stopped"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Let an in-progress flush finish, then write whatever is still pending"""
+        if self._task:
+            # Cancelling could interrupt a flush and lose the deltas it holds
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+counters = CounterAggregator(Var.COUNTER_FLUSH_INTERVAL)
@@ -0,0 +1,162 @@
+# Single round-trip ingestion of uploaded files
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from .connection import db_manager
+from .models import GeneratedLink
+from .queries import (INGEST_UPLOAD, USER_UPSERT, FILE_EXISTS, FILE_UPSERT, FILE_REFRESH, LINK_INSERT,
+                      REUSABLE_LINK)
+from .stats import global_stats
+from ..vars import Var
+
+
+class StepTimer:
+    """Count, total and max latency per named step"""
+
+    def __init__(self):
+        self.steps: Dict[str, list] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            stats = self.steps.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "calls": calls,
+                "avg_ms": round(total / calls, 3),
+                "max_ms": round(longest, 3),
+            }
+            for name, (calls, total, longest) in self.steps.items()
+        }
+
+
+ingest_timer = StepTimer()
+
+
+class ReusableLinkCache:
+    """LRU of each (user, file) pair's latest link, so repeat uploads skip the link lookup"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, unique_file_id: str, min_expiry: int) -> Optional[Dict]:
+        from ..utils.signed_links import revocation_list  # Import here to avoid circular import
+        key = (user_id, unique_file_id)
+        link = self.entries.get(key)
+        if link is None or link['expiry_timestamp'] <= min_expiry or link['id'] in revocation_list.link_ids:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return link
+
+    def discard(self, user_id: int, unique_file_id: str):
+        self.entries.pop((user_id, unique_file_id), None)
+
+    def put(self, user_id: int, unique_file_id: str, link: Dict):
+        self.entries[(user_id, unique_file_id)] = link
+        self.entries.move_to_end((user_id, unique_file_id))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+link_cache = ReusableLinkCache(Var.LINK_CACHE_SIZE)
+
+
+async def ingest_upload(unique_file_id: str, file_name: str, file_size: int, mime_type: str,
+                        bot_index: int, bot_file_id: str, user_id: int, username: str = None,
+                        first_name: str = None, last_name: str = None, channel_id: int = None,
+                        message_id: int = None, expiry_hours: int = 168, secret_key: str = "") -> Dict:
+    """
+    Upsert the uploader and the file and get a link in one round trip (one
+    CTE statement on PostgreSQL, one transaction on SQLite). The uploader's
+    existing link for the file is reused while it has LINK_REUSE_MIN_HOURS
+    left. Returns the link id, expiry_timestamp and integrity_hash.
+    """
+    now = int(time.time())
+    min_expiry = now + Var.LINK_REUSE_MIN_HOURS * 3600
+    cached = link_cache.get(user_id, unique_file_id, min_expiry)
+    if cached:
+        # The file row still takes this upload's bot file_id; only the link lookup is skipped
+        with ingest_timer.step('file_refresh'):
+            refreshed = await db_manager.fetchval(FILE_REFRESH[bot_index], unique_file_id, bot_file_id, cached['id'])
+        if refreshed:
+            return dict(cached)
+        link_cache.discard(user_id, unique_file_id)
+
+    expiry_timestamp = now + (expiry_hours * 3600)
+    integrity_hash = GeneratedLink.generate_integrity_hash(unique_file_id, expiry_timestamp, secret_key)
+
+    # The whole round trip including the commit; on SQLite _ingest_sqlite also times each
+    # statement. The PostgreSQL CTE is one statement, so it is one step
+    with ingest_timer.step('database'):
+        if db_manager.is_sqlite:
+            result = await db_manager.sqlite.run_in_transaction(
+                lambda conn: _ingest_sqlite(
+                    conn, unique_file_id, file_name, file_size, mime_type, bot_index, bot_file_id,
+                    user_id, username, first_name, last_name, channel_id, message_id,
+                    expiry_timestamp, integrity_hash, min_expiry
+                )
+            )
+        else:
+            result = dict(await db_manager.fetchrow(
+                INGEST_UPLOAD[bot_index],
+                unique_file_id, file_name, file_size, mime_type, bot_file_id,
+                user_id, channel_id, message_id, username, first_name, last_name,
+                expiry_timestamp, integrity_hash, min_expiry
+            ))
+
+    from ..utils.response_cache import response_cache  # Import here to avoid circular import
+    if result.pop('user_created'):
+        global_stats.incr('total_users')
+    if result.pop('file_created'):
+        global_stats.incr('total_files')
+        response_cache.invalidate('files', 'stats')
+    if not result.pop('link_reused'):
+        global_stats.incr('active_links')
+        response_cache.invalidate('stats')
+    link_cache.put(user_id, unique_file_id, result)
+    logging.debug(f"Ingested {unique_file_id} for {user_id}: link {result['id']}")
+    return dict(result)
+
+
+async def _ingest_sqlite(conn, unique_file_id, file_name, file_size, mime_type, bot_index, bot_file_id,
+                         user_id, username, first_name, last_name, channel_id, message_id,
+                         expiry_timestamp, integrity_hash, min_expiry) -> Dict:
+    with ingest_timer.step('user_upsert'):
+        user_created = await conn.execute(USER_UPSERT.sqlite, user_id, username, first_name, last_name)
+    with ingest_timer.step('file_upsert'):
+        file_created = not await conn.fetchval(FILE_EXISTS.sqlite, unique_file_id)
+        await conn.execute(
+            FILE_UPSERT[bot_index].sqlite,
+            unique_file_id, file_name, file_size, mime_type, bot_file_id, user_id, channel_id, message_id
+        )
+    with ingest_timer.step('link_lookup'):
+        link = await conn.fetchrow(REUSABLE_LINK.sqlite, user_id, unique_file_id, min_expiry)
+    link_reused = link is not None
+    if not link_reused:
+        with ingest_timer.step('link_insert'):
+            link = await conn.fetchrow(LINK_INSERT.sqlite, unique_file_id, user_id, expiry_timestamp, integrity_hash)
+    return {
+        **dict(link),
+        'link_reused': link_reused,
+        'user_created': user_created > 0,
+        'file_created': file_created,
+    }
@@ -0,0 +1,113 @@
+# Background retention and compaction of append-only tables
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict
+from .connection import db_manager
+from .partitions import access_log_partitions
+from .queries import PRUNE_EXPIRED_LINKS, PRUNE_OTPS, PRUNE_RATE_LIMITS
+from ..vars import Var
+
+
+def affected_rows(result) -> int:
+    """Row count from an execute result ("DELETE 42" on PostgreSQL, an int on SQLite)"""
+    if isinstance(result, int):
+        return result
+    try:
+        return int(str(result).rsplit(' ', 1)[-1])
+    except ValueError:
+        return 0
+
+
+class MaintenanceJob:
+    """
+    Periodically removes expired links, OTPs and rate-limit rows in small
+    batches, so no single statement holds locks for long. Old access logs
+    are dropped a whole daily partition at a time (their hits already live
+    in link_access_hourly), and upcoming partitions are created ahead.
+    """
+
+    def __init__(self, interval: int, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.runs = 0
+        self.last_run: Dict = {}
+        self.removed_total: Dict[str, int] = {}
+        self._task = None
+
+    async def _prune(self, statement, cutoff) -> int:
+        removed = 0
+        while True:
+            batch = affected_rows(await db_manager.execute(statement, cutoff, self.batch_size))
+            removed += batch
+            if batch < self.batch_size:
+                return removed
+            # Let request traffic in between batches
+            await asyncio.sleep(0)
+
+    async def run_once(self) -> Dict:
+        """One retention pass; returns rows removed per table and the time taken"""
+        started = time.perf_counter()
+        now = datetime.now()
+        removed = {}
+        await access_log_partitions.ensure_ahead()
+        dropped = await access_log_partitions.drop_before(
+            date.today() - timedelta(days=Var.ACCESS_LOG_RETENTION_DAYS)
+        )
+        removed['generated_links'] = await self._prune(
+            PRUNE_EXPIRED_LINKS, int(time.time()) - Var.LINK_RETENTION_DAYS * 86400
+        )
+        removed['otp_tokens'] = await self._prune(
+            PRUNE_OTPS, now - timedelta(hours=Var.OTP_RETENTION_HOURS)
+        )
+        removed['rate_limit_tracker'] = await self._prune(
+            PRUNE_RATE_LIMITS, now - timedelta(days=Var.RATE_LIMIT_RETENTION_DAYS)
+        )
+        for table, count in removed.items():
+            self.removed_total[table] = self.removed_total.get(table, 0) + count
+        self.runs += 1
+        self.last_run = {
+            "finished_at": int(time.time()),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "removed": removed,
+            "partitions_dropped": dropped,
+        }
+        return self.last_run
+
+    async def run(self):
+        """Background loop running a retention pass every interval"""
+        try:
+            # Converts an unpartitioned table left by older versions
+            await access_log_partitions.create_tables()
+        except Exception as e:
+            logging.error(f"Error creating access log partitions: {e}")
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.run_once()
+                logging.info(
+                    f"Maintenance removed {report['removed']}, dropped partitions "
+                    f"{report['partitions_dropped']} in {report['duration_ms']}ms"
+                )
+            except Exception as e:
+                logging.error(f"Error running maintenance: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "removed_total": self.removed_total,
+            "partitions_dropped": access_log_partitions.dropped,
+        }
+
+
+maintenance = MaintenanceJob(Var.MAINTENANCE_INTERVAL, Var.MAINTENANCE_BATCH_SIZE)
@@ -1,148 +1,523 @@
-# Database migration script
+# Versioned database migrations
+# Usage: python -m WebStreamer.database.migrations [--status]
 import asyncio
 import logging
+import re
 import sys
+import time
+from datetime import datetime
+from typing import Dict, List
 from .connection import db_manager
+from .partitions import access_log_partitions
+from ..vars import Var
 
-async def run_migrations():
-    """Run all database migrations"""
+# Held while migrating so two nodes never apply the same migration
+MIGRATION_LOCK_ID = 0x77656273
+
+
+class Migration:
+    """
+    One schema change, applied once and recorded in schema_migrations.
+    Transactional migrations run in a single transaction. The others
+    (online index builds, batched backfills) must be idempotent so an
+    interrupted run can simply be resumed.
+    """
+    __slots__ = ('version', 'name', 'apply', 'transactional')
+
+    def __init__(self, version: int, name: str, apply, transactional: bool):
+        self.version = version
+        self.name = name
+        self.apply = apply
+        self.transactional = transactional
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str, transactional: bool = True):
+    """Register a migration function"""
+    def register(fn):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise ValueError(f"Migration {version} is already registered")
+        MIGRATIONS.append(Migration(version, name, fn, transactional))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return fn
+    return register
+
+
+# Helpers
+
+def sqlite_ddl(sql: str) -> str:
+    """Translate PostgreSQL DDL to SQLite"""
+    sql = re.sub(r'\bSERIAL PRIMARY KEY\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', sql)
+    return sql.replace('NOW()', 'CURRENT_TIMESTAMP')
+
+
+async def execute_ddl(conn, sql: str):
+    """Run DDL written in PostgreSQL dialect on either backend"""
+    await conn.execute(sqlite_ddl(sql) if db_manager.is_sqlite else sql)
+
+
+async def table_exists(conn, table: str) -> bool:
+    if db_manager.is_sqlite:
+        return bool(await conn.fetchval(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = $1", table
+        ))
+    return bool(await conn.fetchval('SELECT to_regclass($1) IS NOT NULL', table))
+
+
+async def column_exists(conn, table: str, column: str) -> bool:
+    if db_manager.is_sqlite:
+        return bool(await conn.fetchval(
+            'SELECT 1 FROM pragma_table_info($1) WHERE name = $2', table, column
+        ))
+    return bool(await conn.fetchval('''
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = $1 AND column_name = $2
+    ''', table, column))
+
+
+async def add_column(conn, table: str, column: str, definition: str):
+    """Add a column unless it exists (a catalog-only change with a constant default)"""
+    if not await column_exists(conn, table, column):
+        await execute_ddl(conn, f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        logging.info(f"   added {table}.{column}")
+
+
+async def create_index(conn, name: str, table: str, columns: str, using: str = ''):
+    """
+    Build an index without blocking writes (CONCURRENTLY on PostgreSQL).
+    An invalid index left behind by an interrupted build is dropped and rebuilt.
+    """
+    started = time.perf_counter()
+    if db_manager.is_sqlite:
+        await conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})')
+    else:
+        valid = await conn.fetchval('''
+            SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname = $1
+        ''', name)
+        if valid is False:
+            logging.warning(f"   dropping invalid index {name} from an interrupted build")
+            await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        using = f' USING {using}' if using else ''
+        await conn.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{using} ({columns})')
+    logging.info(f"   index {name} ready in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+async def drop_index(conn, name: str):
+    if db_manager.is_sqlite:
+        await conn.execute(f'DROP INDEX IF EXISTS {name}')
+    else:
+        await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+async def backfill(conn, table: str, key: str, assignment: str, condition: str,
+                   batch_size: int = Var.MAINTENANCE_BATCH_SIZE) -> int:
+    """
+    UPDATE rows matching the condition in batches of batch_size, each its own
+    short transaction, until none are left. Returns the number of rows updated.
+    """
+    from .maintenance import affected_rows  # Import here to avoid circular import
+    started = time.perf_counter()
+    total = 0
+    while True:
+        updated = affected_rows(await conn.execute(f'''
+            UPDATE {table} SET {assignment} WHERE {key} IN (
+                SELECT {key} FROM {table} WHERE {condition} LIMIT {int(batch_size)}
+            )
+        '''))
+        total += updated
+        if updated < batch_size:
+            break
+        await asyncio.sleep(0)
+    if total:
+        logging.info(f"   backfilled {total} {table} rows ({assignment}) in "
+                     f"{(time.perf_counter() - started) * 1000:.1f}ms")
+    return total
+
+
+# Migrations
+
+@migration(1, 'baseline')
+async def baseline(conn):
+    """The schema every table is queried with (one definition for both backends)"""
+    if db_manager.is_sqlite and await column_exists(conn, 'files', 'file_hash'):
+        # Databases created by the old SQLite script used files.id/file_hash and
+        # generated_links.expiry_date; move them aside for legacy_sqlite_rows to copy
+        for trigger in ('files_fts_insert', 'files_fts_delete', 'files_fts_update'):
+            await conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        await conn.execute('ALTER TABLE generated_links RENAME TO legacy_generated_links')
+        await conn.execute('ALTER TABLE files RENAME TO legacy_files')
+        logging.warning("   moved old-layout files/generated_links to legacy_files/legacy_generated_links")
+
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS users (
+            id BIGINT PRIMARY KEY,
+            username VARCHAR(255),
+            first_name VARCHAR(255),
+            last_name VARCHAR(255),
+            created_at TIMESTAMP DEFAULT NOW(),
+            is_banned BOOLEAN DEFAULT FALSE,
+            trust_score INT DEFAULT 100,
+            total_bandwidth BIGINT DEFAULT 0
+        )
+    ''')
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS files (
+            unique_file_id VARCHAR(255) PRIMARY KEY,
+            file_name VARCHAR(500),
+            file_size BIGINT,
+            mime_type VARCHAR(100),
+
+            -- Bot file IDs (expandable for multi-bot)
+            bot_0_file_id VARCHAR(255),
+            bot_1_file_id VARCHAR(255),
+            bot_2_file_id VARCHAR(255),
+
+            -- Metadata
+            uploaded_by BIGINT REFERENCES users(id),
+            upload_date TIMESTAMP DEFAULT NOW(),
+            total_views INT DEFAULT 0,
+            total_downloads INT DEFAULT 0,
+            total_bandwidth BIGINT DEFAULT 0,
+
+            -- Optional: channel info for external app compatibility
+            channel_id BIGINT,
+            message_id BIGINT
+        )
+    ''')
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS generated_links (
+            id SERIAL PRIMARY KEY,
+            unique_file_id VARCHAR(255) REFERENCES files(unique_file_id) ON DELETE CASCADE,
+            user_id BIGINT REFERENCES users(id),
+            expiry_timestamp BIGINT NOT NULL,
+            integrity_hash VARCHAR(64) NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            access_count INT DEFAULT 0,
+            bytes_served BIGINT DEFAULT 0,
+            last_accessed TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    ''')
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS otp_tokens (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(id),
+            otp_code VARCHAR(6) NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            expires_at TIMESTAMP NOT NULL,
+            used BOOLEAN DEFAULT FALSE,
+            used_at TIMESTAMP
+        )
+    ''')
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS rate_limit_tracker (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(id),
+            period_type VARCHAR(10) NOT NULL,
+            period_start TIMESTAMP NOT NULL,
+            link_count INT DEFAULT 0,
+            UNIQUE(user_id, period_type, period_start)
+        )
+    ''')
+    # Hourly access aggregates maintained by the access log writer; no FK so they outlive the links
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS link_access_hourly (
+            bucket TIMESTAMP NOT NULL,
+            link_id INT NOT NULL,
+            unique_file_id VARCHAR(255),
+            access_type VARCHAR(20) NOT NULL,
+            hits BIGINT DEFAULT 0,
+            PRIMARY KEY (bucket, link_id, access_type)
+        )
+    ''')
+    # Bytes served per bot client
+    await execute_ddl(conn, '''
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            bot_index INT PRIMARY KEY,
+            bytes_served BIGINT DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT NOW()
+        )
+    ''')
+
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_files_name ON files(file_name)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_files_uploaded_by ON files(uploaded_by)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_links_user_id ON generated_links(user_id)')
+    await conn.execute('CREATE INDEX IF NOT EXISTS idx_access_hourly_file ON link_access_hourly(unique_file_id, bucket)')
+
+    if db_manager.is_sqlite:
+        # Trigram full-text index for file name search, kept in sync by triggers
+        await conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+                file_name, content='files', content_rowid='rowid', tokenize='trigram'
+            )
+        ''')
+        await conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+                INSERT INTO files_fts(rowid, file_name) VALUES (new.rowid, new.file_name);
+            END
+        ''')
+        await conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+                INSERT INTO files_fts(files_fts, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+            END
+        ''')
+        await conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF file_name ON files BEGIN
+                INSERT INTO files_fts(files_fts, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+                INSERT INTO files_fts(rowid, file_name) VALUES (new.rowid, new.file_name);
+            END
+        ''')
+        await conn.execute("INSERT INTO files_fts(files_fts) VALUES ('rebuild')")
+    else:
+        await conn.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@migration(2, 'partition_access_logs', transactional=False)
+async def partition_access_logs(conn):
+    """Daily link_access_logs partitions (converts an unpartitioned table)"""
+    await access_log_partitions.create_tables()
+
+
+@migration(3, 'bandwidth_accounting', transactional=False)
+async def bandwidth_accounting(conn):
+    """Bytes-served columns for databases created before they existed, and zeroed NULL counters"""
+    await add_column(conn, 'users', 'total_bandwidth', 'BIGINT DEFAULT 0')
+    await add_column(conn, 'files', 'total_bandwidth', 'BIGINT DEFAULT 0')
+    await add_column(conn, 'generated_links', 'bytes_served', 'BIGINT DEFAULT 0')
+    # counter + delta stays NULL forever, so counters must start at zero
+    for table, key, columns in (
+        ('files', 'unique_file_id', ('total_views', 'total_downloads', 'total_bandwidth')),
+        ('generated_links', 'id', ('access_count', 'bytes_served')),
+        ('users', 'id', ('total_bandwidth',)),
+    ):
+        for column in columns:
+            await backfill(conn, table, key, f'{column} = 0', f'{column} IS NULL')
+
+
+@migration(4, 'hot_path_indexes', transactional=False)
+async def hot_path_indexes(conn):
+    """Indexes behind the stream, legacy, link reuse and file listing lookups"""
+    await create_index(conn, 'idx_files_channel_message', 'files', 'channel_id, message_id')
+    await create_index(conn, 'idx_links_file_expiry_hash', 'generated_links',
+                       'unique_file_id, expiry_timestamp, integrity_hash')
+    await create_index(conn, 'idx_links_user_file_expiry', 'generated_links',
+                       'user_id, unique_file_id, expiry_timestamp')
+    # Its leading column is covered by idx_links_file_expiry_hash
+    await drop_index(conn, 'idx_links_file_id')
+    if await table_exists(conn, 'file_bot_mapping'):
+        await create_index(conn, 'idx_file_bot_message', 'file_bot_mapping', 'telegram_message_id, channel_id')
+    # Keyset pagination indexes, one per sortable column
+    for column in ('upload_date', 'total_views', 'total_downloads', 'file_size'):
+        await create_index(conn, f'idx_files_{column}_keyset', 'files', f'{column}, unique_file_id')
+    if not db_manager.is_sqlite:
+        # Trigram index for substring search on file names
+        await create_index(conn, 'idx_files_name_trgm', 'files', 'file_name gin_trgm_ops', using='gin')
+
+
+@migration(5, 'user_dashboard_indexes', transactional=False)
+async def user_dashboard_indexes(conn):
+    """Newest-first per-user files and links, replacing the single-column user indexes"""
+    await create_index(conn, 'idx_files_uploader_date', 'files', 'uploaded_by, upload_date')
+    await create_index(conn, 'idx_links_user_created', 'generated_links', 'user_id, created_at')
+    await drop_index(conn, 'idx_files_uploaded_by')
+    await drop_index(conn, 'idx_links_user_id')
+
+
+@migration(6, 'retention_indexes', transactional=False)
+async def retention_indexes(conn):
+    """Indexes on the columns the retention pass selects its batches by"""
+    await create_index(conn, 'idx_links_expiry', 'generated_links', 'expiry_timestamp')
+    await create_index(conn, 'idx_otp_expires', 'otp_tokens', 'expires_at')
+    await create_index(conn, 'idx_rate_limits_period', 'rate_limit_tracker', 'period_start')
+
+
+@migration(7, 'files_fts_by_key')
+async def files_fts_by_key(conn):
+    """
+    Key the SQLite search index by unique_file_id. files has a TEXT primary key,
+    so its implicit rowids may be renumbered by VACUUM and cannot be joined on.
+    """
+    if not db_manager.is_sqlite:
+        return
+    for trigger in ('files_fts_insert', 'files_fts_delete', 'files_fts_update'):
+        await conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    await conn.execute('DROP TABLE IF EXISTS files_fts')
+    await conn.execute('''
+        CREATE VIRTUAL TABLE files_fts USING fts5(
+            unique_file_id UNINDEXED, file_name, tokenize='trigram'
+        )
+    ''')
+    # Files are never deleted or renamed on the hot path, so the scans in the
+    # delete/update triggers are acceptable
+    await conn.execute('''
+        CREATE TRIGGER files_fts_insert AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts(unique_file_id, file_name) VALUES (new.unique_file_id, new.file_name);
+        END
+    ''')
+    await conn.execute('''
+        CREATE TRIGGER files_fts_delete AFTER DELETE ON files BEGIN
+            DELETE FROM files_fts WHERE unique_file_id = old.unique_file_id;
+        END
+    ''')
+    await conn.execute('''
+        CREATE TRIGGER files_fts_update AFTER UPDATE OF unique_file_id, file_name ON files BEGIN
+            DELETE FROM files_fts WHERE unique_file_id = old.unique_file_id;
+            INSERT INTO files_fts(unique_file_id, file_name) VALUES (new.unique_file_id, new.file_name);
+        END
+    ''')
+    await conn.execute('INSERT INTO files_fts(unique_file_id, file_name) SELECT unique_file_id, file_name FROM files')
+
+
+@migration(8, 'legacy_sqlite_rows')
+async def legacy_sqlite_rows(conn):
+    """
+    Copy the rows baseline moved aside from old-layout SQLite databases into
+    the current tables: files.file_hash becomes unique_file_id and
+    generated_links.expiry_date becomes expiry_timestamp. Fails rather than
+    leaving any row behind.
+    """
+    from .models import GeneratedLink  # Import here to avoid circular import
+    if not db_manager.is_sqlite or not await table_exists(conn, 'legacy_files'):
+        return
+
+    bandwidth = 'total_bandwidth' if await column_exists(conn, 'legacy_files', 'total_bandwidth') else '0'
+    await conn.execute(f'''
+        INSERT INTO files (unique_file_id, file_name, file_size, mime_type, uploaded_by,
+                           upload_date, total_views, total_downloads, total_bandwidth)
+        SELECT file_hash, file_name, file_size, mime_type, uploaded_by,
+               upload_date, COALESCE(total_views, 0), COALESCE(total_downloads, 0), COALESCE({bandwidth}, 0)
+        FROM legacy_files
+    ''')
+    files = await conn.fetchval('SELECT COUNT(*) FROM legacy_files')
+    copied = await conn.fetchval(
+        'SELECT COUNT(*) FROM files WHERE unique_file_id IN (SELECT file_hash FROM legacy_files)'
+    )
+    if copied != files:
+        raise RuntimeError(f"copied {copied} of {files} legacy_files rows")
+
+    links = []
+    if await table_exists(conn, 'legacy_generated_links'):
+        bytes_served = 'gl.bytes_served' if await column_exists(conn, 'legacy_generated_links', 'bytes_served') else '0'
+        rows = await conn.fetch(f'''
+            SELECT gl.id, f.file_hash, gl.user_id, gl.expiry_date, gl.created_at,
+                   gl.access_count, {bytes_served} AS bytes_served, gl.last_accessed, gl.is_active
+            FROM legacy_generated_links gl LEFT JOIN legacy_files f ON f.id = gl.file_id
+        ''')
+        for row in rows:
+            if row['file_hash'] is None:
+                raise RuntimeError(f"legacy_generated_links row {row['id']} references no legacy_files row")
+            expiry = row['expiry_date']
+            if not isinstance(expiry, datetime):
+                expiry = datetime.fromisoformat(str(expiry))
+            # The old schema stored local naive datetimes
+            expiry_timestamp = int(expiry.timestamp())
+            links.append((
+                row['id'], row['file_hash'], row['user_id'], expiry_timestamp,
+                GeneratedLink.generate_integrity_hash(row['file_hash'], expiry_timestamp, Var.SECRET_KEY),
+                row['created_at'], row['access_count'] or 0, row['bytes_served'] or 0,
+                row['last_accessed'], bool(row['is_active'])
+            ))
+        await conn.executemany('''
+            INSERT INTO generated_links (id, unique_file_id, user_id, expiry_timestamp, integrity_hash,
+                                         created_at, access_count, bytes_served, last_accessed, is_active)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        ''', links)
+        await conn.execute('DROP TABLE legacy_generated_links')
+
+    await conn.execute('DROP TABLE legacy_files')
+    logging.info(f"   copied {files} legacy files and {len(links)} legacy links")
+
+
+# Runner
+
+async def _ensure_version_table():
+    async with db_manager.acquire() as conn:
+        await execute_ddl(conn, '''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW(),
+                duration_ms DOUBLE PRECISION
+            )
+        ''')
+
+
+async def applied_migrations() -> Dict[int, Dict]:
+    """Applied versions with their name, time and duration"""
+    rows = await db_manager.fetch('SELECT version, name, applied_at, duration_ms FROM schema_migrations')
+    return {row['version']: dict(row) for row in rows}
+
+
+async def _record(conn, item: Migration, started: float):
+    await conn.execute(
+        'INSERT INTO schema_migrations (version, name, duration_ms) VALUES ($1, $2, $3)',
+        item.version, item.name, round((time.perf_counter() - started) * 1000, 3)
+    )
+
+
+async def _apply(item: Migration):
+    started = time.perf_counter()
+    if item.transactional and db_manager.is_sqlite:
+        async def apply_and_record(conn):
+            await item.apply(conn)
+            await _record(conn, item, started)
+        await db_manager.sqlite.run_in_transaction(apply_and_record)
+    elif item.transactional:
+        async with db_manager.acquire() as conn:
+            async with conn.transaction():
+                await item.apply(conn)
+                await _record(conn, item, started)
+    else:
+        async with db_manager.acquire() as conn:
+            await item.apply(conn)
+            await _record(conn, item, started)
+    return (time.perf_counter() - started) * 1000
+
+
+async def _migrate() -> bool:
+    await _ensure_version_table()
+    applied = await applied_migrations()
+    pending = [item for item in MIGRATIONS if item.version not in applied]
+    if not pending:
+        logging.info("✅ Schema is up to date")
+        return True
+
+    total_started = time.perf_counter()
+    for item in pending:
+        logging.info(f"➡️  Applying {item.version:04d} {item.name}...")
+        try:
+            elapsed = await _apply(item)
+        except Exception as e:
+            logging.error(f"❌ Migration {item.version:04d} {item.name} failed: {e}")
+            if not item.transactional:
+                logging.error("   It is safe to re-run: completed steps are skipped")
+            return False
+        logging.info(f"✅ {item.version:04d} {item.name} applied in {elapsed:.1f}ms")
+    logging.info(f"✅ Applied {len(pending)} migration(s) in {(time.perf_counter() - total_started) * 1000:.1f}ms")
+    return True
+
+
+async def run_migrations() -> bool:
+    """Apply every pending migration in version order"""
     logging.info("🚀 Starting database migrations...")
-    
-    # Connect to database
-    success = await db_manager.connect()
-    if not success:
+
+    if not await db_manager.connect():
         logging.error("Failed to connect to database")
         return False
-    
+
     try:
-        conn = await db_manager.get_connection()
-        
-        # For SQLite, we need to execute directly
         if db_manager.is_sqlite:
-            # Create tables for SQLite
-            logging.info("Creating users table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_banned INTEGER DEFAULT 0,
-                    trust_score INTEGER DEFAULT 100
-                )
-            ''')
-            
-            logging.info("Creating files table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    file_hash TEXT UNIQUE NOT NULL,
-                    file_name TEXT,
-                    file_size INTEGER,
-                    mime_type TEXT,
-                    uploaded_by INTEGER REFERENCES users(id),
-                    upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_views INTEGER DEFAULT 0,
-                    total_downloads INTEGER DEFAULT 0
-                )
-            ''')
-            await conn.execute('CREATE INDEX IF NOT EXISTS idx_files_hash ON files(file_hash)')
-            
-            logging.info("Creating file_bot_mapping table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS file_bot_mapping (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
-                    bot_index INTEGER NOT NULL,
-                    telegram_file_id TEXT NOT NULL,
-                    telegram_message_id INTEGER NOT NULL,
-                    channel_id INTEGER NOT NULL,
-                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(file_id, bot_index)
-                )
-            ''')
-            
-            logging.info("Creating generated_links table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS generated_links (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    unique_file_id TEXT UNIQUE NOT NULL,
-                    file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
-                    user_id INTEGER REFERENCES users(id),
-                    expiry_date TIMESTAMP NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    access_count INTEGER DEFAULT 0,
-                    last_accessed TIMESTAMP,
-                    is_active INTEGER DEFAULT 1
-                )
-            ''')
-            await conn.execute('CREATE INDEX IF NOT EXISTS idx_generated_links_unique_id ON generated_links(unique_file_id)')
-            
-            logging.info("Creating link_access_logs table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS link_access_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    link_id INTEGER REFERENCES generated_links(id) ON DELETE CASCADE,
-                    accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    access_type TEXT DEFAULT 'view'
-                )
-            ''')
-            
-            logging.info("Creating otp_tokens table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS otp_tokens (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER REFERENCES users(id),
-                    otp_code TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP NOT NULL,
-                    used INTEGER DEFAULT 0,
-                    used_at TIMESTAMP
-                )
-            ''')
-            
-            logging.info("Creating rate_limit_tracker table...")
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS rate_limit_tracker (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER REFERENCES users(id),
-                    period_type TEXT NOT NULL,
-                    period_start TIMESTAMP NOT NULL,
-                    link_count INTEGER DEFAULT 0,
-                    UNIQUE(user_id, period_type, period_start)
-                )
-            ''')
-            
-            await conn.commit()
-            
-        else:
-            # PostgreSQL migrations
-            from .models import User, File, GeneratedLink, LinkAccessLog, OTPToken, RateLimitTracker
-            
-            logging.info("Creating users table...")
-            await User.create_table(conn)
-            
-            logging.info("Creating files table...")
-            await File.create_table(conn)
-            
-            logging.info("Creating generated_links table...")
-            await GeneratedLink.create_table(conn)
-            
-            logging.info("Creating link_access_logs table...")
-            await LinkAccessLog.create_table(conn)
-            
-            logging.info("Creating otp_tokens table...")
-            await OTPToken.create_table(conn)
-            
-            logging.info("Creating rate_limit_tracker table...")
-            await RateLimitTracker.create_table(conn)
-            
-        logging.info("✅ All migrations completed successfully!")
-        return True
-        
+            # A single group-commit writer already serialises schema changes
+            return await _migrate()
+        async with db_manager.acquire() as lock_conn:
+            await lock_conn.execute('SELECT pg_advisory_lock($1)', MIGRATION_LOCK_ID)
+            try:
+                return await _migrate()
+            finally:
+                await lock_conn.execute('SELECT pg_advisory_unlock($1)', MIGRATION_LOCK_ID)
     except Exception as e:
         logging.error(f"❌ Migration failed: {e}")
         import traceback
@@ -151,11 +526,31 @@ async def run_migrations():
     finally:
         await db_manager.disconnect()
 
+
+async def show_status() -> bool:
+    """Print applied and pending migrations"""
+    if not await db_manager.connect():
+        logging.error("Failed to connect to database")
+        return False
+    try:
+        await _ensure_version_table()
+        applied = await applied_migrations()
+        for item in MIGRATIONS:
+            row = applied.get(item.version)
+            if row:
+                print(f"{item.version:04d} {item.name:<24} applied {row['applied_at']} ({row['duration_ms']}ms)")
+            else:
+                print(f"{item.version:04d} {item.name:<24} pending")
+        return True
+    finally:
+        await db_manager.disconnect()
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
         format="[%(asctime)s][%(levelname)s] => %(message)s"
     )
-    
-    result = asyncio.run(run_migrations())
+
+    result = asyncio.run(show_status() if '--status' in sys.argv else run_migrations())
     sys.exit(0 if result else 1)
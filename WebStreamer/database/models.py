@@ -3,26 +3,15 @@ import asyncpg
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 import hashlib
+import hmac
 import secrets
 import time
+from .queries import LINK_BY_PARAMS
+from .stats import global_stats
 
 class User:
     """User model - Telegram ID based"""
     
-    @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id BIGINT PRIMARY KEY,
-                username VARCHAR(255),
-                first_name VARCHAR(255),
-                last_name VARCHAR(255),
-                created_at TIMESTAMP DEFAULT NOW(),
-                is_banned BOOLEAN DEFAULT FALSE,
-                trust_score INT DEFAULT 100
-            )
-        ''')
-    
     @staticmethod
     async def create_or_get(conn: asyncpg.Connection, user_id: int, username: str = None, 
                            first_name: str = None, last_name: str = None):
@@ -37,6 +26,7 @@ class User:
             INSERT INTO users (id, username, first_name, last_name)
             VALUES ($1, $2, $3, $4)
         ''', user_id, username, first_name, last_name)
+        global_stats.incr('total_users')
         
         return await conn.fetchrow('SELECT * FROM users WHERE id = $1', user_id)
     
@@ -51,36 +41,6 @@ class User:
 class File:
     """File model - New simplified single-table design"""
     
-    @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                unique_file_id VARCHAR(255) PRIMARY KEY,
-                file_name VARCHAR(500),
-                file_size BIGINT,
-                mime_type VARCHAR(100),
-                
-                -- Bot file IDs (expandable for multi-bot)
-                bot_0_file_id VARCHAR(255),
-                bot_1_file_id VARCHAR(255),
-                bot_2_file_id VARCHAR(255),
-                
-                -- Metadata
-                uploaded_by BIGINT REFERENCES users(id),
-                upload_date TIMESTAMP DEFAULT NOW(),
-                total_views INT DEFAULT 0,
-                total_downloads INT DEFAULT 0,
-                
-                -- Optional: channel info for external app compatibility
-                channel_id BIGINT,
-                message_id BIGINT
-            )
-        ''')
-        
-        # Create indexes
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_files_name ON files(file_name)')
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_files_uploaded_by ON files(uploaded_by)')
-    
     @staticmethod
     async def create_or_get(conn: asyncpg.Connection, unique_file_id: str, file_name: str,
                            file_size: int, mime_type: str, user_id: int, bot_index: int = 0,
@@ -108,6 +68,7 @@ class File:
             VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
             RETURNING *
         ''', unique_file_id, file_name, file_size, mime_type, user_id, bot_file_id, channel_id, message_id)
+        global_stats.incr('total_files')
         
         return dict(result)
     
@@ -135,22 +96,6 @@ class File:
 class FileBotMapping:
     """Mapping between files and bots that have them"""
     
-    @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS file_bot_mapping (
-                id SERIAL PRIMARY KEY,
-                file_id INTEGER REFERENCES files(id) ON DELETE CASCADE,
-                bot_index INTEGER NOT NULL,
-                telegram_file_id VARCHAR(255) NOT NULL,
-                telegram_message_id BIGINT NOT NULL,
-                channel_id BIGINT NOT NULL,
-                added_at TIMESTAMP DEFAULT NOW()
-            )
-        ''')
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_file_bot_file_id ON file_bot_mapping(file_id)')
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_file_bot_bot_index ON file_bot_mapping(bot_index)')
-    
     @staticmethod
     async def add_mapping(conn: asyncpg.Connection, file_id: int, bot_index: int, 
                          telegram_file_id: str, telegram_message_id: int, channel_id: int):
@@ -191,31 +136,11 @@ class FileBotMapping:
 class GeneratedLink:
     """Generated links for files - New structure with expiry/integrity"""
     
-    @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS generated_links (
-                id SERIAL PRIMARY KEY,
-                unique_file_id VARCHAR(255) REFERENCES files(unique_file_id) ON DELETE CASCADE,
-                user_id BIGINT REFERENCES users(id),
-                expiry_timestamp BIGINT NOT NULL,
-                integrity_hash VARCHAR(64) NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW(),
-                access_count INT DEFAULT 0,
-                last_accessed TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        ''')
-        
-        # Create indexes
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_links_file_id ON generated_links(unique_file_id)')
-        await conn.execute('CREATE INDEX IF NOT EXISTS idx_links_user_id ON generated_links(user_id)')
-    
     @staticmethod
     def generate_integrity_hash(unique_file_id: str, expiry_timestamp: int, secret_key: str) -> str:
-        """Generate integrity hash for link verification"""
-        data = f"{unique_file_id}:{expiry_timestamp}:{secret_key}"
-        return hashlib.sha256(data.encode()).hexdigest()[:16]  # Short hash
+        """Generate integrity hash (HMAC-SHA256) for link verification"""
+        data = f"{unique_file_id}:{expiry_timestamp}"
+        return hmac.new(secret_key.encode(), data.encode(), hashlib.sha256).hexdigest()[:16]  # Short hash
     
     @staticmethod
     async def create_link(conn: asyncpg.Connection, unique_file_id: str, user_id: int,
@@ -229,6 +154,7 @@ class GeneratedLink:
             VALUES ($1, $2, $3, $4)
             RETURNING *
         ''', unique_file_id, user_id, expiry_timestamp, integrity_hash)
+        global_stats.incr('active_links')
         
         return dict(result)
     
@@ -236,11 +162,7 @@ class GeneratedLink:
     async def get_by_params(conn: asyncpg.Connection, unique_file_id: str, 
                            expiry_timestamp: int, integrity_hash: str) -> Optional[Dict]:
         """Get link by parameters and verify"""
-        result = await conn.fetchrow('''
-            SELECT * FROM generated_links 
-            WHERE unique_file_id = $1 AND expiry_timestamp = $2 
-            AND integrity_hash = $3 AND is_active = TRUE
-        ''', unique_file_id, expiry_timestamp, integrity_hash)
+        result = await conn.fetchrow(LINK_BY_PARAMS.postgres, unique_file_id, expiry_timestamp, integrity_hash)
         
         return dict(result) if result else None
     
@@ -258,43 +180,38 @@ class LinkAccessLog:
     """Access logs for analytics"""
     
     @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS link_access_logs (
-                id SERIAL PRIMARY KEY,
-                link_id INT REFERENCES generated_links(id) ON DELETE CASCADE,
-                accessed_at TIMESTAMP DEFAULT NOW(),
-                ip_address VARCHAR(45),
-                user_agent TEXT,
-                access_type VARCHAR(20) DEFAULT 'view'
-            )
-        ''')
+    def anonymize_ip(ip_address: str) -> str:
+        """Anonymize IP address (keep network part only)"""
+        if not ip_address:
+            return "unknown"
+        # Only the client hop of an X-Forwarded-For chain
+        ip_address = ip_address.split(',')[0].strip()
+        # Anonymize IPv4 (keep first 3 octets)
+        ip_parts = ip_address.split('.')
+        if len(ip_parts) == 4:
+            ip_address = f"{ip_parts[0]}.{ip_parts[1]}.{ip_parts[2]}.xxx"
+        # For IPv6 or other formats, just keep first part
+        elif ':' in ip_address:
+            # IPv6 - keep first 3 groups
+            ip_parts = ip_address.split(':')
+            if len(ip_parts) >= 3:
+                ip_address = f"{ip_parts[0]}:{ip_parts[1]}:{ip_parts[2]}:xxx"
+        # Fit the ip_address column
+        return ip_address[:45]
+    
+    @staticmethod
+    def truncate_user_agent(user_agent: str) -> str:
+        """Truncate user agent if too long"""
+        if user_agent and len(user_agent) > 500:
+            return user_agent[:500]
+        return user_agent
     
     @staticmethod
     async def log_access(conn: asyncpg.Connection, link_id: int, ip_address: str,
                         user_agent: str, access_type: str = 'view'):
         """Log file access"""
-        # Anonymize IP
-        if not ip_address:
-            ip_address = "unknown"
-        else:
-            # Truncate if too long (max 250 chars to be safe)
-            if len(ip_address) > 250:
-                ip_address = ip_address[:250]
-            # Anonymize IPv4 (keep first 3 octets)
-            ip_parts = ip_address.split('.')
-            if len(ip_parts) == 4:
-                ip_address = f"{ip_parts[0]}.{ip_parts[1]}.{ip_parts[2]}.xxx"
-            # For IPv6 or other formats, just keep first part
-            elif ':' in ip_address:
-                # IPv6 - keep first 3 groups
-                ip_parts = ip_address.split(':')
-                if len(ip_parts) >= 3:
-                    ip_address = f"{ip_parts[0]}:{ip_parts[1]}:{ip_parts[2]}:xxx"
-        
-        # Truncate user agent if too long
-        if user_agent and len(user_agent) > 500:
-            user_agent = user_agent[:500]
+        ip_address = LinkAccessLog.anonymize_ip(ip_address)
+        user_agent = LinkAccessLog.truncate_user_agent(user_agent)
         
         await conn.execute('''
             INSERT INTO link_access_logs (link_id, ip_address, user_agent, access_type)
@@ -305,20 +222,6 @@ class LinkAccessLog:
 class OTPToken:
     """OTP tokens for web authentication"""
     
-    @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS otp_tokens (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT REFERENCES users(id),
-                otp_code VARCHAR(6) NOT NULL,
-                created_at TIMESTAMP DEFAULT NOW(),
-                expires_at TIMESTAMP NOT NULL,
-                used BOOLEAN DEFAULT FALSE,
-                used_at TIMESTAMP
-            )
-        ''')
-    
     @staticmethod
     def generate_otp() -> str:
         """Generate 6-digit OTP"""
@@ -359,57 +262,40 @@ class RateLimitTracker:
     """Track user rate limits"""
     
     @staticmethod
-    async def create_table(conn: asyncpg.Connection):
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS rate_limit_tracker (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT REFERENCES users(id),
-                period_type VARCHAR(10) NOT NULL,
-                period_start TIMESTAMP NOT NULL,
-                link_count INT DEFAULT 0,
-                UNIQUE(user_id, period_type, period_start)
-            )
-        ''')
-    
-    @staticmethod
-    async def check_limit(conn: asyncpg.Connection, user_id: int, period_type: str, 
-                         max_links: int) -> bool:
-        """Check if user is within rate limit"""
+    def period_start(period_type: str) -> Optional[datetime]:
+        """Start of the current fixed period for a period type"""
         now = datetime.now()
-        
-        # Calculate period start based on type
         if period_type == '5min':
             period_start = now.replace(second=0, microsecond=0)
-            period_start = period_start - timedelta(minutes=period_start.minute % 5)
-        elif period_type == 'hour':
-            period_start = now.replace(minute=0, second=0, microsecond=0)
-        elif period_type == 'day':
-            period_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        else:
-            return False
-        
-        # Get current count
+            return period_start - timedelta(minutes=period_start.minute % 5)
+        if period_type == 'hour':
+            return now.replace(minute=0, second=0, microsecond=0)
+        if period_type == 'day':
+            return now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return None
+    
+    @staticmethod
+    async def get_count(conn: asyncpg.Connection, user_id: int, period_type: str) -> int:
+        """Links generated by the user in the current period"""
         count = await conn.fetchval('''
             SELECT link_count FROM rate_limit_tracker
             WHERE user_id = $1 AND period_type = $2 AND period_start = $3
-        ''', user_id, period_type, period_start)
-        
-        return (count or 0) < max_links
+        ''', user_id, period_type, RateLimitTracker.period_start(period_type))
+        return count or 0
+    
+    @staticmethod
+    async def check_limit(conn: asyncpg.Connection, user_id: int, period_type: str, 
+                         max_links: int) -> bool:
+        """Check if user is within rate limit"""
+        if RateLimitTracker.period_start(period_type) is None:
+            return False
+        return await RateLimitTracker.get_count(conn, user_id, period_type) < max_links
     
     @staticmethod
     async def increment_count(conn: asyncpg.Connection, user_id: int, period_type: str):
         """Increment rate limit counter"""
-        now = datetime.now()
-        
-        # Calculate period start
-        if period_type == '5min':
-            period_start = now.replace(second=0, microsecond=0)
-            period_start = period_start - timedelta(minutes=period_start.minute % 5)
-        elif period_type == 'hour':
-            period_start = now.replace(minute=0, second=0, microsecond=0)
-        elif period_type == 'day':
-            period_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        else:
+        period_start = RateLimitTracker.period_start(period_type)
+        if period_start is None:
             return
         
         await conn.execute('''
@@ -418,3 +304,4 @@ class RateLimitTracker:
             ON CONFLICT (user_id, period_type, period_start) DO UPDATE
             SET link_count = rate_limit_tracker.link_count + 1
         ''', user_id, period_type, period_start)
+
@@ -0,0 +1,204 @@
+# Daily partitions of link_access_logs (native on PostgreSQL, rotated tables on SQLite)
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+from .connection import db_manager
+from .queries import LEGACY_ACCESS_ROLLUP
+from ..vars import Var
+
+PARENT = 'link_access_logs'
+PREFIX = 'link_access_logs_p'
+COLUMNS = 'link_id, accessed_at, ip_address, user_agent, access_type'
+
+# No FK to generated_links: old logs go away by dropping whole partitions,
+# not through cascading deletes
+PG_PARENT = f'''
+    CREATE TABLE IF NOT EXISTS {PARENT} (
+        id BIGSERIAL,
+        link_id INT,
+        accessed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        ip_address VARCHAR(45),
+        user_agent TEXT,
+        access_type VARCHAR(20) DEFAULT 'view',
+        PRIMARY KEY (id, accessed_at)
+    ) PARTITION BY RANGE (accessed_at)
+'''
+
+SQLITE_PARTITION = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY,
+        link_id INTEGER,
+        accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ip_address TEXT,
+        user_agent TEXT,
+        access_type TEXT DEFAULT 'view'
+    )
+'''
+
+
+def partition_name(day: date) -> str:
+    return f"{PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name[len(PREFIX):], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+class AccessLogPartitions:
+    """
+    One partition per day. PostgreSQL routes inserts through the partitioned
+    parent; SQLite writes go to the day's table and link_access_logs is a
+    UNION ALL view over them, rebuilt whenever a table is added or dropped.
+    Retention drops whole partitions instead of deleting rows.
+    """
+
+    def __init__(self, days_ahead: int):
+        self.days_ahead = days_ahead
+        self.known = set()
+        self.dropped = 0
+        self._lock = asyncio.Lock()
+
+    async def _in_transaction(self, fn):
+        if db_manager.is_sqlite:
+            return await db_manager.sqlite.run_in_transaction(fn)
+        async with db_manager.acquire() as conn:
+            async with conn.transaction():
+                return await fn(conn)
+
+    @staticmethod
+    async def _existing(conn) -> List[str]:
+        if db_manager.is_sqlite:
+            rows = await conn.fetch(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'link_access_logs_p%'"
+            )
+        else:
+            rows = await conn.fetch(f'''
+                SELECT c.relname AS name FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = '{PARENT}'::regclass
+            ''')
+        return sorted(row['name'] for row in rows if partition_day(row['name']))
+
+    @staticmethod
+    async def _rebuild_view(conn, names: List[str]):
+        await conn.execute(f'DROP VIEW IF EXISTS {PARENT}')
+        if names:
+            union = ' UNION ALL '.join(f'SELECT id, {COLUMNS} FROM {name}' for name in names)
+            await conn.execute(f'CREATE VIEW {PARENT} AS {union}')
+
+    @staticmethod
+    async def _create(conn, days: Iterable[date]):
+        for day in days:
+            name = partition_name(day)
+            if db_manager.is_sqlite:
+                await conn.execute(SQLITE_PARTITION.format(name=name))
+            else:
+                await conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+                    f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+                )
+
+    async def ensure(self, days: Iterable[date]):
+        """Create the partitions for these days if they do not exist yet"""
+        missing = set(days) - self.known
+        if not missing:
+            return
+        async with self._lock:
+            missing -= self.known
+            if not missing:
+                return
+
+            async def create(conn):
+                await self._create(conn, sorted(missing))
+                if db_manager.is_sqlite:
+                    await self._rebuild_view(conn, await self._existing(conn))
+
+            await self._in_transaction(create)
+            self.known |= missing
+            logging.info(f"Created access log partitions for {', '.join(str(day) for day in sorted(missing))}")
+
+    async def ensure_ahead(self):
+        """Today's partition plus days_ahead future ones"""
+        today = date.today()
+        await self.ensure(today + timedelta(days=offset) for offset in range(self.days_ahead + 1))
+
+    def table_for(self, day: date) -> str:
+        """Table to insert a day's records into"""
+        return partition_name(day) if db_manager.is_sqlite else PARENT
+
+    async def drop_before(self, cutoff: date) -> List[str]:
+        """Drop every partition holding only days before the cutoff"""
+        async with self._lock:
+            async def drop(conn):
+                names = await self._existing(conn)
+                expired = [name for name in names if partition_day(name) < cutoff]
+                if expired and db_manager.is_sqlite:
+                    # Point the view away from the tables before they go
+                    await self._rebuild_view(conn, [name for name in names if name not in expired])
+                for name in expired:
+                    await conn.execute(f'DROP TABLE IF EXISTS {name}')
+                return expired
+
+            expired = await self._in_transaction(drop)
+        for name in expired:
+            self.known.discard(partition_day(name))
+        self.dropped += len(expired)
+        return expired
+
+    async def create_tables(self):
+        """Create the partitioned table, converting an unpartitioned one first"""
+        async def create(conn):
+            if db_manager.is_sqlite:
+                kind = await conn.fetchval(f"SELECT type FROM sqlite_master WHERE name = '{PARENT}'")
+                legacy = kind == 'table'
+            else:
+                kind = await conn.fetchval(f"SELECT relkind::text FROM pg_class WHERE oid = to_regclass('{PARENT}')")
+                legacy = kind == 'r'
+            if legacy:
+                await conn.execute(f'ALTER TABLE {PARENT} RENAME TO {PARENT}_legacy')
+            if not db_manager.is_sqlite:
+                await conn.execute(PG_PARENT)
+                await conn.execute(f'CREATE INDEX IF NOT EXISTS idx_access_logs_link ON {PARENT}(link_id, accessed_at)')
+
+            today = date.today()
+            first_day = today - timedelta(days=Var.ACCESS_LOG_RETENTION_DAYS)
+            days = [first_day + timedelta(days=offset)
+                    for offset in range((today - first_day).days + self.days_ahead + 1)]
+            await self._create(conn, days if legacy else days[-self.days_ahead - 1:])
+            if legacy:
+                await self._convert_legacy(conn, days)
+            if db_manager.is_sqlite:
+                await self._rebuild_view(conn, await self._existing(conn))
+
+        async with self._lock:
+            await self._in_transaction(create)
+            self.known |= {date.today() + timedelta(days=offset) for offset in range(self.days_ahead + 1)}
+
+    @staticmethod
+    async def _convert_legacy(conn, days: List[date]):
+        """Roll every legacy row into the hourly rollups and keep those inside retention"""
+        await conn.execute(LEGACY_ACCESS_ROLLUP.text(db_manager.is_sqlite))
+        if db_manager.is_sqlite:
+            for day in days:
+                await conn.execute(f'''
+                    INSERT INTO {partition_name(day)} ({COLUMNS})
+                    SELECT {COLUMNS} FROM {PARENT}_legacy
+                    WHERE accessed_at >= $1 AND accessed_at < $2
+                ''', datetime.combine(day, datetime.min.time()),
+                    datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        else:
+            await conn.execute(f'''
+                INSERT INTO {PARENT} ({COLUMNS})
+                SELECT {COLUMNS} FROM {PARENT}_legacy
+                WHERE accessed_at >= $1 AND accessed_at < $2
+            ''', datetime.combine(days[0], datetime.min.time()),
+                datetime.combine(days[-1] + timedelta(days=1), datetime.min.time()))
+        await conn.execute(f'DROP TABLE {PARENT}_legacy')
+        logging.info(f"Converted {PARENT} to daily partitions")
+
+
+access_log_partitions = AccessLogPartitions(Var.ACCESS_LOG_PARTITIONS_AHEAD)
@@ -0,0 +1,124 @@
+# Query-plan regression check for hot-path statements
+# Usage: python -m WebStreamer.database.plan_check (exits 1 on a sequential scan)
+import asyncio
+import json
+import logging
+import re
+import sys
+from datetime import datetime
+from typing import List, Optional
+from .connection import db_manager
+from .queries import (FILE_BY_CHANNEL_MESSAGE, FILE_MAPPING_BY_MESSAGE, LINK_BY_PARAMS,
+                      REUSABLE_LINK, FILE_HOURLY_ACCESS, USER_RECENT_FILES, USER_DASHBOARD_LINKS,
+                      PRUNE_EXPIRED_LINKS, PRUNE_OTPS, PRUNE_RATE_LIMITS)
+
+# (statement, table that must be read through an index and its alias in the
+# statement if it has one, sample arguments)
+HOT_PATH = [
+    (FILE_BY_CHANNEL_MESSAGE, 'files', (-1001234567890, 1)),
+    (FILE_MAPPING_BY_MESSAGE, 'file_bot_mapping', (1, -1001234567890)),
+    (LINK_BY_PARAMS, 'generated_links', ('AgADsample', 1700000000, '0' * 64)),
+    (REUSABLE_LINK, 'generated_links', (1, 'AgADsample', 1700000000)),
+    (FILE_HOURLY_ACCESS, 'link_access_hourly', ('AgADsample', datetime(2024, 1, 1))),
+    (USER_RECENT_FILES, 'files', (1, 50)),
+    (USER_DASHBOARD_LINKS, 'generated_links gl', (1, 50)),
+    # Retention batches (EXPLAIN does not run the DELETE)
+    (PRUNE_EXPIRED_LINKS, 'generated_links', (1700000000, 1000)),
+    (PRUNE_OTPS, 'otp_tokens', (datetime(2024, 1, 1), 1000)),
+    (PRUNE_RATE_LIMITS, 'rate_limit_tracker', (datetime(2024, 1, 1), 1000)),
+]
+
+
+def _pg_seq_scans(node: dict, table: str) -> List[str]:
+    """Seq Scan nodes on the table anywhere in a JSON plan tree"""
+    found = []
+    if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') == table:
+        found.append(f"Seq Scan on {table}")
+    for child in node.get('Plans', []):
+        found.extend(_pg_seq_scans(child, table))
+    return found
+
+
+# "SCAN gl", "SCAN gl USING COVERING INDEX ..." (a full index walk), or
+# "SCAN TABLE generated_links AS gl" before SQLite 3.36
+_SQLITE_SCAN = re.compile(r'SCAN (?:TABLE )?(\w+)(?: AS (\w+))?')
+
+
+def _sqlite_scans(details: List[str], names) -> List[str]:
+    """Plan rows that scan the table, by its name or alias"""
+    found = []
+    for detail in details:
+        match = _SQLITE_SCAN.match(detail)
+        if match and names.intersection(match.groups()):
+            found.append(detail)
+    return found
+
+
+async def _table_exists(conn, table: str) -> bool:
+    if db_manager.is_sqlite:
+        return bool(await conn.fetchval(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = $1", table
+        ))
+    return bool(await conn.fetchval('SELECT to_regclass($1) IS NOT NULL', table))
+
+
+async def check_plan(conn, statement, table: str, args) -> Optional[List[str]]:
+    """
+    Sequential scans in the statement's plan, or None when the table does not
+    exist. table is the table name, optionally followed by its alias.
+    """
+    table, _, alias = table.partition(' ')
+    if not await _table_exists(conn, table):
+        return None
+    if db_manager.is_sqlite:
+        rows = await conn.fetch(f'EXPLAIN QUERY PLAN {statement.sqlite}', *args)
+        return _sqlite_scans([row['detail'] for row in rows], {table, alias or table})
+    plan = await conn.fetchval(f'EXPLAIN (FORMAT JSON) {statement.postgres}', *args)
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return _pg_seq_scans(plan[0]['Plan'], table)
+
+
+async def run_plan_check() -> bool:
+    """Explain every hot-path statement; False if any falls back to a sequential scan"""
+    if not await db_manager.connect():
+        logging.error("Failed to connect to database")
+        return False
+
+    failures = 0
+    try:
+        async with db_manager.acquire() as conn:
+            if not db_manager.is_sqlite:
+                # Tiny tables are cheaper to scan; only a missing index should produce one
+                await conn.execute('SET enable_seqscan = off')
+            for statement, spec, args in HOT_PATH:
+                table = spec.split()[0]
+                try:
+                    scans = await check_plan(conn, statement, spec, args)
+                except Exception as e:
+                    failures += 1
+                    logging.error(f"❌ {statement.name}: could not explain ({e})")
+                    continue
+                if scans is None:
+                    logging.info(f"➖ {statement.name}: skipped, no {table} table")
+                elif scans:
+                    failures += 1
+                    logging.error(f"❌ {statement.name}: {'; '.join(scans)}")
+                else:
+                    logging.info(f"✅ {statement.name}: index scan on {table}")
+            if not db_manager.is_sqlite:
+                await conn.execute('RESET enable_seqscan')
+    finally:
+        await db_manager.disconnect()
+
+    return failures == 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s][%(levelname)s] => %(message)s"
+    )
+
+    result = asyncio.run(run_plan_check())
+    sys.exit(0 if result else 1)
@@ -0,0 +1,422 @@
+# Query registry: each statement is declared once and compiled for both dialects
+from typing import Dict, Optional
+from .sqlite_engine import to_sqlite_placeholders
+
+
+class Query:
+    """
+    A named SQL statement written in PostgreSQL dialect ($1, $2 placeholders).
+    The SQLite text is compiled once at import, from an explicit override when
+    the dialects differ beyond placeholders.
+    """
+    __slots__ = ('name', 'postgres', 'sqlite')
+
+    def __init__(self, name: str, postgres: str, sqlite: Optional[str] = None):
+        self.name = name
+        self.postgres = postgres
+        self.sqlite = to_sqlite_placeholders(sqlite or postgres)
+
+    def text(self, is_sqlite: bool) -> str:
+        return self.sqlite if is_sqlite else self.postgres
+
+    def __repr__(self):
+        return f"Query({self.name!r})"
+
+
+QUERIES: Dict[str, Query] = {}
+
+
+def query(name: str, postgres: str, sqlite: Optional[str] = None) -> Query:
+    """Declare a statement in the registry"""
+    if name in QUERIES:
+        raise ValueError(f"Query {name!r} is already registered")
+    QUERIES[name] = Query(name, postgres, sqlite)
+    return QUERIES[name]
+
+
+# Files
+
+FILE_BY_CHANNEL_MESSAGE = query('file_by_channel_message', '''
+    SELECT * FROM files WHERE channel_id = $1 AND message_id = $2
+''')
+
+# Which bots can stream the file, without exposing their file_ids
+FILE_DETAIL = query('file_detail', '''
+    SELECT f.unique_file_id, f.file_name, f.file_size, f.mime_type, f.upload_date,
+           f.total_views, f.total_downloads, f.total_bandwidth, f.message_id,
+           f.bot_0_file_id IS NOT NULL AS on_bot_0,
+           f.bot_1_file_id IS NOT NULL AS on_bot_1,
+           f.bot_2_file_id IS NOT NULL AS on_bot_2,
+           u.username, u.first_name, u.last_name
+    FROM files f
+    LEFT JOIN users u ON u.id = f.uploaded_by
+    WHERE f.unique_file_id = $1
+''')
+
+FILE_MAPPING_BY_MESSAGE = query('file_mapping_by_message', '''
+    SELECT file_id FROM file_bot_mapping
+    WHERE telegram_message_id = $1 AND channel_id = $2
+''')
+
+USER_FILE_COUNT = query('user_file_count', '''
+    SELECT COUNT(*) FROM files WHERE uploaded_by = $1
+''')
+
+USER_TOTAL_VIEWS = query('user_total_views', '''
+    SELECT COALESCE(SUM(total_views), 0) FROM files WHERE uploaded_by = $1
+''')
+
+USER_RECENT_FILES = query('user_recent_files', '''
+    SELECT unique_file_id, file_name, file_size, mime_type, upload_date, total_views, total_downloads
+    FROM files
+    WHERE uploaded_by = $1
+    ORDER BY upload_date DESC
+    LIMIT $2
+''')
+
+# Links
+
+USER_LINK_COUNT = query('user_link_count', '''
+    SELECT COUNT(*) FROM generated_links WHERE user_id = $1
+''')
+
+USER_RECENT_LINKS = query('user_recent_links', '''
+    SELECT gl.id, gl.unique_file_id, gl.expiry_timestamp, gl.integrity_hash, gl.access_count, gl.created_at,
+           f.file_name, f.file_size, f.mime_type, f.bot_0_file_id
+    FROM generated_links gl
+    JOIN files f ON gl.unique_file_id = f.unique_file_id
+    WHERE gl.user_id = $1 AND gl.is_active = TRUE
+    ORDER BY gl.created_at DESC
+    LIMIT 10
+''')
+
+USER_DASHBOARD_LINKS = query('user_dashboard_links', '''
+    SELECT gl.id, gl.unique_file_id, gl.expiry_timestamp, gl.access_count, gl.created_at,
+           f.file_name, f.file_size
+    FROM generated_links gl
+    JOIN files f ON gl.unique_file_id = f.unique_file_id
+    WHERE gl.user_id = $1 AND gl.is_active = TRUE
+    ORDER BY gl.created_at DESC
+    LIMIT $2
+''')
+
+LINK_BY_PARAMS = query('link_by_params', '''
+    SELECT * FROM generated_links
+    WHERE unique_file_id = $1 AND expiry_timestamp = $2
+    AND integrity_hash = $3 AND is_active = TRUE
+''')
+
+REVOKED_LINK_IDS = query('revoked_link_ids', '''
+    SELECT id FROM generated_links WHERE is_active = FALSE AND expiry_timestamp > $1
+''')
+
+# Users
+
+BANNED_USER_IDS = query('banned_user_ids', '''
+    SELECT id FROM users WHERE is_banned = TRUE
+''')
+
+# OTP
+
+OTP_INSERT = query('otp_insert', '''
+    INSERT INTO otp_tokens (user_id, otp_code, created_at, expires_at, used)
+    VALUES ($1, $2, $3, $4, $5)
+''')
+
+OTP_LATEST = query('otp_latest', '''
+    SELECT id, expires_at, used FROM otp_tokens
+    WHERE user_id = $1 AND otp_code = $2
+    ORDER BY created_at DESC
+    LIMIT 1
+''')
+
+OTP_MARK_USED = query('otp_mark_used', '''
+    UPDATE otp_tokens SET used = $1, used_at = $2 WHERE id = $3
+''')
+
+# Rate limits in multi-node mode: a sliding-window log in rate_limit_tracker,
+# one row per user and timestamp. Checks run under the user's row lock (the
+# SQLite writer transaction is already exclusive)
+
+RATE_LIMIT_LOCK_USER = query('rate_limit_lock_user', '''
+    SELECT id FROM users WHERE id = $1 FOR UPDATE
+''', sqlite='''
+    SELECT id FROM users WHERE id = $1
+''')
+
+RATE_LIMIT_WINDOW_COUNT = query('rate_limit_window_count', '''
+    SELECT COALESCE(SUM(link_count), 0) FROM rate_limit_tracker
+    WHERE user_id = $1 AND period_type = 'link' AND period_start > $2
+''')
+
+RATE_LIMIT_RECORD = query('rate_limit_record', '''
+    INSERT INTO rate_limit_tracker (user_id, period_type, period_start, link_count)
+    VALUES ($1, 'link', $2, 1)
+    ON CONFLICT (user_id, period_type, period_start) DO UPDATE
+    SET link_count = rate_limit_tracker.link_count + 1
+''')
+
+RATE_LIMIT_REFUND = query('rate_limit_refund', '''
+    UPDATE rate_limit_tracker SET link_count = link_count - 1
+    WHERE id = (
+        SELECT id FROM rate_limit_tracker
+        WHERE user_id = $1 AND period_type = 'link' AND link_count > 0
+        ORDER BY period_start DESC LIMIT 1
+    )
+''')
+
+# Counters (batched: $1 is the accumulated delta, $2 the row key)
+
+FILE_VIEWS_ADD = query('file_views_add', '''
+    UPDATE files SET total_views = total_views + $1 WHERE unique_file_id = $2
+''')
+
+FILE_DOWNLOADS_ADD = query('file_downloads_add', '''
+    UPDATE files SET total_downloads = total_downloads + $1 WHERE unique_file_id = $2
+''')
+
+LINK_ACCESS_ADD = query('link_access_add', '''
+    UPDATE generated_links SET
+        access_count = access_count + $1,
+        last_accessed = CURRENT_TIMESTAMP
+    WHERE id = $2
+''')
+
+FILE_BANDWIDTH_ADD = query('file_bandwidth_add', '''
+    UPDATE files SET total_bandwidth = total_bandwidth + $1 WHERE unique_file_id = $2
+''')
+
+LINK_BANDWIDTH_ADD = query('link_bandwidth_add', '''
+    UPDATE generated_links SET bytes_served = bytes_served + $1 WHERE id = $2
+''')
+
+USER_BANDWIDTH_ADD = query('user_bandwidth_add', '''
+    UPDATE users SET total_bandwidth = total_bandwidth + $1 WHERE id = $2
+''')
+
+BOT_BANDWIDTH_ADD = query('bot_bandwidth_add', '''
+    INSERT INTO bot_stats (bot_index, bytes_served, updated_at)
+    VALUES ($2, $1, CURRENT_TIMESTAMP)
+    ON CONFLICT (bot_index) DO UPDATE
+    SET bytes_served = bot_stats.bytes_served + EXCLUDED.bytes_served,
+        updated_at = EXCLUDED.updated_at
+''')
+
+# Stats
+
+BOT_STATS = query('bot_stats', '''
+    SELECT bot_index, bytes_served, updated_at FROM bot_stats ORDER BY bot_index
+''')
+
+GLOBAL_STATS = query('global_stats', '''
+    SELECT
+        (SELECT COUNT(*) FROM files) AS total_files,
+        (SELECT COUNT(*) FROM users) AS total_users,
+        (SELECT COALESCE(SUM(total_views), 0) FROM files) AS total_views,
+        (SELECT COALESCE(SUM(total_downloads), 0) FROM files) AS total_downloads,
+        (SELECT COALESCE(SUM(total_bandwidth), 0) FROM files) AS total_bandwidth,
+        (SELECT COUNT(*) FROM generated_links
+         WHERE is_active = TRUE AND expiry_timestamp > $1) AS active_links
+''')
+
+# Per-user totals for the dashboard ($2 is the current unix time)
+USER_DASHBOARD_STATS = query('user_dashboard_stats', '''
+    SELECT
+        (SELECT COUNT(*) FROM files WHERE uploaded_by = $1) AS total_files,
+        (SELECT COALESCE(SUM(total_views), 0) FROM files WHERE uploaded_by = $1) AS total_views,
+        (SELECT COALESCE(SUM(total_downloads), 0) FROM files WHERE uploaded_by = $1) AS total_downloads,
+        (SELECT COUNT(*) FROM generated_links WHERE user_id = $1) AS total_links,
+        (SELECT COUNT(*) FROM generated_links
+         WHERE user_id = $1 AND is_active = TRUE AND expiry_timestamp > $2) AS active_links,
+        (SELECT COALESCE(total_bandwidth, 0) FROM users WHERE id = $1) AS total_bandwidth
+''')
+
+# Seconds a PostgreSQL standby is behind (0 on a primary or a caught-up standby)
+REPLICA_LAG = query('replica_lag', '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+''')
+
+# Ingestion
+
+# The multi-node rate limiter creates the user row bare (its tracker rows
+# reference users), so the ingest upsert fills in the names of a row that has
+# none. It only writes, and returns a row, when the user is new to ingestion
+USER_ENSURE = query('user_ensure', '''
+    INSERT INTO users (id) VALUES ($1)
+    ON CONFLICT (id) DO NOTHING
+''')
+
+_USER_UPSERT_SQL = '''
+    INSERT INTO users (id, username, first_name, last_name)
+    VALUES ({user_id}, {username}, {first_name}, {last_name})
+    ON CONFLICT (id) DO UPDATE
+    SET username = COALESCE(users.username, EXCLUDED.username),
+        first_name = COALESCE(users.first_name, EXCLUDED.first_name),
+        last_name = COALESCE(users.last_name, EXCLUDED.last_name)
+    WHERE users.username IS NULL AND users.first_name IS NULL AND users.last_name IS NULL
+'''
+
+USER_UPSERT = query('user_upsert', _USER_UPSERT_SQL.format(
+    user_id='$1', username='$2', first_name='$3', last_name='$4'
+))
+
+
+def _file_upsert_sql(bot_column: str) -> str:
+    return f'''
+    INSERT INTO files (unique_file_id, file_name, file_size, mime_type, {bot_column},
+                       uploaded_by, channel_id, message_id)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ON CONFLICT (unique_file_id) DO UPDATE
+    SET {bot_column} = COALESCE(EXCLUDED.{bot_column}, files.{bot_column})
+'''
+
+
+# Upload ingestion in one statement: user upsert, file upsert, and either the
+# uploader's existing link for the file (when it has at least $14 seconds left)
+# or a new one. FK checks run at the end of the statement, so the new user/file
+# satisfy them. One variant per bot file_id column; SQLite runs the same steps
+# in one transaction.
+INGEST_UPLOAD = {
+    bot_index: query(f'ingest_upload_bot{bot_index}', f'''
+        WITH new_user AS (
+            {_USER_UPSERT_SQL.format(user_id='$6', username='$9', first_name='$10', last_name='$11')}
+            RETURNING id
+        ), upserted_file AS (
+            {_file_upsert_sql(f'bot_{bot_index}_file_id')}
+            RETURNING unique_file_id, (xmax = 0) AS file_created
+        ), existing_link AS (
+            SELECT id, expiry_timestamp, integrity_hash, TRUE AS link_reused
+            FROM generated_links
+            WHERE user_id = $6 AND unique_file_id = $1
+              AND expiry_timestamp > $14 AND is_active = TRUE
+            ORDER BY expiry_timestamp DESC
+            LIMIT 1
+        ), new_link AS (
+            INSERT INTO generated_links (unique_file_id, user_id, expiry_timestamp, integrity_hash)
+            SELECT unique_file_id, $6, $12, $13 FROM upserted_file
+            WHERE NOT EXISTS (SELECT 1 FROM existing_link)
+            RETURNING id, expiry_timestamp, integrity_hash, FALSE AS link_reused
+        )
+        SELECT link.id, link.expiry_timestamp, link.integrity_hash, link.link_reused,
+               upserted_file.file_created,
+               EXISTS (SELECT 1 FROM new_user) AS user_created
+        FROM (SELECT * FROM new_link UNION ALL SELECT * FROM existing_link) link, upserted_file
+    ''')
+    for bot_index in range(3)
+}
+
+FILE_UPSERT = {
+    bot_index: query(f'file_upsert_bot{bot_index}', _file_upsert_sql(f'bot_{bot_index}_file_id'))
+    for bot_index in range(3)
+}
+
+# A repeat upload answered from the link cache still records its bot file_id,
+# as the upsert would. No row comes back when the file or the cached link has
+# since been deleted or deactivated, and the cache entry is dropped
+FILE_REFRESH = {
+    bot_index: query(f'file_refresh_bot{bot_index}', f'''
+        UPDATE files SET bot_{bot_index}_file_id = COALESCE($2, bot_{bot_index}_file_id)
+        WHERE unique_file_id = $1
+          AND EXISTS (SELECT 1 FROM generated_links WHERE id = $3 AND is_active = TRUE)
+        RETURNING unique_file_id
+    ''')
+    for bot_index in range(3)
+}
+
+FILE_EXISTS = query('file_exists', '''
+    SELECT 1 FROM files WHERE unique_file_id = $1
+''')
+
+LINK_INSERT = query('link_insert', '''
+    INSERT INTO generated_links (unique_file_id, user_id, expiry_timestamp, integrity_hash)
+    VALUES ($1, $2, $3, $4)
+    RETURNING id, expiry_timestamp, integrity_hash
+''')
+
+REUSABLE_LINK = query('reusable_link', '''
+    SELECT id, expiry_timestamp, integrity_hash FROM generated_links
+    WHERE user_id = $1 AND unique_file_id = $2
+      AND expiry_timestamp > $3 AND is_active = TRUE
+    ORDER BY expiry_timestamp DESC
+    LIMIT 1
+''')
+
+# Maintenance (batched: the last parameter is the batch size)
+
+PRUNE_EXPIRED_LINKS = query('prune_expired_links', '''
+    DELETE FROM generated_links WHERE id IN (
+        SELECT id FROM generated_links WHERE expiry_timestamp < $1 LIMIT $2
+    )
+''')
+
+PRUNE_OTPS = query('prune_otps', '''
+    DELETE FROM otp_tokens WHERE id IN (
+        SELECT id FROM otp_tokens WHERE expires_at < $1 LIMIT $2
+    )
+''')
+
+PRUNE_RATE_LIMITS = query('prune_rate_limits', '''
+    DELETE FROM rate_limit_tracker WHERE id IN (
+        SELECT id FROM rate_limit_tracker WHERE period_start < $1 LIMIT $2
+    )
+''')
+
+# Access analytics (hourly rollups of link_access_logs, maintained by the log writer)
+
+ACCESS_ROLLUP_ADD = query('access_rollup_add', '''
+    INSERT INTO link_access_hourly (bucket, link_id, unique_file_id, access_type, hits)
+    VALUES ($1, $2, $3, $4, $5)
+    ON CONFLICT (bucket, link_id, access_type) DO UPDATE
+    SET hits = link_access_hourly.hits + EXCLUDED.hits
+''')
+
+FILE_HOURLY_ACCESS = query('file_hourly_access', '''
+    SELECT bucket, access_type, SUM(hits) AS hits FROM link_access_hourly
+    WHERE unique_file_id = $1 AND bucket >= $2
+    GROUP BY bucket, access_type
+    ORDER BY bucket DESC
+    LIMIT 48
+''')
+
+# One-off rollup of an unpartitioned link_access_logs table being converted
+LEGACY_ACCESS_ROLLUP = query('legacy_access_rollup', '''
+    INSERT INTO link_access_hourly (bucket, link_id, unique_file_id, access_type, hits)
+    SELECT date_trunc('hour', l.accessed_at), l.link_id, g.unique_file_id,
+           COALESCE(l.access_type, 'view'), COUNT(*)
+    FROM link_access_logs_legacy l LEFT JOIN generated_links g ON g.id = l.link_id
+    WHERE l.link_id IS NOT NULL AND l.accessed_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (bucket, link_id, access_type) DO UPDATE
+    SET hits = link_access_hourly.hits + EXCLUDED.hits
+''', sqlite='''
+    INSERT INTO link_access_hourly (bucket, link_id, unique_file_id, access_type, hits)
+    SELECT strftime('%Y-%m-%d %H:00:00', l.accessed_at), l.link_id, g.unique_file_id,
+           COALESCE(l.access_type, 'view'), COUNT(*)
+    FROM link_access_logs_legacy l LEFT JOIN generated_links g ON g.id = l.link_id
+    WHERE l.link_id IS NOT NULL AND l.accessed_at IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (bucket, link_id, access_type) DO UPDATE
+    SET hits = link_access_hourly.hits + excluded.hits
+''')
+
+# Admin exports, streamed in batches. No ORDER BY: sorting the whole result
+# would hold back the first row until every row had been read
+
+EXPORT_FILE_COLUMNS = ('unique_file_id', 'file_name', 'file_size', 'mime_type', 'uploaded_by', 'upload_date',
+                       'total_views', 'total_downloads', 'total_bandwidth', 'channel_id', 'message_id')
+
+EXPORT_FILES = query('export_files', f'''
+    SELECT {', '.join(EXPORT_FILE_COLUMNS)} FROM files
+''')
+
+EXPORT_ACCESS_LOG_COLUMNS = ('id', 'link_id', 'accessed_at', 'ip_address', 'user_agent', 'access_type')
+
+# The range keeps PostgreSQL to the partitions it covers
+EXPORT_ACCESS_LOGS = query('export_access_logs', f'''
+    SELECT {', '.join(EXPORT_ACCESS_LOG_COLUMNS)} FROM link_access_logs
+    WHERE accessed_at >= $1 AND accessed_at < $2
+''')
@@ -0,0 +1,68 @@
+# Compact row types shared by both database backends
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Sequence, Tuple
+import asyncpg
+
+
+class PgRecord(asyncpg.Record):
+    """asyncpg record with attribute access (row.file_name as well as row['file_name'])"""
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class Record(tuple):
+    """
+    Tuple-backed SQLite row. Column positions live on a class shared by every
+    row with the same columns, so a row costs one tuple and no dict. Supports
+    row[0], row['name'], row.name, get(), keys(), items() and dict(row).
+    """
+    __slots__ = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def values(self) -> Iterator[Any]:
+        return tuple.__iter__(self)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._index, tuple.__iter__(self))
+
+    def __repr__(self):
+        fields = ' '.join(f'{key}={value!r}' for key, value in self.items())
+        return f'<Record {fields}>'
+
+
+@lru_cache(maxsize=512)
+def record_type(columns: Tuple[str, ...]) -> type:
+    """Record subclass for one column layout (cached per layout)"""
+    return type('Record', (Record,), {
+        '__slots__': (),
+        '_index': {name: position for position, name in enumerate(columns)},
+    })
+
+
+def make_records(description: Sequence, rows: Sequence[tuple]) -> list:
+    """Wrap raw sqlite3 rows using the cursor description"""
+    cls = record_type(tuple(desc[0] for desc in description))
+    return [cls(row) for row in rows]
@@ -0,0 +1,280 @@
+# SQLite engine: WAL mode, pooled readers and a group-commit writer
+import asyncio
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import aiosqlite
+from .records import make_records
+
+WRITE_KEYWORDS = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b')
+
+
+@lru_cache(maxsize=2048)
+def to_sqlite_placeholders(query: str) -> str:
+    """
+    Convert PostgreSQL $1, $2 placeholders to SQLite's numbered ?1, ?2 (cached
+    per query), so parameters can repeat or appear out of order
+    """
+    return re.sub(r'\$(\d+)', r'?\1', query)
+
+
+@lru_cache(maxsize=2048)
+def is_read_query(query: str) -> bool:
+    """True for statements that can run on a read-only connection"""
+    head = query.lstrip().upper()
+    if not head.startswith(('SELECT', 'WITH', 'EXPLAIN')):
+        return False
+    if 'RETURNING' in head:
+        return False
+    return not (head.startswith('WITH') and WRITE_KEYWORDS.search(head))
+
+
+class _DirectConnection:
+    """Runs statements straight on the writer inside an open transaction"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, query: str, *args):
+        async with self._conn.execute(to_sqlite_placeholders(query), args) as cursor:
+            return cursor.rowcount
+
+    async def executemany(self, query: str, args_list):
+        await self._conn.executemany(to_sqlite_placeholders(query), args_list)
+
+    async def fetch(self, query: str, *args):
+        async with self._conn.execute(to_sqlite_placeholders(query), args) as cursor:
+            return make_records(cursor.description, await cursor.fetchall())
+
+    async def fetchrow(self, query: str, *args):
+        async with self._conn.execute(to_sqlite_placeholders(query), args) as cursor:
+            row = await cursor.fetchone()
+            return make_records(cursor.description, [row])[0] if row else None
+
+    async def fetchval(self, query: str, *args):
+        async with self._conn.execute(to_sqlite_placeholders(query), args) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+
+class SQLiteConnection:
+    """
+    asyncpg-like connection handed out by db_manager.acquire() in SQLite mode.
+    Reads go to the reader pool and writes to the group-commit writer, so
+    holding one does not block other requests.
+    """
+
+    def __init__(self, engine: 'SQLiteEngine'):
+        self._engine = engine
+
+    async def execute(self, query: str, *args):
+        return await self._engine.execute(query, *args)
+
+    async def executemany(self, query: str, args_list):
+        return await self._engine.executemany(query, args_list)
+
+    async def fetch(self, query: str, *args):
+        return await self._engine.fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args):
+        return await self._engine.fetchrow(query, *args)
+
+    async def fetchval(self, query: str, *args):
+        return await self._engine.fetchval(query, *args)
+
+    async def commit(self):
+        """Writes are committed by the writer before they return"""
+
+
+class SQLiteEngine:
+    """
+    One writer connection owned by a background task that applies queued
+    writes in group commits (one transaction per batch, a savepoint per
+    statement so a failing write does not roll back its neighbours), plus a
+    pool of read-only connections that read concurrently thanks to WAL.
+    """
+
+    def __init__(self, path: str, readers: int = 4, synchronous: str = 'NORMAL', batch_size: int = 100):
+        self.path = path
+        self.reader_count = readers if path != ':memory:' else 0
+        self.synchronous = synchronous
+        self.batch_size = batch_size
+        self.writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._task = None
+        # Metrics
+        self.commits = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.largest_batch = 0
+        self.last_commit_ms = 0.0
+
+    async def connect(self):
+        self.writer = await aiosqlite.connect(self.path, isolation_level=None)
+        await self.writer.execute('PRAGMA journal_mode=WAL')
+        await self.writer.execute(f'PRAGMA synchronous={self.synchronous}')
+        await self.writer.execute('PRAGMA busy_timeout=5000')
+
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.reader_count):
+            reader = await aiosqlite.connect(f'file:{quote(self.path)}?mode=ro', uri=True)
+            await reader.execute('PRAGMA busy_timeout=5000')
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+
+        self._writes = asyncio.Queue()
+        self._task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        if self._task:
+            # Queued writes land first; the sentinel ends the loop after its
+            # last commit, so no transaction is left open on the writer
+            self._writes.put_nowait(None)
+            await self._task
+            self._task = None
+            while not self._writes.empty():
+                *_, future = self._writes.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("SQLite engine is closed"))
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        if self.writer:
+            await self.writer.close()
+            self.writer = None
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection (the writer when no readers are configured)"""
+        if not self._readers:
+            yield self.writer
+            return
+        conn = await self._idle_readers.get()
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    # Writer
+
+    async def _submit(self, op: str, query, args):
+        future = asyncio.get_running_loop().create_future()
+        self._writes.put_nowait((op, query, args, future))
+        return await future
+
+    async def _writer_loop(self):
+        """Commit queued writes in batches until the None sentinel from close()"""
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._writes.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size or self._writes.empty():
+                    break
+                item = self._writes.get_nowait()
+            stopping = item is None
+            if batch:
+                await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch: list):
+        started = time.perf_counter()
+        direct = _DirectConnection(self.writer)
+        results = []
+        try:
+            await self.writer.execute('BEGIN IMMEDIATE')
+            for op, query, args, future in batch:
+                await self.writer.execute('SAVEPOINT write_op')
+                try:
+                    if op == 'call':
+                        result = await query(direct)
+                    elif op == 'executemany':
+                        result = await direct.executemany(query, args)
+                    else:
+                        result = await getattr(direct, op)(query, *args)
+                    await self.writer.execute('RELEASE write_op')
+                    results.append((future, result))
+                except Exception as e:
+                    await self.writer.execute('ROLLBACK TO write_op')
+                    await self.writer.execute('RELEASE write_op')
+                    self.failed_writes += 1
+                    if not future.done():
+                        future.set_exception(e)
+            await self.writer.execute('COMMIT')
+        except Exception as e:
+            logging.error(f"SQLite group commit of {len(batch)} writes failed: {e}")
+            try:
+                await self.writer.execute('ROLLBACK')
+            except Exception:
+                pass
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+        self.commits += 1
+        self.writes += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.last_commit_ms = (time.perf_counter() - started) * 1000
+
+    async def run_in_transaction(self, fn):
+        """Run fn(conn) atomically on the writer; fn must only use the conn it is given"""
+        return await self._submit('call', fn, None)
+
+    # Public query API (accepts $n or ? placeholders)
+
+    async def execute(self, query: str, *args):
+        return await self._submit('execute', query, args)
+
+    async def executemany(self, query: str, args_list):
+        return await self._submit('executemany', query, list(args_list))
+
+    async def fetch(self, query: str, *args):
+        if not is_read_query(query):
+            return await self._submit('fetch', query, args)
+        async with self.reader() as conn:
+            return await _DirectConnection(conn).fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args):
+        if not is_read_query(query):
+            return await self._submit('fetchrow', query, args)
+        async with self.reader() as conn:
+            return await _DirectConnection(conn).fetchrow(query, *args)
+
+    async def fetchval(self, query: str, *args):
+        if not is_read_query(query):
+            return await self._submit('fetchval', query, args)
+        async with self.reader() as conn:
+            return await _DirectConnection(conn).fetchval(query, *args)
+
+    async def stream(self, query: str, args, batch_size: int):
+        """Yield rows in batches from one read connection, held until the generator closes"""
+        async with self.reader() as conn:
+            async with conn.execute(to_sqlite_placeholders(query), args) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield make_records(cursor.description, rows)
+
+    def metrics(self) -> Dict:
+        return {
+            "readers": len(self._readers),
+            "idle_readers": self._idle_readers.qsize() if self._idle_readers else 0,
+            "queued_writes": self._writes.qsize() if self._writes else 0,
+            "commits": self.commits,
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+            "avg_batch": round(self.writes / self.commits, 2) if self.commits else 0,
+            "largest_batch": self.largest_batch,
+            "last_commit_ms": round(self.last_commit_ms, 3),
+        }
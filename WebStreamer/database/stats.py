@@ -0,0 +1,82 @@
+# Materialized global statistics
+import asyncio
+import logging
+import time
+from typing import Dict
+from .connection import db_manager
+from .counters import counters
+from .queries import GLOBAL_STATS
+from ..vars import Var
+
+# Stats fed by write-behind counters: stat name -> counter name
+COUNTED_STATS = {
+    'total_views': 'file_views',
+    'total_downloads': 'file_downloads',
+    'total_bandwidth': 'file_bandwidth',
+}
+
+
+class GlobalStats:
+    """
+    Global counters kept in memory so /api/stats costs constant time.
+    Creations are counted as they happen, views/downloads/bytes served come
+    from the write-behind counters, and everything is periodically reconciled with
+    full aggregates from the database.
+    """
+
+    def __init__(self, reconcile_interval: int):
+        self.reconcile_interval = reconcile_interval
+        self.values: Dict[str, int] = {
+            'total_files': 0,
+            'total_users': 0,
+            'total_views': 0,
+            'total_downloads': 0,
+            'total_bandwidth': 0,
+            'active_links': 0,
+        }
+        self.reconciled_at = 0.0
+        # Counter totals at the moment of the last reconciliation
+        self._marks: Dict[str, int] = {}
+        self._task = None
+
+    def incr(self, name: str, amount: int = 1):
+        self.values[name] += amount
+
+    async def reconcile(self):
+        """Replace the in-memory values with exact aggregates from the database"""
+        # No flush may commit between reading the unflushed deltas and the
+        # aggregates, or those deltas would be counted twice. The primary is read
+        # because deltas not yet replicated would be in neither
+        async with counters.lock:
+            marks = {name: counters.totals[counter] for name, counter in COUNTED_STATS.items()}
+            unflushed = {name: counters.pending_total(counter) for name, counter in COUNTED_STATS.items()}
+            row = await db_manager.fetchrow(GLOBAL_STATS, int(time.time()))
+        for name in ('total_files', 'total_users', 'active_links'):
+            self.values[name] = int(row[name] or 0)
+        for name in COUNTED_STATS:
+            self.values[name] = int(row[name] or 0) + unflushed[name]
+        self._marks = marks
+        self.reconciled_at = time.time()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current values, including counter increments since the last reconciliation"""
+        values = dict(self.values)
+        for name, counter in COUNTED_STATS.items():
+            values[name] += counters.totals[counter] - self._marks.get(name, 0)
+        return values
+
+    async def run(self):
+        """Background loop that reconciles with the database"""
+        while True:
+            try:
+                await self.reconcile()
+                logging.debug(f"Global stats reconciled: {self.values}")
+            except Exception as e:
+                logging.error(f"Error reconciling global stats: {e}")
+            await asyncio.sleep(self.reconcile_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+
+global_stats = GlobalStats(Var.STATS_RECONCILE_INTERVAL)
@@ -4,10 +4,16 @@
 
 from aiohttp import web
 from .stream_routes_v2 import routes
+from .admin_routes import routes as admin_routes
+from .static_routes import routes as static_routes, static_frontend
 
 
 def web_server():
     web_app = web.Application(client_max_size=30000000)
+    web_app.add_routes(admin_routes)
     web_app.add_routes(routes)
+    # Catch-all for the single-page app, so it must come after every other route
+    if static_frontend.load():
+        web_app.add_routes(static_routes)
     return web_app
 
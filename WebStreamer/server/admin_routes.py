@@ -0,0 +1,138 @@
+# Admin-only routes (metrics and diagnostics)
+import csv
+import hmac
+import io
+import logging
+from datetime import date, datetime, timedelta
+from aiohttp import web
+from WebStreamer.database import db_manager, access_log_writer, maintenance, counters
+from WebStreamer.database.ingest import ingest_timer, link_cache
+from WebStreamer.database.queries import (BOT_STATS, EXPORT_FILES, EXPORT_FILE_COLUMNS, EXPORT_ACCESS_LOGS,
+                                          EXPORT_ACCESS_LOG_COLUMNS)
+from WebStreamer.utils.link_verifier import link_verifier
+from WebStreamer.utils.response_cache import response_cache
+from WebStreamer.server.live_stats import live_stats
+from WebStreamer.server.static_routes import static_frontend
+from WebStreamer.utils.fast_json import dumps
+from WebStreamer.vars import Var
+
+routes = web.RouteTableDef()
+
+
+def require_admin(request):
+    """Raise 403 unless the request carries the configured admin bearer token"""
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header[7:] if auth_header.startswith('Bearer ') else ''
+    if not Var.ADMIN_TOKEN or not hmac.compare_digest(token.encode(), Var.ADMIN_TOKEN.encode()):
+        raise web.HTTPForbidden(text="Admin token required")
+
+
+@routes.get("/api/metrics")
+async def get_metrics(request):
+    """Database pool, statement latency and background writer metrics"""
+    require_admin(request)
+    try:
+        return web.json_response({
+            "database": db_manager.metrics(),
+            "link_cache": link_verifier.stats(),
+            "access_logs": access_log_writer.stats(),
+            "ingest": ingest_timer.stats(),
+            "reusable_links": link_cache.stats(),
+            "maintenance": maintenance.stats(),
+            "response_cache": response_cache.stats(),
+            "live_stats": live_stats.stats(),
+            "frontend": static_frontend.stats(),
+            "bandwidth": {
+                "served_by_process": counters.totals['file_bandwidth'],
+                "unflushed": counters.pending_total('file_bandwidth'),
+                "bots": [
+                    {"bot_index": row['bot_index'], "bytes_served": row['bytes_served']}
+                    for row in await db_manager.fetch(BOT_STATS)
+                ],
+            },
+        })
+    except Exception as e:
+        logging.error(f"Error in get_metrics: {e}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+def encode_rows(rows, columns, fmt: str) -> bytes:
+    """One batch of rows as CSV lines or JSON lines"""
+    if fmt == 'jsonl':
+        return b''.join(dumps({column: row[column] for column in columns}) + b'\n' for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if isinstance(value, (datetime, date)) else value for value in
+         (row[column] for column in columns)]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def stream_export(request: web.Request, name: str, query, columns, *args) -> web.StreamResponse:
+    """
+    Stream a query's rows as a CSV or JSONL download. Each batch is written
+    before the next is fetched, and write() waits for the client to drain,
+    so a slow download holds one batch in memory, not the whole result.
+    """
+    fmt = request.query.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        raise web.HTTPBadRequest(text="format must be csv or jsonl")
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson',
+        'Content-Disposition': f'attachment; filename="{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"',
+        'Cache-Control': 'no-store',
+    })
+    response.enable_compression()
+    await response.prepare(request)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        await response.write(buffer.getvalue().encode())
+
+    exported = 0
+    batches = db_manager.stream(query, *args, batch_size=Var.EXPORT_BATCH_SIZE, replica=True)
+    try:
+        async for rows in batches:
+            await response.write(encode_rows(rows, columns, fmt))
+            exported += len(rows)
+    except ConnectionResetError:
+        logging.info(f"Export of {name} cancelled by the client after {exported} rows")
+        return response
+    except Exception as e:
+        # Headers are gone already; dropping the connection marks the download incomplete
+        logging.error(f"Error exporting {name} after {exported} rows: {e}")
+        raise
+    finally:
+        await batches.aclose()
+    await response.write_eof()
+    logging.info(f"Exported {exported} rows of {name} as {fmt}")
+    return response
+
+
+def parse_day(value: str, default: datetime) -> datetime:
+    """Start of a YYYY-MM-DD (or ISO datetime) query parameter"""
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Invalid date: {value}")
+
+
+@routes.get("/api/admin/export/files")
+async def export_files(request):
+    """Every file with its counters (?format=csv|jsonl)"""
+    require_admin(request)
+    return await stream_export(request, 'files', EXPORT_FILES, EXPORT_FILE_COLUMNS)
+
+
+@routes.get("/api/admin/export/access-logs")
+async def export_access_logs(request):
+    """Raw access logs from since (default: retention start) until (default: now)"""
+    require_admin(request)
+    today = datetime.combine(date.today(), datetime.min.time())
+    since = parse_day(request.query.get('since'), today - timedelta(days=Var.ACCESS_LOG_RETENTION_DAYS))
+    until = parse_day(request.query.get('until'), today + timedelta(days=1))
+    return await stream_export(request, 'access-logs', EXPORT_ACCESS_LOGS, EXPORT_ACCESS_LOG_COLUMNS, since, until)
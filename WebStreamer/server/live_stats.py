@@ -0,0 +1,144 @@
+# Live stats pushed to browsers over Server-Sent Events
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+from WebStreamer.database import counters, global_stats
+from WebStreamer.utils.fast_json import dumps
+from WebStreamer.vars import Var
+
+
+def sse_event(name: str, data) -> bytes:
+    """One serialized Server-Sent Event"""
+    return b'event: ' + name.encode() + b'\ndata: ' + dumps(data) + b'\n\n'
+
+
+class LiveStats:
+    """
+    Samples in-process counters (never the database) every interval seconds
+    and fans the fields that changed out to all subscribers, so one
+    computation and one serialization serve any number of browsers.
+    Subscribers get a full snapshot first, then deltas. One that falls
+    behind is disconnected; EventSource reconnects and starts over from a
+    snapshot. The sampling loop only runs while someone is subscribed.
+    """
+
+    def __init__(self, interval: float, max_subscribers: int, heartbeat: float, queue_size: int = 8):
+        self.interval = interval
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.active_streams = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.current: Dict = {}
+        self.events_sent = 0
+        self.dropped = 0
+        self._last_sample = None
+        self._task = None
+
+    def stream_started(self):
+        self.active_streams += 1
+
+    def stream_finished(self):
+        self.active_streams -= 1
+
+    def sample(self) -> Dict:
+        """Current totals plus rates since the previous sample"""
+        from .stream_routes_v2 import format_file_size  # Import here to avoid circular import
+        now = time.monotonic()
+        served = counters.totals['file_bandwidth']
+        views = counters.totals['file_views']
+        bytes_per_sec = views_per_sec = 0
+        if self._last_sample:
+            elapsed = max(now - self._last_sample[0], 1e-3)
+            bytes_per_sec = int((served - self._last_sample[1]) / elapsed)
+            views_per_sec = round((views - self._last_sample[2]) / elapsed, 2)
+        self._last_sample = (now, served, views)
+
+        stats = global_stats.snapshot()
+        return {
+            "total_files": stats['total_files'],
+            "total_users": stats['total_users'],
+            "total_views": stats['total_views'],
+            "total_downloads": stats['total_downloads'],
+            "total_bandwidth": stats['total_bandwidth'],
+            "total_bandwidth_formatted": format_file_size(stats['total_bandwidth']),
+            "active_links": stats['active_links'],
+            "active_streams": self.active_streams,
+            "bytes_per_sec": bytes_per_sec,
+            "bytes_per_sec_formatted": f"{format_file_size(bytes_per_sec)}/s",
+            "views_per_sec": views_per_sec,
+        }
+
+    def subscribe(self) -> Optional[asyncio.Queue]:
+        """Queue of encoded events for a new subscriber, or None when full"""
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        if self._task is None:
+            # Nobody was listening, so the last sample is stale
+            self.current = self.sample()
+            self._task = asyncio.ensure_future(self.run())
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(sse_event('snapshot', self.current))
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, message: bytes):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too slow: drop what it has queued and tell its handler to close
+                self.subscribers.discard(queue)
+                self.dropped += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        self.events_sent += 1
+
+    async def run(self):
+        """Sample and publish changes while anyone is subscribed"""
+        quiet = 0.0
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                sample = self.sample()
+                changes = {key: value for key, value in sample.items() if self.current.get(key) != value}
+                self.current = sample
+                if changes:
+                    self.publish(sse_event('delta', changes))
+                    quiet = 0.0
+                else:
+                    quiet += self.interval
+                    if quiet >= self.heartbeat:
+                        # Comment line keeps idle connections open through proxies
+                        self.publish(b': ping\n\n')
+                        quiet = 0.0
+            except Exception as e:
+                logging.error(f"Error publishing live stats: {e}")
+        self._task = None
+
+    def stop(self):
+        """Close every subscriber's stream"""
+        for queue in list(self.subscribers):
+            self.subscribers.discard(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "active_streams": self.active_streams,
+            "events_sent": self.events_sent,
+            "dropped_subscribers": self.dropped,
+        }
+
+
+live_stats = LiveStats(Var.LIVE_STATS_INTERVAL, Var.LIVE_STATS_MAX_SUBSCRIBERS, Var.LIVE_STATS_HEARTBEAT)
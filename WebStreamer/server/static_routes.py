@@ -0,0 +1,180 @@
+# Serves the built frontend (frontend/dist) with precompressed variants
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import Dict, Optional
+from aiohttp import web
+from WebStreamer.utils.response_cache import accepts, etag_matches
+from WebStreamer.vars import Var
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+routes = web.RouteTableDef()
+
+# Vite writes content-hashed bundles to assets/, so they never change under a URL
+HASHED_PREFIX = 'assets/'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Paths the single-page app never owns; a miss there is a real 404
+SERVER_PREFIXES = ('api/', 'f/', 's/')
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'application/manifest+json',
+                'application/xml', 'image/svg+xml', 'application/wasm')
+CONTENT_TYPES = {
+    '.js': 'application/javascript',
+    '.mjs': 'application/javascript',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.webmanifest': 'application/manifest+json',
+    '.wasm': 'application/wasm',
+}
+
+
+class StaticFile:
+    """One file from dist/ with its encodings (path on disk, body when held in memory)"""
+    __slots__ = ('content_type', 'cache_control', 'paths', 'bodies', 'etags')
+
+    def __init__(self, content_type: str, cache_control: str):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.paths: Dict[str, str] = {}
+        self.bodies: Optional[Dict[str, bytes]] = None
+        self.etags: Dict[str, str] = {}
+
+    def encoding_for(self, accept_encoding: str) -> str:
+        """Smallest encoding the client accepts ('' is identity)"""
+        if 'br' in self.paths and accepts(accept_encoding, 'br'):
+            return 'br'
+        if 'gzip' in self.paths and accepts(accept_encoding, 'gzip'):
+            return 'gzip'
+        return ''
+
+
+class StaticFrontend:
+    """
+    Indexes dist/ once at startup, so requests are a dict lookup and never
+    touch paths outside it. .br/.gz files written by the frontend build are
+    served to clients that accept them. Small files are answered from memory
+    (compressed here if the build did not); larger ones go out through
+    FileResponse, which uses sendfile and handles ranges and revalidation.
+    """
+
+    def __init__(self, root: str, memory_max_bytes: int):
+        self.root = root
+        self.memory_max_bytes = memory_max_bytes
+        self.files: Dict[str, StaticFile] = {}
+        self.served = 0
+        self.not_modified = 0
+        self.sendfile = 0
+
+    def load(self) -> bool:
+        """Index the build; False when the frontend has not been built"""
+        if not os.path.isfile(os.path.join(self.root, 'index.html')):
+            logging.info(f"No frontend build in {self.root}, not serving the UI")
+            return False
+        self.files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(('.br', '.gz')):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+                try:
+                    self.files[rel] = self._index(rel, path)
+                except Exception as e:
+                    logging.error(f"Error indexing frontend file {rel}: {e}")
+        in_memory = sum(1 for entry in self.files.values() if entry.bodies is not None)
+        logging.info(f"Serving frontend from {self.root} ({len(self.files)} files, {in_memory} in memory)")
+        return 'index.html' in self.files
+
+    def _index(self, rel: str, path: str) -> StaticFile:
+        ext = os.path.splitext(rel)[1].lower()
+        content_type = CONTENT_TYPES.get(ext) or mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        compressible = content_type.startswith(COMPRESSIBLE)
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        entry = StaticFile(content_type, IMMUTABLE if rel.startswith(HASHED_PREFIX) else 'no-cache')
+
+        size = os.path.getsize(path)
+        entry.paths[''] = path
+        for coding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            # Only worth sending when the build made it smaller
+            if compressible and os.path.isfile(path + suffix) and os.path.getsize(path + suffix) < size:
+                entry.paths[coding] = path + suffix
+
+        if size > self.memory_max_bytes:
+            return entry
+        entry.bodies = {}
+        for coding, variant in entry.paths.items():
+            with open(variant, 'rb') as f:
+                entry.bodies[coding] = f.read()
+        body = entry.bodies['']
+        if compressible and len(body) >= Var.RESPONSE_COMPRESS_MIN_BYTES:
+            if 'gzip' not in entry.bodies:
+                entry.bodies['gzip'] = gzip.compress(body, compresslevel=9)
+                entry.paths['gzip'] = path + '.gz'
+            if 'br' not in entry.bodies and brotli:
+                entry.bodies['br'] = brotli.compress(body, quality=11)
+                entry.paths['br'] = path + '.br'
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        for coding in entry.bodies:
+            entry.etags[coding] = f'"{digest}{"-" + coding if coding else ""}"'
+        return entry
+
+    def lookup(self, path: str) -> Optional[StaticFile]:
+        """File for a request path, falling back to the app shell for client-side routes"""
+        entry = self.files.get(path or 'index.html')
+        if entry is not None:
+            return entry
+        if path.startswith(SERVER_PREFIXES) or '.' in path.rsplit('/', 1)[-1]:
+            return None
+        return self.files.get('index.html')
+
+    def respond(self, request: web.Request, entry: StaticFile) -> web.StreamResponse:
+        coding = entry.encoding_for(request.headers.get('Accept-Encoding', ''))
+        headers = {'Cache-Control': entry.cache_control}
+        if len(entry.paths) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        self.served += 1
+
+        if entry.bodies is None:
+            # A Content-Type set up front also stops aiohttp swapping in a .gz on its own
+            headers['Content-Type'] = entry.content_type
+            if coding:
+                headers['Content-Encoding'] = coding
+            self.sendfile += 1
+            return web.FileResponse(entry.paths[coding], headers=headers)
+
+        headers['ETag'] = entry.etags[coding]
+        if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        headers['Content-Type'] = entry.content_type
+        if coding:
+            headers['Content-Encoding'] = coding
+        return web.Response(body=entry.bodies[coding], headers=headers)
+
+    def stats(self) -> Dict:
+        return {
+            "files": len(self.files),
+            "served": self.served,
+            "not_modified": self.not_modified,
+            "sendfile": self.sendfile,
+        }
+
+
+static_frontend = StaticFrontend(Var.FRONTEND_DIST, Var.STATIC_MEMORY_MAX_BYTES)
+
+
+@routes.get("/{path:.*}")
+async def frontend(request: web.Request):
+    """Built frontend; registered last so every other route wins"""
+    entry = static_frontend.lookup(request.match_info['path'])
+    if entry is None:
+        raise web.HTTPNotFound()
+    return static_frontend.respond(request, entry)
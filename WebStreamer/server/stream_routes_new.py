@@ -7,25 +7,17 @@ import secrets
 import mimetypes
 from aiohttp import web
 from aiohttp.http_exceptions import BadStatusLine
-from WebStreamer import bot_loop
-from functools import partial
 from WebStreamer.bot import multi_clients, work_loads
 from WebStreamer.server.exceptions import FIleNotFound, InvalidHash
 from WebStreamer import Var, utils, StartTime, __version__, StreamBot
-from WebStreamer.database import db_manager
-from WebStreamer.database.models import GeneratedLink, File, LinkAccessLog
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from hashlib import sha256
+from WebStreamer.database import db_manager, counters, access_log_writer, global_stats
+from WebStreamer.database.models import GeneratedLink
+from WebStreamer.database.queries import FILE_HOURLY_ACCESS, FILE_MAPPING_BY_MESSAGE
+from WebStreamer.utils.link_verifier import link_verifier, sign_channel_link
+from WebStreamer.utils.response_cache import response_cache
+from datetime import datetime, timedelta
 import urllib.parse
 
-THREADPOOL = ThreadPoolExecutor(max_workers=1000)
-
-async def sync_to_async(func, *args, wait=True, **kwargs):
-    pfunc = partial(func, *args, **kwargs)
-    future = bot_loop.run_in_executor(THREADPOOL, pfunc)
-    return await future if wait else future
-
 routes = web.RouteTableDef()
 
 @routes.get("/", allow_head=True)
@@ -43,7 +35,7 @@ async def file_id_route_handler(request: web.Request):
         unique_file_id = request.match_info['unique_file_id']
         
         # Get link details from database
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             link_data = await GeneratedLink.get_by_unique_id(conn, unique_file_id)
             
             if not link_data:
@@ -74,29 +66,25 @@ async def file_id_route_handler(request: web.Request):
                     content_type="text/html"
                 )
             
-            bot_index = bot_mapping['bot_index'] if isinstance(bot_mapping, dict) else bot_mapping[2]
-            telegram_message_id = bot_mapping['telegram_message_id'] if isinstance(bot_mapping, dict) else bot_mapping[4]
-            channel_id = bot_mapping['channel_id'] if isinstance(bot_mapping, dict) else bot_mapping[5]
+            bot_index = bot_mapping['bot_index']
+            telegram_message_id = bot_mapping['telegram_message_id']
+            channel_id = bot_mapping['channel_id']
             
             # Generate hash for security
             expiry_timestamp = int(expiry_date.timestamp())
-            hash_data = f"{channel_id}|{telegram_message_id}|{expiry_timestamp}|{Var.SECRET_KEY}"
-            hash_value = sha256(hash_data.encode()).hexdigest()
+            hash_value = sign_channel_link(channel_id, telegram_message_id, expiry_timestamp)
             
-            # Increment access count
+            # Count link access (flushed in batches)
             link_id = link_data['id']
-            await GeneratedLink.increment_access(conn, link_id)
             
             # Log access (view)
             ip_address = request.headers.get('X-Forwarded-For', request.remote)
             user_agent = request.headers.get('User-Agent', '')
-            await LinkAccessLog.log_access(conn, link_id, ip_address, user_agent, 0, 'view')
+            access_log_writer.log(link_id, ip_address, user_agent, 'view', unique_file_id=unique_file_id)
             
-            # Increment file views
-            await File.increment_views(conn, file_id)
+            # Count file and link views (flushed in batches)
+            counters.add_view(file_id, link_id)
             
-            if db_manager.is_sqlite:
-                await conn.commit()
         
         # Redirect to bot-specific stream URL
         redirect_url = f"/bot{bot_index}/{telegram_message_id}/{expiry_timestamp}/{hash_value}"
@@ -140,10 +128,7 @@ async def bot_stream_handler(request: web.Request):
         channel_id = Var.BIN_CHANNEL
         
         # Verify hash
-        hash_data = f"{channel_id}|{message_id}|{expiry_time}|{Var.SECRET_KEY}"
-        expected_hash = sha256(hash_data.encode()).hexdigest()
-        
-        if hash_value != expected_hash:
+        if not link_verifier.verify_channel_link(channel_id, message_id, expiry_time, hash_value):
             raise web.HTTPForbidden(
                 text=error_page("Invalid Hash", "Link has been tampered with."),
                 content_type="text/html"
@@ -267,23 +252,15 @@ async def media_streamer(request: web.Request, message_id: int, channel_id: int,
 async def log_download(message_id: int, channel_id: int):
     """Log download to database"""
     try:
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             # Find file by message_id and channel_id
-            query = '''
-                SELECT file_id FROM file_bot_mapping
-                WHERE telegram_message_id = ? AND channel_id = ?
-            ''' if db_manager.is_sqlite else '''
-                SELECT file_id FROM file_bot_mapping
-                WHERE telegram_message_id = $1 AND channel_id = $2
-            '''
-            result = await db_manager.fetchrow(query, message_id, channel_id)
+            result = await conn.fetchrow(
+                FILE_MAPPING_BY_MESSAGE.text(db_manager.is_sqlite), message_id, channel_id
+            )
             
             if result:
-                file_id = result['file_id'] if isinstance(result, dict) else result[0]
-                await File.increment_downloads(conn, file_id)
-                
-                if db_manager.is_sqlite:
-                    await conn.commit()
+                file_id = result['file_id']
+                counters.add_download(file_id)
     except Exception as e:
         logging.error(f"Error logging download: {e}")
 
@@ -331,43 +308,16 @@ import asyncio
 async def api_stats_handler(request: web.Request):
     """Get global statistics"""
     try:
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Get total files
-            total_files_query = 'SELECT COUNT(*) as count FROM files'
-            total_files_result = await conn.fetchrow(total_files_query)
-            total_files = total_files_result['count'] if total_files_result else 0
-            
-            # Get total users
-            total_users_query = 'SELECT COUNT(*) as count FROM users'
-            total_users_result = await conn.fetchrow(total_users_query)
-            total_users = total_users_result['count'] if total_users_result else 0
-            
-            # Get total views and downloads
-            total_views_query = 'SELECT SUM(total_views) as views FROM files'
-            total_views_result = await conn.fetchrow(total_views_query)
-            total_views = total_views_result['views'] if total_views_result and total_views_result['views'] else 0
-            
-            total_downloads_query = 'SELECT SUM(total_downloads) as downloads FROM files'
-            total_downloads_result = await conn.fetchrow(total_downloads_query)
-            total_downloads = total_downloads_result['downloads'] if total_downloads_result and total_downloads_result['downloads'] else 0
-            
-            # Get active links count
-            active_links_query = 'SELECT COUNT(*) as count FROM generated_links WHERE is_active = TRUE AND expiry_date > NOW()' if not db_manager.is_sqlite else 'SELECT COUNT(*) as count FROM generated_links WHERE is_active = 1 AND expiry_date > datetime("now")'
-            active_links_result = await conn.fetchrow(active_links_query)
-            active_links = active_links_result['count'] if active_links_result else 0
-            
-            stats = {
-                'total_files': total_files,
-                'total_users': total_users,
-                'total_views': total_views,
-                'total_downloads': total_downloads,
-                'active_links': active_links,
-                'active_bots': len(multi_clients),
-                'uptime': utils.get_readable_time(time.time() - StartTime)
-            }
-            
-            return web.json_response(stats)
-            
+        stats = global_stats.snapshot()
+        return web.json_response({
+            'total_files': stats['total_files'],
+            'total_users': stats['total_users'],
+            'total_views': stats['total_views'],
+            'total_downloads': stats['total_downloads'],
+            'active_links': stats['active_links'],
+            'active_bots': len(multi_clients),
+            'uptime': utils.get_readable_time(time.time() - StartTime)
+        })
     except Exception as e:
         logging.error(f"Error in api_stats_handler: {e}")
         return web.json_response({'error': str(e)}, status=500)
@@ -394,56 +344,33 @@ async def api_files_handler(request: web.Request):
         if sort_by not in ['upload_date', 'total_views', 'total_downloads', 'file_size', 'file_name']:
             sort_by = 'upload_date'
         
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire_read() as conn:
             # Build query
             if search:
-                if db_manager.is_sqlite:
-                    count_query = 'SELECT COUNT(*) as count FROM files WHERE file_name LIKE ?'
-                    files_query = f'''
-                        SELECT f.*, u.username, u.first_name 
-                        FROM files f
-                        LEFT JOIN users u ON f.uploaded_by = u.id
-                        WHERE f.file_name LIKE ?
-                        ORDER BY f.{sort_by} {order}
-                        LIMIT ? OFFSET ?
-                    '''
-                    count_result = await conn.fetchrow(count_query, f'%{search}%')
-                    files_result = await conn.fetch(files_query, f'%{search}%', limit, offset)
-                else:
-                    count_query = 'SELECT COUNT(*) as count FROM files WHERE file_name ILIKE $1'
-                    files_query = f'''
-                        SELECT f.*, u.username, u.first_name 
-                        FROM files f
-                        LEFT JOIN users u ON f.uploaded_by = u.id
-                        WHERE f.file_name ILIKE $1
-                        ORDER BY f.{sort_by} {order}
-                        LIMIT $2 OFFSET $3
-                    '''
-                    count_result = await conn.fetchrow(count_query, f'%{search}%')
-                    files_result = await conn.fetch(files_query, f'%{search}%', limit, offset)
+                # SQLite LIKE is already case-insensitive for ASCII
+                like = 'LIKE' if db_manager.is_sqlite else 'ILIKE'
+                count_query = f'SELECT COUNT(*) as count FROM files WHERE file_name {like} $1'
+                files_query = f'''
+                    SELECT f.*, u.username, u.first_name 
+                    FROM files f
+                    LEFT JOIN users u ON f.uploaded_by = u.id
+                    WHERE f.file_name {like} $1
+                    ORDER BY f.{sort_by} {order}
+                    LIMIT $2 OFFSET $3
+                '''
+                count_result = await conn.fetchrow(count_query, f'%{search}%')
+                files_result = await conn.fetch(files_query, f'%{search}%', limit, offset)
             else:
-                if db_manager.is_sqlite:
-                    count_query = 'SELECT COUNT(*) as count FROM files'
-                    files_query = f'''
-                        SELECT f.*, u.username, u.first_name 
-                        FROM files f
-                        LEFT JOIN users u ON f.uploaded_by = u.id
-                        ORDER BY f.{sort_by} {order}
-                        LIMIT ? OFFSET ?
-                    '''
-                    count_result = await conn.fetchrow(count_query)
-                    files_result = await conn.fetch(files_query, limit, offset)
-                else:
-                    count_query = 'SELECT COUNT(*) as count FROM files'
-                    files_query = f'''
-                        SELECT f.*, u.username, u.first_name 
-                        FROM files f
-                        LEFT JOIN users u ON f.uploaded_by = u.id
-                        ORDER BY f.{sort_by} {order}
-                        LIMIT $1 OFFSET $2
-                    '''
-                    count_result = await conn.fetchrow(count_query)
-                    files_result = await conn.fetch(files_query, limit, offset)
+                count_query = 'SELECT COUNT(*) as count FROM files'
+                files_query = f'''
+                    SELECT f.*, u.username, u.first_name 
+                    FROM files f
+                    LEFT JOIN users u ON f.uploaded_by = u.id
+                    ORDER BY f.{sort_by} {order}
+                    LIMIT $1 OFFSET $2
+                '''
+                count_result = await conn.fetchrow(count_query)
+                files_result = await conn.fetch(files_query, limit, offset)
             
             total_count = count_result['count'] if count_result else 0
             total_pages = math.ceil(total_count / limit)
@@ -483,76 +410,61 @@ async def api_files_handler(request: web.Request):
         traceback.print_exc()
         return web.json_response({'error': str(e)}, status=500)
 
+async def build_file_detail(file_id: int):
+    """File details with uploader, bot mappings and hourly access"""
+    async with db_manager.acquire_read() as conn:
+        # Get file details with user info
+        file_result = await conn.fetchrow('''
+            SELECT f.*, u.username, u.first_name, u.last_name
+            FROM files f
+            LEFT JOIN users u ON f.uploaded_by = u.id
+            WHERE f.id = $1
+        ''', file_id)
+        
+        if not file_result:
+            raise FIleNotFound
+        
+        file_data = dict(file_result)
+        file_data['file_size_formatted'] = await formatFileSize(file_data.get('file_size', 0))
+        
+        # Format upload date
+        upload_date = file_data.get('upload_date')
+        if upload_date and not isinstance(upload_date, str):
+            file_data['upload_date'] = upload_date.isoformat()
+        
+        # Get bot mappings
+        mappings_result = await conn.fetch('SELECT * FROM file_bot_mapping WHERE file_id = $1', file_id)
+        
+        file_data['bot_mappings'] = [dict(row) for row in mappings_result]
+        
+        # Hourly access over the last two days, from the rollups
+        since = datetime.now() - timedelta(hours=48)
+        rollup_result = await conn.fetch(
+            FILE_HOURLY_ACCESS.text(db_manager.is_sqlite), file_data.get('unique_file_id'), since
+        )
+        
+        file_data['hourly_access'] = [
+            {
+                'bucket': str(row['bucket']),
+                'access_type': row['access_type'],
+                'hits': int(row['hits'])
+            }
+            for row in rollup_result
+        ]
+        
+        return file_data
+
 @routes.get("/api/files/{file_id}", allow_head=True)
 async def api_file_detail_handler(request: web.Request):
-    """Get detailed file information"""
+    """Get detailed file information (cached for FILE_DETAIL_CACHE_TTL seconds)"""
     try:
         file_id = int(request.match_info['file_id'])
-        
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Get file details with user info
-            if db_manager.is_sqlite:
-                file_query = '''
-                    SELECT f.*, u.username, u.first_name, u.last_name
-                    FROM files f
-                    LEFT JOIN users u ON f.uploaded_by = u.id
-                    WHERE f.id = ?
-                '''
-                file_result = await conn.fetchrow(file_query, file_id)
-            else:
-                file_query = '''
-                    SELECT f.*, u.username, u.first_name, u.last_name
-                    FROM files f
-                    LEFT JOIN users u ON f.uploaded_by = u.id
-                    WHERE f.id = $1
-                '''
-                file_result = await conn.fetchrow(file_query, file_id)
-            
-            if not file_result:
-                return web.json_response({'error': 'File not found'}, status=404)
-            
-            file_data = dict(file_result)
-            file_data['file_size_formatted'] = await formatFileSize(file_data.get('file_size', 0))
-            
-            # Format upload date
-            upload_date = file_data.get('upload_date')
-            if upload_date and not isinstance(upload_date, str):
-                file_data['upload_date'] = upload_date.isoformat()
-            
-            # Get bot mappings
-            if db_manager.is_sqlite:
-                mappings_query = 'SELECT * FROM file_bot_mapping WHERE file_id = ?'
-                mappings_result = await conn.fetch(mappings_query, file_id)
-            else:
-                mappings_query = 'SELECT * FROM file_bot_mapping WHERE file_id = $1'
-                mappings_result = await conn.fetch(mappings_query, file_id)
-            
-            file_data['bot_mappings'] = [dict(row) for row in mappings_result]
-            
-            # Get recent access logs (last 10)
-            if db_manager.is_sqlite:
-                logs_query = '''
-                    SELECT lal.* FROM link_access_logs lal
-                    INNER JOIN generated_links gl ON lal.link_id = gl.id
-                    WHERE gl.file_id = ?
-                    ORDER BY lal.accessed_at DESC
-                    LIMIT 10
-                '''
-                logs_result = await conn.fetch(logs_query, file_id)
-            else:
-                logs_query = '''
-                    SELECT lal.* FROM link_access_logs lal
-                    INNER JOIN generated_links gl ON lal.link_id = gl.id
-                    WHERE gl.file_id = $1
-                    ORDER BY lal.accessed_at DESC
-                    LIMIT 10
-                '''
-                logs_result = await conn.fetch(logs_query, file_id)
-            
-            file_data['recent_access'] = [dict(row) for row in logs_result]
-            
-            return web.json_response(file_data)
-            
+        return await response_cache.serve(
+            request, f"file:{file_id}", Var.FILE_DETAIL_CACHE_TTL,
+            lambda: build_file_detail(file_id), tags=("files",)
+        )
+    except FIleNotFound:
+        return web.json_response({'error': 'File not found'}, status=404)
     except ValueError:
         return web.json_response({'error': 'Invalid file ID'}, status=400)
     except Exception as e:
@@ -3,18 +3,30 @@ import logging
 import hashlib
 import time
 import math
+from functools import lru_cache
 from aiohttp import web
 from WebStreamer.bot import StreamBot, multi_clients
-from WebStreamer.database import db_manager
+from WebStreamer.database import db_manager, counters, access_log_writer, global_stats
 from WebStreamer.database.models import File, GeneratedLink
+from WebStreamer.database.queries import (FILE_BY_CHANNEL_MESSAGE, FILE_DETAIL, FILE_HOURLY_ACCESS, OTP_INSERT,
+                                          OTP_LATEST, OTP_MARK_USED, USER_DASHBOARD_STATS, USER_RECENT_FILES,
+                                          USER_DASHBOARD_LINKS)
 from WebStreamer.vars import Var
+from WebStreamer.utils.signed_links import revocation_list
+from WebStreamer.utils.link_verifier import link_verifier
+from WebStreamer.utils.fast_json import json_response
+from WebStreamer.utils.response_cache import response_cache
+from WebStreamer.utils.rate_limiter import rate_limiter, LINK_WINDOWS
+from WebStreamer.server.live_stats import live_stats
+from WebStreamer.server.exceptions import FIleNotFound
 from pyrogram.errors import FloodWait
 import asyncio
 
 routes = web.RouteTableDef()
 
 # Helper to format file size
-async def format_file_size(bytes_size):
+@lru_cache(maxsize=4096)
+def format_file_size(bytes_size):
     """Format bytes to human readable size"""
     if bytes_size is None or bytes_size == 0:
         return "0 B"
@@ -25,6 +37,57 @@ async def format_file_size(bytes_size):
     return f"{round(bytes_size / math.pow(k, i), 2)} {sizes[i]}"
 
 
+def build_stream_response(request: web.Request, client, bot_file_id: str, file_name: str,
+                          file_size: int, mime_type: str, disposition: str, unique_file_id: str = None,
+                          link_id: int = None, bot_index: int = 0, uploader_id: int = None) -> web.Response:
+    """
+    Build a (ranged) streaming response for a bot-specific Telegram file_id.
+    Bytes written to the client are counted per file, link, bot and uploader.
+    """
+    # Handle range requests
+    range_header = request.headers.get('Range')
+    offset = 0
+    limit = file_size
+    
+    if range_header:
+        from_bytes = int(range_header.split('=')[1].split('-')[0])
+        offset = from_bytes
+        limit = file_size - offset
+    
+    # Stream file using file_id
+    async def file_stream():
+        live_stats.stream_started()
+        try:
+            async for chunk in client.stream_media(bot_file_id, offset=offset, limit=limit):
+                yield chunk
+                # The chunk has been written once the consumer resumes us, so an
+                # aborted transfer is counted up to the last chunk it received
+                counters.add_bytes(len(chunk), unique_file_id, link_id, bot_index, uploader_id)
+        except Exception as e:
+            logging.error(f"Stream error: {e}")
+            raise
+        finally:
+            live_stats.stream_finished()
+    
+    # Build headers
+    headers = {
+        "Content-Type": mime_type,
+        "Content-Disposition": f'{disposition}; filename="{file_name}"',
+        "Content-Length": str(limit),
+        "Accept-Ranges": "bytes"
+    }
+    
+    # Add Content-Range only if range header exists
+    if range_header:
+        headers["Content-Range"] = f"bytes {offset}-{offset + limit - 1}/{file_size}"
+    
+    return web.Response(
+        status=206 if range_header else 200,
+        body=file_stream(),
+        headers=headers
+    )
+
+
 @routes.get("/f/{unique_file_id}/{expiry}/{integrity}", allow_head=True)
 async def stream_file_new(request: web.Request):
     """
@@ -48,8 +111,7 @@ async def stream_file_new(request: web.Request):
             )
         
         # Verify integrity
-        expected_hash = GeneratedLink.generate_integrity_hash(unique_file_id, expiry_timestamp, Var.SECRET_KEY)
-        if integrity_hash != expected_hash:
+        if not link_verifier.verify_integrity(unique_file_id, expiry_timestamp, integrity_hash):
             logging.warning(f"Integrity check failed for {unique_file_id}")
             return web.Response(
                 text="🔒 **Invalid Link**\n\nLink integrity verification failed.",
@@ -58,7 +120,7 @@ async def stream_file_new(request: web.Request):
             )
         
         # Get file from database
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
+        async with db_manager.acquire() as conn:
             file_data = await File.get_by_unique_id(conn, unique_file_id)
             
             if not file_data:
@@ -68,16 +130,16 @@ async def stream_file_new(request: web.Request):
                     content_type='text/plain'
                 )
             
-            # Increment view count
-            await File.increment_views(conn, unique_file_id)
-            
-            # Update link access (find link by params)
+            # Find link by params for access counting
             link_data = await GeneratedLink.get_by_params(conn, unique_file_id, expiry_timestamp, integrity_hash)
-            if link_data:
-                await GeneratedLink.increment_access(conn, link_data['id'])
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
+        
+        # Count view and link access, queue access log (flushed in batches)
+        link_id = link_data['id'] if link_data else None
+        counters.add_view(unique_file_id, link_id)
+        access_log_writer.log(
+            link_id, request.headers.get('X-Forwarded-For', request.remote),
+            request.headers.get('User-Agent', ''), unique_file_id=unique_file_id
+        )
         
         # Get bot file_id (try bot_0 first, then bot_1, etc.)
         bot_file_id = file_data.get('bot_0_file_id')
@@ -111,54 +173,20 @@ async def stream_file_new(request: web.Request):
             # Get file location
             file = await client.get_messages(client.me.id, 1)  # Dummy, we use file_id directly
             
-            # Download and stream
-            file_name = file_data['file_name']
-            file_size = file_data['file_size']
-            mime_type = file_data['mime_type']
-            
-            # Handle range requests
-            range_header = request.headers.get('Range')
-            offset = 0
-            limit = file_size
-            
-            if range_header:
-                from_bytes = int(range_header.split('=')[1].split('-')[0])
-                offset = from_bytes
-                limit = file_size - offset
-            
-            # Stream file using file_id
-            async def file_stream():
-                try:
-                    async for chunk in client.stream_media(bot_file_id, offset=offset, limit=limit):
-                        yield chunk
-                except Exception as e:
-                    logging.error(f"Stream error: {e}")
-                    raise
-            
             # Determine disposition
+            mime_type = file_data['mime_type']
             disposition = "attachment"
             if "video/" in mime_type or "audio/" in mime_type:
                 disposition = "inline"
             
-            # Increment download count
-            asyncio.create_task(increment_download(unique_file_id))
-            
-            # Build headers
-            headers = {
-                "Content-Type": mime_type,
-                "Content-Disposition": f'{disposition}; filename="{file_name}"',
-                "Content-Length": str(limit),
-                "Accept-Ranges": "bytes"
-            }
-            
-            # Add Content-Range only if range header exists
-            if range_header:
-                headers["Content-Range"] = f"bytes {offset}-{offset + limit - 1}/{file_size}"
+            # Count download (flushed in batches)
+            counters.add_download(unique_file_id)
             
-            return web.Response(
-                status=206 if range_header else 200,
-                body=file_stream(),
-                headers=headers
+            return build_stream_response(
+                request, client, bot_file_id, file_data['file_name'],
+                file_data['file_size'], mime_type, disposition,
+                unique_file_id=unique_file_id, link_id=link_id, bot_index=bot_index,
+                uploader_id=file_data.get('uploaded_by')
             )
             
         except Exception as e:
@@ -182,18 +210,66 @@ async def stream_file_new(request: web.Request):
         )
 
 
-async def increment_download(unique_file_id: str):
-    """Background task to increment download count"""
+@routes.get("/s/{token}/{file_name}", allow_head=True)
+async def stream_file_signed(request: web.Request):
+    """
+    Stream file from a self-contained signed link without touching the database
+    Format: /s/{signed_token}/{file_name}
+    """
     try:
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            await File.increment_downloads(conn, unique_file_id)
-            if db_manager.is_sqlite:
-                await conn.commit()
+        link = link_verifier.verify_signed_token(request.match_info['token'])
+        if not link:
+            return web.Response(
+                text="🔒 **Invalid Link**\n\nLink integrity verification failed.",
+                status=403,
+                content_type='text/plain'
+            )
+        
+        if int(time.time()) > link['e']:
+            return web.Response(
+                text="⏰ **Link Expired**\n\nThis link has expired. Please request a new one.",
+                status=410,
+                content_type='text/plain'
+            )
+        
+        if revocation_list.is_revoked(link):
+            return web.Response(
+                text="🚫 **Link Revoked**\n\nThis link is no longer available.",
+                status=410,
+                content_type='text/plain'
+            )
+        
+        client = multi_clients.get(link['b'], StreamBot)
+        
+        # Count view and link access, queue access log (flushed in batches)
+        counters.add_view(link['u'], link['l'])
+        access_log_writer.log(
+            link['l'], request.headers.get('X-Forwarded-For', request.remote),
+            request.headers.get('User-Agent', ''), unique_file_id=link['u']
+        )
+        
+        mime_type = link['m']
+        disposition = "attachment"
+        if "video/" in mime_type or "audio/" in mime_type:
+            disposition = "inline"
+        
+        return build_stream_response(
+            request, client, link['f'], link['n'], link['s'], mime_type, disposition,
+            unique_file_id=link['u'], link_id=link['l'], bot_index=link['b'], uploader_id=link.get('o')
+        )
+    
     except Exception as e:
-        logging.error(f"Error incrementing download: {e}")
+        logging.error(f"Error in stream_file_signed: {e}")
+        import traceback
+        traceback.print_exc()
+        return web.Response(
+            text=f"❌ **Server Error**\n\n{str(e)}",
+            status=500,
+            content_type='text/plain'
+        )
 
 
-@routes.get("/{encrypted_channel_id}/{message_id}", allow_head=True)
+@routes.get(r"/{encrypted_channel_id}/{message_id:\d+}", allow_head=True)
 async def stream_file_legacy(request: web.Request):
     """
     LEGACY: Support external apps using encrypted channel_id + message_id
@@ -218,27 +294,20 @@ async def stream_file_legacy(request: web.Request):
         logging.info(f"Legacy stream request for channel {channel_id}, message {message_id}")
         
         # Get file from database using channel_id and message_id
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            result = await conn.fetchrow(
-                'SELECT * FROM files WHERE channel_id = $1 AND message_id = $2',
-                channel_id, message_id
+        result = await db_manager.fetchrow(FILE_BY_CHANNEL_MESSAGE, channel_id, message_id)
+        
+        if not result:
+            return web.Response(
+                text="❌ **File Not Found**\n\nNo file found for this channel/message.",
+                status=404,
+                content_type='text/plain'
             )
-            
-            if not result:
-                return web.Response(
-                    text="❌ **File Not Found**\n\nNo file found for this channel/message.",
-                    status=404,
-                    content_type='text/plain'
-                )
-            
-            file_data = dict(result)
-            unique_file_id = file_data['unique_file_id']
-            
-            # Increment view count
-            await File.increment_views(conn, unique_file_id)
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
+        
+        file_data = dict(result)
+        unique_file_id = file_data['unique_file_id']
+        
+        # Count view (flushed in batches)
+        counters.add_view(unique_file_id)
         
         # Get bot file_id
         bot_file_id = file_data.get('bot_0_file_id') or file_data.get('bot_1_file_id') or file_data.get('bot_2_file_id')
@@ -253,49 +322,13 @@ async def stream_file_legacy(request: web.Request):
         # Use StreamBot for legacy requests
         client = StreamBot
         
-        # Stream file (similar logic as above)
-        file_name = file_data['file_name']
-        file_size = file_data['file_size']
-        mime_type = file_data['mime_type']
-        
-        # Handle range requests
-        range_header = request.headers.get('Range')
-        offset = 0
-        limit = file_size
-        
-        if range_header:
-            from_bytes = int(range_header.split('=')[1].split('-')[0])
-            offset = from_bytes
-            limit = file_size - offset
-        
-        # Stream file
-        async def file_stream():
-            try:
-                async for chunk in client.stream_media(bot_file_id, offset=offset, limit=limit):
-                    yield chunk
-            except Exception as e:
-                logging.error(f"Stream error: {e}")
-                raise
-        
-        # Increment download count
-        asyncio.create_task(increment_download(unique_file_id))
-        
-        # Build headers
-        headers = {
-            "Content-Type": mime_type,
-            "Content-Disposition": f'attachment; filename="{file_name}"',
-            "Content-Length": str(limit),
-            "Accept-Ranges": "bytes"
-        }
-        
-        # Add Content-Range only if range header exists
-        if range_header:
-            headers["Content-Range"] = f"bytes {offset}-{offset + limit - 1}/{file_size}"
+        # Count download (flushed in batches)
+        counters.add_download(unique_file_id)
         
-        return web.Response(
-            status=206 if range_header else 200,
-            body=file_stream(),
-            headers=headers
+        return build_stream_response(
+            request, client, bot_file_id, file_data['file_name'],
+            file_data['file_size'], file_data['mime_type'], "attachment",
+            unique_file_id=unique_file_id, uploader_id=file_data.get('uploaded_by')
         )
     
     except Exception as e:
@@ -314,6 +347,8 @@ async def stream_file_legacy(request: web.Request):
 # ===========================
 
 import jwt
+import json
+import base64
 from datetime import datetime, timedelta
 START_TIME = time.time()
 
@@ -321,6 +356,18 @@ START_TIME = time.time()
 JWT_SECRET = Var.JWT_SECRET or "webstreamer_jwt_secret_key_change_in_production"
 JWT_ALGORITHM = "HS256"
 
+
+def require_user(request) -> int:
+    """Telegram ID from the request's Bearer JWT; raises 401 when it is missing or invalid"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        raise web.HTTPUnauthorized(text="Authentication required")
+    try:
+        payload = jwt.decode(auth_header[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        return int(payload['user_id'])
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        raise web.HTTPUnauthorized(text="Invalid or expired token")
+
 def get_readable_time(seconds):
     """Convert seconds to human readable format"""
     count = 0
@@ -346,111 +393,295 @@ def get_readable_time(seconds):
 
     return ping_time
 
+async def build_stats():
+    """Global statistics payload (from in-memory counters)"""
+    stats = global_stats.snapshot()
+    return {
+        "total_files": stats['total_files'],
+        "total_users": stats['total_users'],
+        "total_views": stats['total_views'],
+        "total_downloads": stats['total_downloads'],
+        "total_bandwidth": stats['total_bandwidth'],
+        "total_bandwidth_formatted": format_file_size(stats['total_bandwidth']),
+        "active_links": stats['active_links'],
+        "active_bots": len(multi_clients) or 1,
+        "uptime": get_readable_time(time.time() - START_TIME)
+    }
+
+
 @routes.get("/api/stats")
 async def get_stats(request):
-    """Get global statistics"""
+    """Get global statistics (cached for STATS_CACHE_TTL seconds)"""
     try:
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Get total files
-            total_files = await db_manager.fetchval("SELECT COUNT(*) FROM files") or 0
-            
-            # Get total users
-            total_users = await db_manager.fetchval("SELECT COUNT(*) FROM users") or 0
-            
-            # Get total views
-            total_views = await db_manager.fetchval("SELECT SUM(total_views) FROM files") or 0
-            
-            # Get total downloads
-            total_downloads = await db_manager.fetchval("SELECT SUM(total_downloads) FROM files") or 0
-            
-            # Get total bandwidth
-            total_bandwidth = await db_manager.fetchval("SELECT SUM(total_bandwidth) FROM files") or 0
-            
-            # Get active links (not expired)
-            active_links = await db_manager.fetchval(
-                "SELECT COUNT(*) FROM generated_links WHERE is_active = TRUE AND expiry_date > NOW()" if not db_manager.is_sqlite 
-                else "SELECT COUNT(*) FROM generated_links WHERE is_active = 1 AND expiry_date > datetime('now')"
-            ) or 0
-            
-            return web.json_response({
-                "total_files": total_files,
-                "total_users": total_users,
-                "total_views": total_views,
-                "total_downloads": total_downloads,
-                "total_bandwidth": total_bandwidth,
-                "total_bandwidth_formatted": await format_file_size(total_bandwidth),
-                "active_links": active_links,
-                "active_bots": 1,
-                "uptime": get_readable_time(time.time() - START_TIME)
-            })
+        return await response_cache.serve(request, "stats", Var.STATS_CACHE_TTL, build_stats, tags=("stats",))
     except Exception as e:
         logging.error(f"Error in get_stats: {e}")
         return web.json_response({"error": str(e)}, status=500)
 
+@routes.get("/api/stats/stream")
+async def stream_stats(request):
+    """Server-Sent Events: a stats snapshot, then changed fields every LIVE_STATS_INTERVAL seconds"""
+    queue = live_stats.subscribe()
+    if queue is None:
+        return web.json_response({"error": "Too many live stats subscribers"}, status=503)
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        # Stop nginx from buffering the stream
+        "X-Accel-Buffering": "no",
+    })
+    try:
+        await response.prepare(request)
+        await response.write(b'retry: 5000\n\n')
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            await response.write(message)
+    except ConnectionResetError:
+        pass
+    finally:
+        live_stats.unsubscribe(queue)
+    return response
+
+# Sort columns allowed for /api/files, each backed by a (column, unique_file_id) index
+FILE_SORT_COLUMNS = ('upload_date', 'total_views', 'total_downloads', 'file_size')
+
+# Cached match counts for searches: search term -> (count, cached_at)
+_search_count_cache = {}
+
+
+def encode_cursor(sort_by: str, order: str, row) -> str:
+    """Opaque keyset cursor pointing just after the given row"""
+    value = row[sort_by]
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    data = json.dumps([sort_by, order, value, row['unique_file_id']], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str):
+    """Return (sort_value, unique_file_id) or None if the cursor doesn't fit this query"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        cursor_sort, cursor_order, value, unique_file_id = data
+        if cursor_sort != sort_by or cursor_order != order:
+            return None
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        return value, unique_file_id
+    except Exception:
+        return None
+
+
+def search_clause(search: str, first_param: int):
+    """
+    FROM/WHERE pieces for an index-backed file name search plus a relevance
+    expression (higher is better): pg_trgm on PostgreSQL, FTS5 trigram on SQLite
+    """
+    if db_manager.is_sqlite:
+        if len(search) >= 3:
+            return (
+                "files JOIN files_fts ON files_fts.unique_file_id = files.unique_file_id",
+                f"files_fts MATCH ${first_param}",
+                "-bm25(files_fts)",
+                ['"' + search.replace('"', '""') + '"']
+            )
+        # Trigram tokenizer needs at least 3 characters
+        return ("files", f"file_name LIKE ${first_param}", "0", [f"%{search}%"])
+    return (
+        "files",
+        f"file_name ILIKE ${first_param}",
+        f"similarity(file_name, ${first_param + 1})",
+        [f"%{search}%", search]
+    )
+
+
+async def count_files(search: str) -> int:
+    """Approximate file count: in-memory total, or a short-lived cached count per search"""
+    if not search:
+        return global_stats.snapshot()['total_files']
+    
+    now = time.time()
+    cached = _search_count_cache.get(search)
+    if cached and now - cached[1] < Var.STATS_CACHE_TTL * 6:
+        return cached[0]
+    
+    from_clause, where, _, params = search_clause(search, 1)
+    total = await db_manager.fetchval(
+        f"SELECT COUNT(*) FROM {from_clause} WHERE {where}", *params, replica=True
+    ) or 0
+    if len(_search_count_cache) >= 256:
+        _search_count_cache.clear()
+    _search_count_cache[search] = (total, now)
+    return total
+
+
+async def list_files(limit: int, cursor: str, search: str, sort_by: str, order: str):
+    """One page of the file list with keyset (cursor) pagination and search"""
+    conditions = []
+    params = []
+    from_clause = "files"
+    rank = "0"
+    
+    if search:
+        from_clause, where, rank, search_params = search_clause(search, 1)
+        conditions.append(where)
+        params.extend(search_params)
+    
+    after = decode_cursor(cursor, sort_by, order) if cursor else None
+    if after:
+        params.extend(after)
+        comparison = '<' if order == 'DESC' else '>'
+        conditions.append(f"({sort_by}, unique_file_id) {comparison} (${len(params) - 1}, ${len(params)})")
+    
+    params.append(limit + 1)
+    
+    if search:
+        # Rank in a subquery so the cursor can compare against it
+        cursor_condition = f"WHERE {conditions.pop()}" if after else ""
+        files_query = f"""
+            SELECT * FROM (
+                SELECT files.unique_file_id, files.file_name, files.file_size, files.mime_type,
+                       files.upload_date, files.total_views, files.total_downloads,
+                       {rank} AS relevance
+                FROM {from_clause}
+                WHERE {conditions[0]}
+            ) ranked
+            {cursor_condition}
+            ORDER BY relevance DESC, unique_file_id DESC
+            LIMIT ${len(params)}
+        """
+    else:
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        files_query = f"""
+            SELECT unique_file_id, file_name, file_size, mime_type, upload_date, 
+                   total_views, total_downloads
+            FROM files
+            {where_clause}
+            ORDER BY {sort_by} {order}, unique_file_id {order}
+            LIMIT ${len(params)}
+        """
+    files = await db_manager.fetch(files_query, *params, replica=True)
+    
+    has_next = len(files) > limit
+    files = files[:limit]
+    next_cursor = encode_cursor(sort_by, order, files[-1]) if has_next else None
+    total = await count_files(search)
+    
+    # Format response (rows unpack positionally in SELECT order)
+    files_data = [
+        {
+            "id": unique_file_id,
+            "file_name": file_name,
+            "file_size": file_size,
+            "file_size_formatted": format_file_size(file_size),
+            "mime_type": mime_type,
+            "upload_date": str(upload_date),
+            "total_views": total_views,
+            "total_downloads": total_downloads
+        }
+        for unique_file_id, file_name, file_size, mime_type, upload_date, total_views, total_downloads, *_ in files
+    ]
+    
+    return {
+        "files": files_data,
+        "total": total,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "pagination": {
+            "limit": limit,
+            "total_count": total,
+            "total_pages": math.ceil(total / limit),
+            "has_next": has_next,
+            "next_cursor": next_cursor
+        }
+    }
+
+
 @routes.get("/api/files")
 async def get_files(request):
-    """Get list of files with pagination and search"""
+    """Get list of files with keyset (cursor) pagination and search (cached briefly)"""
     try:
         # Get query parameters
-        limit = int(request.query.get('limit', 20))
-        offset = int(request.query.get('offset', 0))
-        search = request.query.get('search', '')
-        sort_by = request.query.get('sort_by', 'upload_date')
-        sort_order = request.query.get('sort_order', 'DESC')
-        
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Build query
-            where_clause = ""
-            params = []
-            
-            if search:
-                where_clause = "WHERE file_name LIKE ?"
-                params.append(f"%{search}%")
-            
-            # Count total
-            count_query = f"SELECT COUNT(*) FROM files {where_clause}"
-            total = await db_manager.fetchval(count_query, *params) or 0
-            
-            # Get files
-            files_query = f"""
-                SELECT unique_file_id, file_name, file_size, mime_type, upload_date, 
-                       total_views, total_downloads, total_bandwidth
-                FROM files
-                {where_clause}
-                ORDER BY {sort_by} {sort_order}
-                LIMIT ? OFFSET ?
-            """
-            params.extend([limit, offset])
-            
-            files = await db_manager.fetch(files_query, *params)
-            
-            # Format response
-            files_data = []
-            for file in files:
-                files_data.append({
-                    "id": file['unique_file_id'] if isinstance(file, dict) else file[0],
-                    "file_name": file['file_name'] if isinstance(file, dict) else file[1],
-                    "file_size": file['file_size'] if isinstance(file, dict) else file[2],
-                    "file_size_formatted": await format_file_size(file['file_size'] if isinstance(file, dict) else file[2]),
-                    "mime_type": file['mime_type'] if isinstance(file, dict) else file[3],
-                    "upload_date": str(file['upload_date'] if isinstance(file, dict) else file[4]),
-                    "total_views": file['total_views'] if isinstance(file, dict) else file[5],
-                    "total_downloads": file['total_downloads'] if isinstance(file, dict) else file[6],
-                    "total_bandwidth": file['total_bandwidth'] if isinstance(file, dict) else file[7]
-                })
-            
-            return web.json_response({
-                "files": files_data,
-                "total": total,
-                "limit": limit,
-                "offset": offset
-            })
+        limit = min(100, max(1, int(request.query.get('limit', 20))))
+        cursor = request.query.get('cursor', '')
+        search = request.query.get('search', '').strip()
+        sort_by = request.query.get('sort', request.query.get('sort_by', 'upload_date'))
+        order = request.query.get('order', request.query.get('sort_order', 'desc')).upper()
+        
+        # Validate inputs
+        if sort_by not in FILE_SORT_COLUMNS:
+            sort_by = 'upload_date'
+        if order not in ('ASC', 'DESC'):
+            order = 'DESC'
+        
+        # Searches are ranked by relevance, plain listings use the requested sort
+        if search:
+            sort_by, order = 'relevance', 'DESC'
+        
+        # Keyed by the normalized parameters, so equivalent URLs share an entry
+        key = json.dumps(["files", limit, cursor, search, sort_by, order])
+        return await response_cache.serve(
+            request, key, Var.FILE_LIST_CACHE_TTL,
+            lambda: list_files(limit, cursor, search, sort_by, order),
+            tags=("files",)
+        )
     except Exception as e:
         logging.error(f"Error in get_files: {e}")
         import traceback
         traceback.print_exc()
         return web.json_response({"error": str(e)}, status=500)
 
+async def build_file_detail(unique_file_id: str):
+    """File details with uploader, storing bots and hourly access from the rollups"""
+    since = datetime.now() - timedelta(hours=48)
+    row, hourly = await asyncio.gather(
+        db_manager.fetchrow(FILE_DETAIL, unique_file_id, replica=True),
+        db_manager.fetch(FILE_HOURLY_ACCESS, unique_file_id, since, replica=True),
+    )
+    if not row:
+        raise FIleNotFound
+    
+    return {
+        "id": row['unique_file_id'],
+        "file_name": row['file_name'],
+        "file_size": row['file_size'],
+        "file_size_formatted": format_file_size(row['file_size']),
+        "mime_type": row['mime_type'],
+        "upload_date": str(row['upload_date']),
+        "total_views": row['total_views'] or 0,
+        "total_downloads": row['total_downloads'] or 0,
+        "total_bandwidth": row['total_bandwidth'] or 0,
+        "username": row['username'],
+        "first_name": row['first_name'],
+        "last_name": row['last_name'],
+        "bot_mappings": [
+            {"bot_index": bot_index, "telegram_message_id": row['message_id']}
+            for bot_index in range(3) if row[f'on_bot_{bot_index}']
+        ],
+        "hourly_access": [
+            {"bucket": str(hour['bucket']), "access_type": hour['access_type'], "hits": int(hour['hits'])}
+            for hour in hourly
+        ],
+    }
+
+
+@routes.get("/api/files/{unique_file_id}")
+async def get_file_detail(request):
+    """Get one file's details and recent hourly access (cached for FILE_DETAIL_CACHE_TTL seconds)"""
+    unique_file_id = request.match_info['unique_file_id']
+    try:
+        return await response_cache.serve(
+            request, f"file:{unique_file_id}", Var.FILE_DETAIL_CACHE_TTL,
+            lambda: build_file_detail(unique_file_id), tags=("files",)
+        )
+    except FIleNotFound:
+        return web.json_response({"error": "File not found"}, status=404)
+    except Exception as e:
+        logging.error(f"Error in get_file_detail: {e}")
+        return web.json_response({"error": str(e)}, status=500)
+
 @routes.post("/api/auth/request-otp")
 async def request_otp(request):
     """Request OTP for login"""
@@ -465,19 +696,10 @@ async def request_otp(request):
         import secrets
         otp = ''.join([str(secrets.randbelow(10)) for _ in range(6)])
         
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Store OTP in database
-            query = """
-                INSERT INTO otp_tokens (user_id, otp_code, created_at, expires_at, used)
-                VALUES (?, ?, ?, ?, ?)
-            """
-            now = datetime.now()
-            expires_at = now + timedelta(minutes=Var.OTP_EXPIRY_MINUTES)
-            
-            await db_manager.execute(query, telegram_id, otp, now, expires_at, False)
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
+        # Store OTP in database
+        now = datetime.now()
+        expires_at = now + timedelta(minutes=Var.OTP_EXPIRY_MINUTES)
+        await db_manager.execute(OTP_INSERT, telegram_id, otp, now, expires_at, False)
         
         # TODO: Send OTP via Telegram bot
         logging.info(f"Generated OTP for {telegram_id}: {otp}")
@@ -502,39 +724,28 @@ async def verify_otp(request):
         if not telegram_id or not otp_code:
             return web.json_response({"error": "Telegram ID and OTP are required"}, status=400)
         
-        async with db_manager.pool.acquire() if not db_manager.is_sqlite else db_manager.sqlite_conn as conn:
-            # Verify OTP
-            query = """
-                SELECT id, expires_at, used FROM otp_tokens
-                WHERE user_id = ? AND otp_code = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-            """
-            otp_record = await db_manager.fetchrow(query, telegram_id, otp_code)
-            
-            if not otp_record:
-                return web.json_response({"error": "Invalid OTP"}, status=401)
-            
-            # Check if OTP is expired
-            expires_at = otp_record['expires_at'] if isinstance(otp_record, dict) else otp_record[1]
-            if isinstance(expires_at, str):
-                expires_at = datetime.fromisoformat(expires_at)
-            
-            if datetime.now() > expires_at:
-                return web.json_response({"error": "OTP expired"}, status=401)
-            
-            # Check if OTP is already used
-            used = otp_record['used'] if isinstance(otp_record, dict) else otp_record[2]
-            if used:
-                return web.json_response({"error": "OTP already used"}, status=401)
-            
-            # Mark OTP as used
-            update_query = "UPDATE otp_tokens SET used = ?, used_at = ? WHERE id = ?"
-            otp_id = otp_record['id'] if isinstance(otp_record, dict) else otp_record[0]
-            await db_manager.execute(update_query, True, datetime.now(), otp_id)
-            
-            if db_manager.is_sqlite:
-                await conn.commit()
+        # Verify OTP
+        otp_record = await db_manager.fetchrow(OTP_LATEST, telegram_id, otp_code)
+        
+        if not otp_record:
+            return web.json_response({"error": "Invalid OTP"}, status=401)
+        
+        # Check if OTP is expired
+        expires_at = otp_record['expires_at']
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        
+        if datetime.now() > expires_at:
+            return web.json_response({"error": "OTP expired"}, status=401)
+        
+        # Check if OTP is already used
+        used = otp_record['used']
+        if used:
+            return web.json_response({"error": "OTP already used"}, status=401)
+        
+        # Mark OTP as used
+        otp_id = otp_record['id']
+        await db_manager.execute(OTP_MARK_USED, True, datetime.now(), otp_id)
         
         # Generate JWT token
         token_payload = {
@@ -554,3 +765,91 @@ async def verify_otp(request):
         traceback.print_exc()
         return web.json_response({"error": str(e)}, status=500)
 
+# Files and links listed on the dashboard, newest first
+DASHBOARD_LIMIT = 50
+
+async def build_quota(user_id: int):
+    """Links used and left in each rate limit window"""
+    used = await rate_limiter.get_usage(user_id)
+    quotas = {
+        name: {
+            "used": used[name],
+            "limit": limit,
+            "remaining": max(0, limit - used[name]),
+            "can_generate": used[name] < limit
+        }
+        for name, _, limit in LINK_WINDOWS
+    }
+    return {
+        "quotas": quotas,
+        "can_generate_link": all(quota["can_generate"] for quota in quotas.values())
+    }
+
+
+@routes.get("/api/user/dashboard")
+async def get_user_dashboard(request):
+    """Stats, recent files, recent links and quota for the signed-in user in one response"""
+    user_id = require_user(request)
+    try:
+        now = int(time.time())
+        # Independent indexed reads, each on its own connection
+        stats, files, links, quota = await asyncio.gather(
+            db_manager.fetchrow(USER_DASHBOARD_STATS, user_id, now, replica=True),
+            db_manager.fetch(USER_RECENT_FILES, user_id, DASHBOARD_LIMIT, replica=True),
+            db_manager.fetch(USER_DASHBOARD_LINKS, user_id, DASHBOARD_LIMIT, replica=True),
+            build_quota(user_id)
+        )
+        
+        return json_response({
+            "user_id": user_id,
+            "stats": {
+                "total_files": stats['total_files'],
+                "total_links": stats['total_links'],
+                "active_links": stats['active_links'],
+                "total_views": stats['total_views'],
+                "total_downloads": stats['total_downloads'],
+                "total_bandwidth": stats['total_bandwidth'],
+                "total_bandwidth_formatted": format_file_size(stats['total_bandwidth'])
+            },
+            "files": [
+                {
+                    "id": row['unique_file_id'],
+                    "file_name": row['file_name'],
+                    "file_size": row['file_size'],
+                    "file_size_formatted": format_file_size(row['file_size']),
+                    "mime_type": row['mime_type'],
+                    "upload_date": str(row['upload_date']),
+                    "total_views": row['total_views'],
+                    "total_downloads": row['total_downloads']
+                }
+                for row in files
+            ],
+            "links": [
+                {
+                    "id": row['id'],
+                    "unique_file_id": row['unique_file_id'],
+                    "file_name": row['file_name'],
+                    "file_size_formatted": format_file_size(row['file_size']),
+                    "access_count": row['access_count'],
+                    "created_at": str(row['created_at']),
+                    "expiry_timestamp": row['expiry_timestamp'],
+                    "expiry_date": datetime.utcfromtimestamp(row['expiry_timestamp']).isoformat() + "Z",
+                    "is_expired": row['expiry_timestamp'] <= now
+                }
+                for row in links
+            ],
+            "quota": quota
+        }, headers={"Cache-Control": "private, no-store"})
+    except Exception as e:
+        logging.error(f"Error in get_user_dashboard: {e}")
+        return web.json_response({"error": str(e)}, status=500)
+
+@routes.get("/api/user/quota")
+async def get_user_quota(request):
+    """The signed-in user's link quota, without the rest of the dashboard"""
+    user_id = require_user(request)
+    try:
+        return json_response(await build_quota(user_id), headers={"Cache-Control": "private, no-store"})
+    except Exception as e:
+        logging.error(f"Error in get_user_quota: {e}")
+        return web.json_response({"error": str(e)}, status=500)
@@ -7,3 +7,5 @@ from .time_format import get_readable_time
 from .file_properties import get_hash, get_name
 from .custom_dl import ByteStreamer
 from .cryptography import verify_sha256_key, decrypt, encrypt_channel_id, decrypt_channel_id
+from .signed_links import build_signed_url, decode_signed_token, revocation_list
+from .link_verifier import link_verifier, sign_channel_link
@@ -2,6 +2,7 @@ from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad, pad
 
 import base64
+import hmac
 from hashlib import sha256
 from ..vars import Var
 
@@ -19,7 +20,7 @@ def verify_sha256_key(cid, fid, expiration_time, sha256_key):
         sha256_hash = sha256(data_to_hash).hexdigest()
 
         # Compare the calculated hash with the received sha256_key
-        return sha256_hash == sha256_key
+        return hmac.compare_digest(sha256_hash, sha256_key)
     except Exception:
         return False
 
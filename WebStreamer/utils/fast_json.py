@@ -0,0 +1,46 @@
+# JSON encoding for API responses (orjson when installed, stdlib json otherwise)
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from aiohttp import web
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """Encode values the JSON encoders don't handle natively (rows, dates, decimals)"""
+    if hasattr(obj, 'items'):
+        return dict(obj.items())
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson:
+    def dumps(data) -> bytes:
+        return orjson.dumps(data, default=_default)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def _plain(obj):
+        """Rows as dicts: the stdlib encoder writes tuple-backed rows as lists without calling default"""
+        if isinstance(obj, tuple) and hasattr(obj, 'items'):
+            return {key: _plain(value) for key, value in obj.items()}
+        if isinstance(obj, dict):
+            return {key: _plain(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_plain(value) for value in obj]
+        return obj
+
+    def dumps(data) -> bytes:
+        return _encoder.encode(_plain(data)).encode()
+
+
+def json_response(data, status: int = 200, headers=None) -> web.Response:
+    """Drop-in replacement for web.json_response using the fast encoder"""
+    return web.Response(body=dumps(data), status=status, headers=headers, content_type='application/json')
@@ -0,0 +1,192 @@
+# In-memory sliding-window rate limiter for link generation
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, List, Tuple
+from ..vars import Var
+
+# (window name, length in seconds, max links)
+LINK_WINDOWS = (
+    ('5min', 300, Var.RATE_LIMIT_PER_5MIN),
+    ('hour', 3600, Var.RATE_LIMIT_PER_HOUR),
+    ('day', 86400, Var.RATE_LIMIT_PER_DAY),
+)
+
+
+class SlidingWindowLimiter:
+    """
+    Keeps the timestamps of each user's recent link generations and checks
+    every window in one synchronous (so atomic under asyncio) check-and-consume.
+    State can be snapshotted to a JSON file so limits survive restarts.
+    In multi-node mode the same windows are counted from a log of link
+    timestamps in the shared rate_limit_tracker table, under a row lock.
+    """
+
+    def __init__(self, windows, state_file: str = "", persist_interval: int = 60):
+        self.windows = windows
+        self.horizon = max(seconds for _, seconds, _ in windows)
+        self.state_file = state_file
+        self.persist_interval = persist_interval
+        self.events: Dict[int, List[float]] = {}
+        self._task = None
+
+    def _recent(self, user_id: int, now: float) -> List[float]:
+        """User's timestamps inside the longest window (older ones are dropped)"""
+        events = self.events.get(user_id)
+        if not events:
+            return []
+        cut = bisect_left(events, now - self.horizon)
+        if cut:
+            del events[:cut]
+        return events
+
+    def usage(self, user_id: int, now: float = None) -> Dict[str, int]:
+        """Links generated by the user in each window"""
+        now = now or time.time()
+        events = self._recent(user_id, now)
+        return {
+            name: len(events) - bisect_left(events, now - seconds)
+            for name, seconds, _ in self.windows
+        }
+
+    def try_consume(self, user_id: int, now: float = None) -> Tuple[bool, Dict[str, int]]:
+        """Record one link if every window has room; returns (allowed, usage before)"""
+        now = now or time.time()
+        used = self.usage(user_id, now)
+        if any(used[name] >= limit for name, _, limit in self.windows):
+            return False, used
+        self.events.setdefault(user_id, []).append(now)
+        return True, used
+
+    # Multi-node mode (the same sliding windows, logged in the shared database)
+
+    @staticmethod
+    async def _in_transaction(fn):
+        from WebStreamer.database import db_manager  # Import here to avoid circular import
+        if db_manager.is_sqlite:
+            return await db_manager.sqlite.run_in_transaction(fn)
+        async with db_manager.acquire() as conn:
+            async with conn.transaction():
+                return await fn(conn)
+
+    async def _db_usage(self, conn, user_id: int, now: float) -> Dict[str, int]:
+        from WebStreamer.database import db_manager  # Import here to avoid circular import
+        from WebStreamer.database.queries import RATE_LIMIT_WINDOW_COUNT
+        sql = RATE_LIMIT_WINDOW_COUNT.text(db_manager.is_sqlite)
+        return {
+            name: int(await conn.fetchval(sql, user_id, datetime.fromtimestamp(now - seconds)))
+            for name, seconds, _ in self.windows
+        }
+
+    async def consume(self, user_id: int) -> bool:
+        """Check all windows and count one link, atomically across nodes"""
+        if not Var.MULTI_NODE:
+            return self.try_consume(user_id)[0]
+        # Import here to avoid circular import
+        from WebStreamer.database import db_manager
+        from WebStreamer.database.queries import USER_ENSURE, RATE_LIMIT_LOCK_USER, RATE_LIMIT_RECORD
+
+        async def check_and_consume(conn):
+            now = time.time()
+            # Tracker rows reference users, which may not exist yet for a first upload;
+            # ingestion fills in the names and counts the user
+            await conn.execute(USER_ENSURE.text(db_manager.is_sqlite), user_id)
+            # Concurrent consumes for the user, on any node, wait here until we commit
+            await conn.fetchval(RATE_LIMIT_LOCK_USER.text(db_manager.is_sqlite), user_id)
+            used = await self._db_usage(conn, user_id, now)
+            if any(used[name] >= limit for name, _, limit in self.windows):
+                return False
+            await conn.execute(RATE_LIMIT_RECORD.text(db_manager.is_sqlite), user_id, datetime.fromtimestamp(now))
+            return True
+
+        return await self._in_transaction(check_and_consume)
+
+    async def refund(self, user_id: int):
+        """Give back the user's most recent link after a failed generation"""
+        if not Var.MULTI_NODE:
+            events = self.events.get(user_id)
+            if events:
+                events.pop()
+            return
+        # Import here to avoid circular import
+        from WebStreamer.database import db_manager
+        from WebStreamer.database.queries import RATE_LIMIT_REFUND
+        try:
+            await db_manager.execute(RATE_LIMIT_REFUND, user_id)
+        except Exception as e:
+            logging.error(f"Error refunding rate limit for user {user_id}: {e}")
+
+    async def get_usage(self, user_id: int) -> Dict[str, int]:
+        """Links generated by the user in each window"""
+        if not Var.MULTI_NODE:
+            return self.usage(user_id)
+        from WebStreamer.database import db_manager  # Import here to avoid circular import
+        async with db_manager.acquire() as conn:
+            return await self._db_usage(conn, user_id, time.time())
+
+    # Persistence
+
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            now = time.time()
+            for user_id, events in state.items():
+                events = [t for t in events if t > now - self.horizon]
+                if events:
+                    self.events[int(user_id)] = events
+            logging.info(f"Loaded rate limit state for {len(self.events)} users")
+        except Exception as e:
+            logging.error(f"Error loading rate limit state: {e}")
+
+    def prune(self):
+        """Forget users with nothing left in any window"""
+        now = time.time()
+        self.events = {
+            user_id: events for user_id, events in self.events.items()
+            if self._recent(user_id, now)
+        }
+
+    def save(self):
+        if not self.state_file:
+            return
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(self.events, f, separators=(",", ":"))
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            logging.error(f"Error saving rate limit state: {e}")
+
+    async def run(self):
+        """Background loop that prunes idle users and snapshots state"""
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            self.prune()
+            self.save()
+
+    def start(self):
+        if Var.MULTI_NODE:
+            return
+        self.load()
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.prune()
+        self.save()
+
+
+rate_limiter = SlidingWindowLimiter(
+    LINK_WINDOWS,
+    state_file=Var.RATE_LIMIT_STATE_FILE,
+    persist_interval=Var.RATE_LIMIT_PERSIST_INTERVAL
+)
@@ -0,0 +1,180 @@
+# In-memory cache of serialized, pre-compressed JSON API responses
+import asyncio
+import gzip
+import hashlib
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from aiohttp import web
+from .fast_json import dumps
+from ..vars import Var
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CachedResponse:
+    """A JSON body with its compressed variants and weak ETag"""
+    __slots__ = ('body', 'gzip', 'br', 'etag', 'expires_at', 'tags')
+
+    def __init__(self, data, ttl: float, tags: Iterable[str]):
+        self.body = dumps(data)
+        self.etag = f'W/"{hashlib.blake2b(self.body, digest_size=12).hexdigest()}"'
+        self.gzip = None
+        self.br = None
+        if len(self.body) >= Var.RESPONSE_COMPRESS_MIN_BYTES:
+            self.gzip = gzip.compress(self.body, compresslevel=6)
+            if brotli:
+                self.br = brotli.compress(self.body, quality=5)
+        self.expires_at = time.monotonic() + ttl
+        self.tags = tuple(tags)
+
+
+def accepts(header: str, coding: str) -> bool:
+    """Whether an Accept-Encoding header allows the coding (q=0 refuses it)"""
+    for part in header.lower().split(','):
+        name, _, params = part.partition(';')
+        if name.strip() != coding:
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak If-None-Match comparison, as used for GET"""
+    if not header:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag == etag or f'W/{tag}' == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    LRU of built responses with per-entry TTLs. Concurrent misses for a key
+    share one build; tags let writers drop every entry derived from data
+    they changed. A build that started before an invalidation is returned
+    to its waiters but not stored.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.tagged: Dict[str, Set[str]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    async def get(self, key: str, ttl: float, build: Callable[[], Awaitable],
+                  tags: Iterable[str] = ()) -> CachedResponse:
+        """Cached response for the key, building it (once) on a miss"""
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        # The build runs in its own task, so cancelling the request that
+        # started it does not fail the requests waiting on the same key
+        task = asyncio.ensure_future(self._build(ttl, build, tags))
+        self._inflight[key] = task
+        task.add_done_callback(partial(self._finish, key, self._generation))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _build(ttl: float, build: Callable[[], Awaitable], tags: Iterable[str]) -> CachedResponse:
+        return CachedResponse(await build(), ttl, tags)
+
+    def _finish(self, key: str, generation: int, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieving the exception also keeps asyncio from logging it when no caller is left
+        if task.cancelled() or task.exception() is not None:
+            return
+        if generation == self._generation:
+            self._store(key, task.result())
+
+    def _store(self, key: str, entry: CachedResponse):
+        self._discard(key)
+        self.entries[key] = entry
+        for tag in entry.tags:
+            self.tagged.setdefault(tag, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._discard(next(iter(self.entries)))
+
+    def _discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the tags"""
+        self._generation += 1
+        for tag in tags:
+            for key in list(self.tagged.get(tag, ())):
+                self._discard(key)
+        self.invalidations += 1
+
+    def respond(self, request: web.Request, entry: CachedResponse) -> web.Response:
+        """304 when the client has this version, else the best encoding it accepts"""
+        # no-cache: clients may store the body but must revalidate (cheap with the ETag)
+        headers = {'ETag': entry.etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        body = entry.body
+        if entry.br is not None and accepts(accept_encoding, 'br'):
+            body = entry.br
+            headers['Content-Encoding'] = 'br'
+        elif entry.gzip is not None and accepts(accept_encoding, 'gzip'):
+            body = entry.gzip
+            headers['Content-Encoding'] = 'gzip'
+        return web.Response(body=body, headers=headers, content_type='application/json')
+
+    async def serve(self, request: web.Request, key: str, ttl: float,
+                    build: Callable[[], Awaitable], tags: Iterable[str] = ()) -> web.Response:
+        """Cached JSON response for the key, built by build() on a miss"""
+        return self.respond(request, await self.get(key, ttl, build, tags))
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "brotli": brotli is not None,
+        }
+
+
+response_cache = ResponseCache(Var.RESPONSE_CACHE_SIZE)
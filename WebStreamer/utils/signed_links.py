@@ -0,0 +1,99 @@
+# Stateless signed stream links
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import Dict, Optional, Set
+from urllib.parse import quote
+from ..vars import Var
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(Var.SECRET_KEY.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest[:16])
+
+
+def create_signed_token(unique_file_id: str, link_id: int, bot_index: int, bot_file_id: str,
+                        file_size: int, mime_type: str, file_name: str, expiry_timestamp: int,
+                        uploader_id: int = None) -> str:
+    """Pack everything the stream path needs into a signed, URL-safe token"""
+    payload = _b64encode(json.dumps({
+        "u": unique_file_id,
+        "l": link_id,
+        "b": bot_index,
+        "f": bot_file_id,
+        "s": file_size or 0,
+        "m": mime_type or "application/octet-stream",
+        "n": file_name or "",
+        "e": expiry_timestamp,
+        "o": uploader_id,
+    }, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def decode_signed_token(token: str) -> Optional[Dict]:
+    """Return the token payload if the signature matches, otherwise None"""
+    try:
+        payload, signature = token.split(".", 1)
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        return json.loads(_b64decode(payload))
+    except Exception:
+        return None
+
+
+def build_signed_url(unique_file_id: str, link_id: int, bot_index: int, bot_file_id: str,
+                     file_size: int, mime_type: str, file_name: str, expiry_timestamp: int,
+                     uploader_id: int = None) -> str:
+    """Build the public /s/ stream URL for a generated link"""
+    token = create_signed_token(
+        unique_file_id, link_id, bot_index, bot_file_id, file_size,
+        mime_type, file_name, expiry_timestamp, uploader_id
+    )
+    return f"{Var.URL}s/{token}/{quote(file_name or 'file')}"
+
+
+class RevocationList:
+    """In-memory deny list for signed links, refreshed from the database in the background"""
+
+    def __init__(self, refresh_interval: int):
+        self.refresh_interval = refresh_interval
+        self.link_ids: Set[int] = set()
+        self.user_ids: Set[int] = set()
+
+    def is_revoked(self, payload: Dict) -> bool:
+        return payload.get("l") in self.link_ids or payload.get("o") in self.user_ids
+
+    async def refresh(self):
+        # Import here to avoid circular import
+        from WebStreamer.database import db_manager
+        from WebStreamer.database.queries import REVOKED_LINK_IDS, BANNED_USER_IDS
+
+        links = await db_manager.fetch(REVOKED_LINK_IDS, int(time.time()))
+        users = await db_manager.fetch(BANNED_USER_IDS)
+        self.link_ids = {row['id'] for row in links}
+        self.user_ids = {row['id'] for row in users}
+
+    async def run(self):
+        """Background loop that keeps the deny list fresh"""
+        while True:
+            try:
+                await self.refresh()
+                logging.debug(f"Revocation list refreshed: {len(self.link_ids)} links, {len(self.user_ids)} users")
+            except Exception as e:
+                logging.error(f"Error refreshing revocation list: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+revocation_list = RevocationList(Var.REVOCATION_REFRESH_INTERVAL)
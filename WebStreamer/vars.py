@@ -52,11 +52,25 @@ class Var(object):
     
     # Database Configuration
     DATABASE_URL = str(environ.get("DATABASE_URL", ""))
+    DB_POOL_MIN_SIZE = int(environ.get("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(environ.get("DB_POOL_MAX_SIZE", "20"))
+    DB_POOL_MAX_IDLE = float(environ.get("DB_POOL_MAX_IDLE", "60"))
+    DB_STATEMENT_CACHE_SIZE = int(environ.get("DB_STATEMENT_CACHE_SIZE", "1024"))
+    SQLITE_READERS = int(environ.get("SQLITE_READERS", "4"))
+    SQLITE_SYNCHRONOUS = str(environ.get("SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+    SQLITE_WRITE_BATCH = int(environ.get("SQLITE_WRITE_BATCH", "100"))
+    # Optional PostgreSQL read replica for analytics and listings
+    DATABASE_REPLICA_URL = str(environ.get("DATABASE_REPLICA_URL", ""))
+    DB_REPLICA_POOL_MAX_SIZE = int(environ.get("DB_REPLICA_POOL_MAX_SIZE", "10"))
+    # Reads fall back to the primary while the replica lags more than this many seconds
+    DB_REPLICA_MAX_LAG = float(environ.get("DB_REPLICA_MAX_LAG", "5"))
+    DB_REPLICA_CHECK_INTERVAL = float(environ.get("DB_REPLICA_CHECK_INTERVAL", "5"))
     
     # Security Keys (moved from hardcoded)
     SECRET_KEY = str(environ.get("SECRET_KEY", ""))
     AES_KEY = str(environ.get("AES_KEY", "BHADOO9854752658"))
     AES_IV = str(environ.get("AES_IV", "CLOUD54158954721"))
+    ADMIN_TOKEN = str(environ.get("ADMIN_TOKEN", ""))
     
     # GitHub Session Storage
     GITHUB_SESSION_KEY = str(environ.get("GITHUB_SESSION_KEY", ""))
@@ -65,6 +79,59 @@ class Var(object):
     RATE_LIMIT_PER_5MIN = int(environ.get("RATE_LIMIT_PER_5MIN", "1"))
     RATE_LIMIT_PER_HOUR = int(environ.get("RATE_LIMIT_PER_HOUR", "5"))
     RATE_LIMIT_PER_DAY = int(environ.get("RATE_LIMIT_PER_DAY", "20"))
+    RATE_LIMIT_STATE_FILE = str(environ.get("RATE_LIMIT_STATE_FILE", ""))
+    RATE_LIMIT_PERSIST_INTERVAL = int(environ.get("RATE_LIMIT_PERSIST_INTERVAL", "60"))
+    # Several bot processes sharing one database keep rate limits in the database
+    MULTI_NODE = environ.get("MULTI_NODE", "False")
+    MULTI_NODE = True if str(MULTI_NODE).lower() == "true" else False
+    
+    # Signed Links
+    REVOCATION_REFRESH_INTERVAL = int(environ.get("REVOCATION_REFRESH_INTERVAL", "30"))
+    LINK_CACHE_SIZE = int(environ.get("LINK_CACHE_SIZE", "4096"))
+    # Reuse a user's existing link for a file while it has at least this long left
+    LINK_REUSE_MIN_HOURS = int(environ.get("LINK_REUSE_MIN_HOURS", "24"))
+    
+    # Write-behind Counters
+    COUNTER_FLUSH_INTERVAL = int(environ.get("COUNTER_FLUSH_INTERVAL", "5"))
+    
+    # Access Log Writer
+    ACCESS_LOG_QUEUE_SIZE = int(environ.get("ACCESS_LOG_QUEUE_SIZE", "10000"))
+    ACCESS_LOG_BATCH_SIZE = int(environ.get("ACCESS_LOG_BATCH_SIZE", "500"))
+    ACCESS_LOG_FLUSH_INTERVAL = float(environ.get("ACCESS_LOG_FLUSH_INTERVAL", "2"))
+    ACCESS_LOG_SAMPLE_RATE = int(environ.get("ACCESS_LOG_SAMPLE_RATE", "10"))
+    ACCESS_LOG_PARTITIONS_AHEAD = int(environ.get("ACCESS_LOG_PARTITIONS_AHEAD", "2"))
+    
+    # Global Stats
+    STATS_RECONCILE_INTERVAL = int(environ.get("STATS_RECONCILE_INTERVAL", "300"))
+    STATS_CACHE_TTL = int(environ.get("STATS_CACHE_TTL", "5"))
+    
+    # Response Cache (JSON API responses, dropped early when files or links change)
+    RESPONSE_CACHE_SIZE = int(environ.get("RESPONSE_CACHE_SIZE", "512"))
+    FILE_LIST_CACHE_TTL = int(environ.get("FILE_LIST_CACHE_TTL", "10"))
+    FILE_DETAIL_CACHE_TTL = int(environ.get("FILE_DETAIL_CACHE_TTL", "30"))
+    RESPONSE_COMPRESS_MIN_BYTES = int(environ.get("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+    
+    # Live Stats (Server-Sent Events)
+    LIVE_STATS_INTERVAL = float(environ.get("LIVE_STATS_INTERVAL", "2"))
+    LIVE_STATS_MAX_SUBSCRIBERS = int(environ.get("LIVE_STATS_MAX_SUBSCRIBERS", "1000"))
+    LIVE_STATS_HEARTBEAT = float(environ.get("LIVE_STATS_HEARTBEAT", "15"))
+    
+    # Frontend (the built UI in FRONTEND_DIST is served when it exists)
+    FRONTEND_DIST = str(environ.get("FRONTEND_DIST", "frontend/dist"))
+    # Smaller files are answered from memory, larger ones with sendfile
+    STATIC_MEMORY_MAX_BYTES = int(environ.get("STATIC_MEMORY_MAX_BYTES", "262144"))
+    
+    # Admin Exports (rows fetched and written per batch)
+    EXPORT_BATCH_SIZE = int(environ.get("EXPORT_BATCH_SIZE", "1000"))
+    
+    # Maintenance
+    MAINTENANCE_INTERVAL = int(environ.get("MAINTENANCE_INTERVAL", "3600"))
+    MAINTENANCE_BATCH_SIZE = int(environ.get("MAINTENANCE_BATCH_SIZE", "1000"))
+    # Expired links are kept this long for /mylinks; access logs are dropped by daily partition
+    LINK_RETENTION_DAYS = int(environ.get("LINK_RETENTION_DAYS", "30"))
+    ACCESS_LOG_RETENTION_DAYS = int(environ.get("ACCESS_LOG_RETENTION_DAYS", "30"))
+    OTP_RETENTION_HOURS = int(environ.get("OTP_RETENTION_HOURS", "24"))
+    RATE_LIMIT_RETENTION_DAYS = int(environ.get("RATE_LIMIT_RETENTION_DAYS", "2"))
     
     # OTP Configuration
     OTP_EXPIRY_MINUTES = int(environ.get("OTP_EXPIRY_MINUTES", "5"))
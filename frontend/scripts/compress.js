@@ -0,0 +1,40 @@
+// Writes .br and .gz next to every compressible file in dist/, so the
+// Python server can send them without compressing per request
+import { readdirSync, readFileSync, statSync, writeFileSync } from 'node:fs'
+import { join } from 'node:path'
+import { brotliCompressSync, gzipSync, constants } from 'node:zlib'
+
+const DIST = new URL('../dist/', import.meta.url).pathname
+const COMPRESSIBLE = /\.(html|js|mjs|css|json|svg|txt|xml|webmanifest|wasm|map)$/
+const MIN_BYTES = 1024
+
+function* walk(dir) {
+  for (const name of readdirSync(dir)) {
+    const path = join(dir, name)
+    if (statSync(path).isDirectory()) yield* walk(path)
+    else yield path
+  }
+}
+
+let written = 0
+for (const path of walk(DIST)) {
+  if (!COMPRESSIBLE.test(path)) continue
+  const body = readFileSync(path)
+  if (body.length < MIN_BYTES) continue
+  const variants = {
+    '.br': brotliCompressSync(body, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: body.length,
+      },
+    }),
+    '.gz': gzipSync(body, { level: 9 }),
+  }
+  for (const [suffix, compressed] of Object.entries(variants)) {
+    // The server skips variants that are not smaller, so don't write them
+    if (compressed.length >= body.length) continue
+    writeFileSync(path + suffix, compressed)
+    written++
+  }
+}
+console.log(`compress: wrote ${written} precompressed files`)
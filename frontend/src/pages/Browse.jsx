@@ -7,31 +7,43 @@ function Browse() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [search, setSearch] = useState('')
+  // The submitted search; typing in the box does not refetch
+  const [query, setQuery] = useState('')
   const [page, setPage] = useState(1)
+  // cursors[n] is the cursor for page n + 1 (page 1 has none)
+  const [cursors, setCursors] = useState([null])
   const [pagination, setPagination] = useState(null)
   const [sortBy, setSortBy] = useState('upload_date')
   const [order, setOrder] = useState('desc')
 
+  // Runs after the render that reset page/cursors, so it reads their new values
   useEffect(() => {
     fetchFiles()
-  }, [page, sortBy, order])
+  }, [page, sortBy, order, query])
 
-  const fetchFiles = async (searchQuery = search) => {
+  const fetchFiles = async () => {
     try {
       setLoading(true)
       const params = {
-        page,
         limit: 20,
         sort: sortBy,
         order,
       }
-      if (searchQuery) {
-        params.search = searchQuery
+      if (query) {
+        params.search = query
+      }
+      if (cursors[page - 1]) {
+        params.cursor = cursors[page - 1]
       }
       
       const response = await axios.get('/api/files', { params })
       setFiles(response.data.files)
       setPagination(response.data.pagination)
+      setCursors((prev) => {
+        const next = prev.slice(0, page)
+        next[page] = response.data.next_cursor
+        return next
+      })
       setLoading(false)
     } catch (err) {
       setError(err.message)
@@ -41,8 +53,9 @@ function Browse() {
 
   const handleSearch = (e) => {
     e.preventDefault()
+    setCursors([null])
     setPage(1)
-    fetchFiles(search)
+    setQuery(search)
   }
 
   const handleSort = (newSortBy) => {
@@ -52,6 +65,7 @@ function Browse() {
       setSortBy(newSortBy)
       setOrder('desc')
     }
+    setCursors([null])
     setPage(1)
   }
 
@@ -80,8 +94,9 @@ function Browse() {
               className="btn btn-secondary"
               onClick={() => {
                 setSearch('')
+                setCursors([null])
                 setPage(1)
-                fetchFiles('')
+                setQuery('')
               }}
             >
               Clear
@@ -146,7 +161,7 @@ function Browse() {
             <div className="text-center py-16">
               <div className="text-gray-400 text-xl">No files found</div>
               <p className="text-gray-500 mt-2">
-                {search ? 'Try a different search query' : 'No files have been uploaded yet'}
+                {query ? 'Try a different search query' : 'No files have been uploaded yet'}
               </p>
             </div>
           ) : (
@@ -158,18 +173,18 @@ function Browse() {
               </div>
 
               {/* Pagination */}
-              {pagination && pagination.total_pages > 1 && (
+              {pagination && (page > 1 || pagination.has_next) && (
                 <div className="flex justify-center items-center gap-4 mt-8">
                   <button
                     className="btn btn-secondary disabled:opacity-50 disabled:cursor-not-allowed"
-                    disabled={!pagination.has_prev}
+                    disabled={page <= 1}
                     onClick={() => setPage(page - 1)}
                   >
                     ← Previous
                   </button>
                   
                   <span className="text-gray-700">
-                    Page {pagination.current_page} of {pagination.total_pages}
+                    Page {page} of {Math.max(page, pagination.total_pages)}
                   </span>
                   
                   <button
@@ -185,7 +200,7 @@ function Browse() {
               {/* Results Info */}
               {pagination && (
                 <div className="text-center mt-4 text-gray-600">
-                  Showing {files.length} of {pagination.total_count.toLocaleString()} files
+                  Showing {files.length} of ~{pagination.total_count.toLocaleString()} files
                 </div>
               )}
             </>
@@ -28,15 +28,12 @@ function Dashboard() {
         headers: { Authorization: `Bearer ${token}` }
       }
 
-      const [statsRes, filesRes, linksRes] = await Promise.all([
-        axios.get('/api/user/stats', config),
-        axios.get('/api/user/files', config),
-        axios.get('/api/user/links', config)
-      ])
+      // Stats, files and links arrive in one response
+      const { data } = await axios.get('/api/user/dashboard', config)
 
-      setStats(statsRes.data)
-      setFiles(filesRes.data.files)
-      setLinks(linksRes.data.links)
+      setStats(data.stats)
+      setFiles(data.files)
+      setLinks(data.links)
       setLoading(false)
     } catch (err) {
       console.error('Error fetching dashboard data:', err)
@@ -273,7 +270,7 @@ function FileListItem({ file, detailed = false }) {
 }
 
 function LinkListItem({ link, detailed = false }) {
-  const isActive = new Date(link.expiry_date) > new Date()
+  const isActive = !link.is_expired
   
   return (
     <div className="p-3 bg-gray-50 rounded-lg">
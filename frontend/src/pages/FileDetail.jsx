@@ -111,40 +111,36 @@ function FileDetail() {
             </div>
           </div>
 
-          {/* Recent Access Logs */}
-          {file.recent_access && file.recent_access.length > 0 && (
+          {/* Hourly Access */}
+          {file.hourly_access && file.hourly_access.length > 0 && (
             <div className="card mt-8">
-              <h2 className="text-2xl font-bold mb-4">Recent Access</h2>
+              <h2 className="text-2xl font-bold mb-4">Access by Hour</h2>
               <div className="overflow-x-auto">
                 <table className="w-full text-sm">
                   <thead className="bg-gray-100">
                     <tr>
-                      <th className="px-4 py-2 text-left">Date</th>
+                      <th className="px-4 py-2 text-left">Hour</th>
                       <th className="px-4 py-2 text-left">Type</th>
-                      <th className="px-4 py-2 text-left">IP Address</th>
-                      <th className="px-4 py-2 text-left">Data</th>
+                      <th className="px-4 py-2 text-left">Hits</th>
                     </tr>
                   </thead>
                   <tbody>
-                    {file.recent_access.map((log, index) => (
+                    {file.hourly_access.map((row, index) => (
                       <tr key={index} className="border-t">
                         <td className="px-4 py-2">
-                          {formatDate(log.accessed_at)}
+                          {formatDate(row.bucket)}
                         </td>
                         <td className="px-4 py-2">
                           <span className={`px-2 py-1 rounded text-xs ${
-                            log.access_type === 'download' 
+                            row.access_type === 'download' 
                               ? 'bg-green-100 text-green-800' 
                               : 'bg-blue-100 text-blue-800'
                           }`}>
-                            {log.access_type}
+                            {row.access_type}
                           </span>
                         </td>
-                        <td className="px-4 py-2 font-mono text-xs">
-                          {log.ip_address}
-                        </td>
                         <td className="px-4 py-2">
-                          {formatBytes(log.bytes_served || 0)}
+                          {row.hits.toLocaleString()}
                         </td>
                       </tr>
                     ))}
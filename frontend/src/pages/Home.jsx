@@ -9,12 +9,24 @@ function Home() {
 
   useEffect(() => {
     fetchStats()
+
+    // Live updates: a snapshot, then only the fields that changed
+    const source = new EventSource('/api/stats/stream')
+    const merge = (event) => {
+      const changes = JSON.parse(event.data)
+      setStats(current => ({ ...current, ...changes }))
+      setLoading(false)
+    }
+    source.addEventListener('snapshot', merge)
+    source.addEventListener('delta', merge)
+    return () => source.close()
   }, [])
 
   const fetchStats = async () => {
     try {
       const response = await axios.get('/api/stats')
-      setStats(response.data)
+      // Live values that already arrived are newer than the cached response
+      setStats(current => ({ ...response.data, ...current }))
       setLoading(false)
     } catch (err) {
       setError(err.message)
@@ -89,6 +101,11 @@ function Home() {
           <h3 className="text-lg font-semibold text-gray-700 mb-2">Total Bandwidth</h3>
           <p className="text-3xl font-bold text-primary">{stats.total_bandwidth_formatted}</p>
           <p className="text-sm text-gray-500 mt-2">Data transferred</p>
+          {stats.active_streams !== undefined && (
+            <p className="text-xs text-gray-400 mt-1">
+              {stats.active_streams} streaming now • {stats.bytes_per_sec_formatted}
+            </p>
+          )}
         </div>
 
         <div className="card">